@@ -1,8 +1,13 @@
+import io
+import time
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import math
-import requests
+
+from climatologia import atlas, fonte, historico, interpolacao, ipma, memo, metricas, paiois, partilha, prefetch, psicrometria, relatorio, resolucao
+from climatologia.motor import NOMES, MotorLote, avaliar_estacoes, texto_resultado
+
+# O pandas e o altair só são importados nos blocos que desenham tabelas e gráficos; os expansores
+# (key + on_change='rerun') só correm o conteúdo quando estão abertos, para o arranque não os carregar
 
 # ==============================================================
 # APP PRINCIPAL (sem autenticação – acesso público)
@@ -10,141 +15,191 @@ import requests
 
 st.write("Bem-vindo ao Climatologia Aplicada a Paióis")  # Mensagem inicial para todos
 
-# ---------------------- CIDADES ----------------------
-city_to_id = {
-    'Portimão': '1210878',
-    'Lisboa': '1200535',
-    'Porto': '1200545',
-    'Angra do Heroísmo': '1200511',
-    'Braga': '1210622',
-    'Faro': '1200554',
-    'Beja': '1200571',
-    'Évora': '1200843',
-    'Coimbra': '1200559',
-    'Viseu': '1240675',
-    'Bragança': '1200575',
-    'Castelo Branco': '1200570',
-    'Guarda': '1200562',
-    'Leiria': '1210718',
-    'Santarém': '1200568',
-    'Setúbal': '1210770',
-    'Aveiro': '1210702',
-    'Viana do Castelo': '1240610',
-    'Funchal': '1200548',
-    'Ponta Delgada': '1210513',
-    'Amadora': '1210881',
-    'Abrantes': '1210812',
-    'Chaves': '1210616',
-    'Espinho': '1210704',
-    'Estremoz': '1210837',
-    'Lamego': '1210655',
-    'Mafra': '1210747',
-    'Santa Margarida da Coutada': '1210735',
-    'São Jacinto': '1210704',
-    'Tavira': '1210883',
-    'Tomar': '1210724',
-    'Vila Nova de Gaia': '1240903',
-    'Vila Real': '1240566',
-    'Vendas Novas': '1210840',
-    'Alcochete': '5210758',
-    'Sesimbra': '1210770',  # Marco do Grilo (usa estação de Setúbal)
-}
+# Medições desta sessão (e do processo); /metrics em CLIMATOLOGIA_METRICAS_PORTA, se definida
+inicio_render = time.perf_counter()
+metricas_sessao = st.session_state.setdefault('metricas', metricas.Registo())
+metricas.usar_sessao(metricas_sessao)
+if metricas.ativo:
+    metricas.servir()
 
-cidades_disponiveis = sorted(city_to_id.keys())
+# Origem dos feeds do IPMA (climatologia.fonte): ao vivo ou, com CLIMATOLOGIA_FONTE, uma pasta com
+# feeds gravados ou o servidor substituto (python -m climatologia.servidor)
+fonte.ativar()
 
-# ---------------------- TABELAS ----------------------
-tabela_iii = pd.read_csv('tabela_iii.csv', skiprows=1, index_col=0, encoding='utf-8-sig')
-tabela_iii.index = pd.to_numeric(tabela_iii.index, errors='coerce')
-tabela_iii.columns = pd.to_numeric(tabela_iii.columns)
-tabela_iii = tabela_iii.apply(pd.to_numeric, errors='coerce')
+# Com CLIMATOLOGIA_PARTILHA (vários workers), um só processo vai ao IPMA e as tabelas são partilhadas
+modo_partilhado = partilha.ativar()
 
-tabela_iiibis = pd.read_csv('tabela_iiibis.csv', encoding='utf-8-sig')
-tabela_iv = pd.read_csv('tabela_iv.csv', encoding='utf-8-sig')
-tabela_iv['ts'] = pd.to_numeric(tabela_iv['ts'], errors='coerce')
-tabela_iv['tm'] = pd.to_numeric(tabela_iv['tm'], errors='coerce')
-tabela_iv['tv'] = pd.to_numeric(tabela_iv['tv'], errors='coerce')
+# Feeds IPMA mantidos em segundo plano (uma thread por processo, partilhada por todas as sessões);
+# cada snapshot novo fica também gravado no histórico local
+historico_obs = historico.ativar()
+prefetch.iniciar()
+st.caption(prefetch.estado())
+if offline := fonte.descricao():
+    st.caption(offline)
 
-# ---------------------- FUNÇÕES ----------------------
-def stull_wet_bulb(T, RH):
-    import math
-    tw = T * math.atan(0.151977 * (RH + 8.313659)**0.5) + math.atan(T + RH) - math.atan(RH - 1.676331) + 0.00391838 * RH**1.5 * math.atan(0.023101 * RH) - 4.686035
-    return tw
+# ---------------------- CIDADES E TABELAS ----------------------
+# Pacote compilado (python -m climatologia.pacote), com as grelhas densas das tabelas e o
+# mapeamento cidade → estação; sem pacote, ou desatualizado, lê os CSV/xlsx (uma vez por processo)
+tabelas_compiladas, cidades_permitidas, city_to_id = partilha.carregar_pacote()
+# Célula mais próxima das tabelas (como sempre) ou interpolação entre células (climatologia.interpolacao)
+interpolar = st.sidebar.toggle("Interpolar tabelas", help="Sem arredondamentos nem saltos entre células; fora das tabelas o resultado é 'Fora da tabela'")
+# tm pelo ajuste de Stull (como sempre) ou pela equação do psicrómetro com a pressão da estação
+bolbo_humido = st.sidebar.radio("Bolbo húmido", ["Stull", "Psicrómetro (com pressão)"], help="O psicrómetro usa a pressão do IPMA (1013 hPa quando em falta)")
+motor_lote = MotorLote(
+    interpolacao.interpoladas() if interpolar else tabelas_compiladas,
+    psicrometria.stull_wet_bulb if bolbo_humido == "Stull" else psicrometria.psicrometrico,
+)
+# Com as tabelas compiladas o painel, o histórico e o gráfico leem os veredictos do atlas pré-calculado
+# (climatologia.atlas; gerado com python -m climatologia.atlas, ou construído no arranque)
+decisao = motor_lote if interpolar else atlas.de(tabelas_compiladas, motor_lote.bolbo_humido)
+
+# Cada local da folha "Locais" usa a estação mais próxima com dados (climatologia.resolucao);
+# até chegar o stations.json vale o mapeamento manual
+resolvedor = resolucao.ativar(cidades_permitidas, city_to_id)
+# Paióis do paiois.yaml, se existir: todos reavaliados a cada snapshot novo, alertas só nas mudanças
+# (com vários workers corre à parte, em `python -m climatologia vigiar`, para não repetir alertas)
+agendador = None if modo_partilhado else paiois.ativar(MotorLote(tabelas_compiladas), resolvedor.mapeamento)
+estacoes_paiois = agendador.estacoes() if agendador else set()
+ipma.cache.filtrar(resolvedor.estacoes() | estacoes_paiois)  # o feed passa a ser lido em fluxo, só com estas estações
+city_to_id = resolvedor.mapeamento(ipma.cache.snapshot().ultima if ipma.cache.pronto else None)
+cidades_disponiveis = sorted(city_to_id.keys())
 
+# ---------------------- FUNÇÕES ----------------------
 def get_ipma_data(station_id):
-    url = "https://api.ipma.pt/open-data/observation/meteorology/stations/observations.json"
-    response = requests.get(url)
-    if response.status_code != 200:
-        st.error(f"Erro API IPMA: {response.status_code}")
+    try:
+        obs = ipma.cache.ultima(station_id)
+    except ipma.IPMAErro as e:
+        st.error(f"Erro API IPMA: {e}")
         return None, None, None
-    data = response.json()
-    for ts in sorted(data.keys(), reverse=True):
-        if station_id in data[ts] and data[ts][station_id]:
-            obs = data[ts][station_id]
-            try:
-                T = float(obs['temperatura'])
-                RH = float(obs['humidade'])
-                pressure = float(obs.get('pressao', 1013))
-                if pressure == -99.0:
-                    st.warning("Pressão ausente → usando 1013 hPa")
-                    pressure = 1013.0
-                return T, RH, pressure
-            except (KeyError, ValueError):
-                continue
-    st.warning("Sem dados recentes")
-    return None, None, None
-
-def get_P(ts, delta, tabela):
-    ts_r = round(ts)
-    delta_r = round(delta)
-    row = tabela.loc[ts_r] if ts_r in tabela.index else tabela.iloc[(tabela.index - ts_r).abs().argmin()]
-    return row[delta_r] if delta_r in row.index else row.iloc[(row.index - delta_r).abs().argmin()]
-
-def get_tv_tl(P, tabela):
-    row = tabela.iloc[(tabela['P'] - P).abs().argsort()[:1]]
-    return row['tv'].values[0], row['tl'].values[0]
-
-def get_tv_classB(ts_F, tm_F, tabela):
-    clean = tabela.dropna(subset=['ts', 'tm', 'tv'])
-    row = clean.iloc[((clean['ts'] - ts_F).abs() + (clean['tm'] - tm_F).abs()).argsort()[:1]]
-    return row['tv'].values[0] if not row.empty else None
+    if obs is None:
+        st.warning("Sem dados recentes")
+        return None, None, None
+    ts, T, RH, pressure = obs
+    if pressure is None:
+        st.warning("Pressão ausente → usando 1013 hPa")
+        pressure = 1013.0
+    return T, RH, pressure
 
 # ---------------------- INTERFACE ----------------------
 st.title("Climatologia Aplicada a Paióis")
 cidade = st.selectbox("Cidade", cidades_disponiveis)
 ti = st.number_input("Temperatura Interior (°C)", value=20.0)
 classe = st.selectbox("Classe do Paiol", ["A", "B"])
+distancia = resolvedor.distancia(cidade, city_to_id[cidade])
+if distancia is not None:
+    st.caption(f"Estação IPMA {city_to_id[cidade]}, a {distancia:.0f} km")
 
 if st.button("Calcular"):
-    T, RH, pressure = get_ipma_data(city_to_id[cidade])
+    with metricas.medir('app.get_ipma_data'):
+        T, RH, pressure = get_ipma_data(city_to_id[cidade])
     if T is not None:
-        tm = stull_wet_bulb(T, RH)
-        delta = T - tm
-        ts_rounded = round(T)
-
+        r = motor_lote.avaliar_um(T, RH, ti, classe, pressure)
         if classe == "A":
-            st.write(f"ts arredondado = {ts_rounded}ºC | delta = {round(delta)}ºC")
-            P = get_P(ts_rounded, round(delta), tabela_iii)
-            st.write(f"P = {P} g/m³")
-            if P:
-                tv, tl = get_tv_tl(P, tabela_iiibis)
-                if ti >= tv:
-                    res = "ti ≥ tv – O paiol deve ser ventilado durante todo o tempo em que as condições atmosféricas o permitam"
-                elif tv > ti >= tl:
-                    res = "tv > ti ≥ tl – O paiol deve ser ventilado rapidamente, apenas durante o tempo estritamente necessário para lançar uma corrente de ar que renove o ar interior"
-                else:
-                    res = "tl > ti – O paiol deve manter-se fechado."
-            else:
-                res = "Fora da tabela"
+            st.write(f"ts arredondado = {int(r['ts'])}ºC | delta = {round(r['delta'])}ºC")
+            st.write(f"P = {r['P']} g/m³")
+        else:
+            tv_F = r['tv_F']
+            st.write(f"ts = {int(r['ts_F'])}ºF | tm = {int(r['tm_F'])}ºF | tv = {tv_F if tv_F else 'N/D'}ºF")
+
+        if r['fora_dominio']:
+            st.warning("Condições fora do domínio das tabelas" + ("" if interpolar else " (usada a margem mais próxima)"))
+        st.success(f"Resultado: {texto_resultado(classe, r['resultado'])}")
+        st.write(f"T={T}°C | RH={RH}% | P={pressure}hPa | tm={r['tm']:.2f}°C")
+
+# ---------------------- PAINEL ----------------------
+st.divider()
+st.subheader("Painel de estações")
+if st.button("Avaliar todas as estações"):
+    try:
+        observacoes = ipma.cache.ultimas(set(city_to_id.values()))
+    except ipma.IPMAErro as e:
+        st.error(f"Erro API IPMA: {e}")
+    else:
+        import pandas as pd
+
+        st.dataframe(pd.DataFrame(avaliar_estacoes(decisao, city_to_id, observacoes, ti)), hide_index=True)
+
+# ---------------------- RELATÓRIO ----------------------
+# Todos os Locais a partir de um só snapshot, avaliados e escritos em blocos (climatologia.relatorio)
+with st.expander("Relatório diário (todos os locais)"):
+    formato = st.radio("Formato", list(relatorio.FORMATOS), horizontal=True)
+    if st.button("Gerar relatório"):
+        try:
+            ultima = ipma.cache.snapshot().ultima
+        except ipma.IPMAErro as e:
+            st.error(f"Erro API IPMA: {e}")
         else:
-            ts_F = ts_rounded * 9/5 + 32
-            tm_F = round(tm) * 9/5 + 32
-            tv_F = get_tv_classB(round(ts_F), round(tm_F), tabela_iv)
-            st.write(f"ts = {round(ts_F)}ºF | tm = {round(tm_F)}ºF | tv = {tv_F if tv_F else 'N/D'}ºF")
-            if tv_F:
-                tv_c = (tv_F - 32) * 5/9
-                res = "ti > tv – ventilar" if ti > tv_c else "ti < tv - manter fechado"
+            ficheiro = io.BytesIO()
+            try:
+                total = relatorio.exportar(relatorio.linhas(
+                    motor_lote, cidades_permitidas, resolvedor.mapeamento(ultima), ultima, ti), ficheiro, formato)
+            except RuntimeError as e:  # Parquet sem pyarrow
+                st.error(str(e))
             else:
-                res = "Fora da tabela"
+                st.download_button(f"Descarregar relatório ({total} linhas, ti={ti}°C)", ficheiro.getvalue(),
+                                   file_name=f"relatorio_paiois.{formato}", mime=relatorio.TIPOS[formato], on_click='ignore')
+
+# ---------------------- HISTÓRICO ----------------------
+with st.expander("Janelas de ventilação (últimos 7 dias)", key='expansor_historico', on_change='rerun') as expansor:
+    if expansor.open:
+        import pandas as pd
+
+        janelas = historico_obs.horas_ventilaveis(decisao, city_to_id[cidade], ti, classe)
+        st.write(f"{len(janelas['hora'])} horas em que o paiol podia ser ventilado ({cidade}, classe {classe}, ti={ti}°C)")
+        if len(janelas['hora']):
+            st.dataframe(pd.DataFrame({
+                'Hora (UTC)': janelas['hora'],
+                'Resultado': [texto_resultado(classe, r) for r in janelas['resultado']],
+            }), hide_index=True)
+
+# ---------------------- ATLAS ----------------------
+with st.expander("Atlas de decisão", key='expansor_atlas', on_change='rerun') as expansor:
+    if expansor.open:
+        import altair as alt
+        import pandas as pd
+
+        if interpolar:
+            st.info("O atlas cobre as tabelas compiladas (célula mais próxima); desligue \"Interpolar tabelas\".")
+        else:
+            regioes = pd.DataFrame(decisao.regioes(classe, ti))
+            x, y = regioes.columns[:2]
+            legenda = alt.selection_point(fields=['Resultado'], bind='legend')
+            st.altair_chart(alt.Chart(regioes).mark_rect().encode(
+                x=alt.X(field=x, type='ordinal'),
+                y=alt.Y(field=y, type='ordinal', sort='descending'),
+                color=alt.Color(field='Resultado', type='nominal', scale=alt.Scale(
+                    domain=['ventilar', 'ventilar_rapido', 'fechado', 'fora_da_tabela'],
+                    range=['#2ca02c', '#ffbf00', '#d62728', '#d3d3d3'])),
+                opacity=alt.condition(legenda, alt.value(1.0), alt.value(0.2)),
+                tooltip=[x, y, 'Resultado'],
+            ).add_params(legenda).interactive(), width='stretch')
+            st.caption(f"Classe {classe}, ti={ti}°C: cada célula da Tabela {'III' if classe == 'A' else 'IV'}; clicar na legenda destaca uma região")
+
+# ---------------------- PAIÓIS ----------------------
+if agendador:
+    with st.expander(f"Paióis registados ({paiois.REGISTO})", key='expansor_paiois', on_change='rerun') as expansor:
+        if expansor.open:
+            import pandas as pd
+
+            st.dataframe(pd.DataFrame(agendador.tabela()), hide_index=True)
+            alteracoes = agendador.veredictos.alteracoes()[-20:]
+            if alteracoes:
+                st.write("Últimas mudanças de veredicto")
+                st.dataframe(pd.DataFrame(alteracoes, columns=['Paiol', 'Hora (UTC)', 'Resultado']).assign(
+                    Resultado=lambda df: [NOMES[r] for r in df['Resultado']]), hide_index=True)
+
+# ---------------------- MÉTRICAS ----------------------
+# Só com CLIMATOLOGIA_METRICAS=1 (ver climatologia.metricas)
+if metricas.ativo:
+    with st.expander("Métricas (admin)", key='expansor_metricas', on_change='rerun') as expansor:
+        if expansor.open:
+            import pandas as pd
 
-        st.success(f"Resultado: {res}")
-        st.write(f"T={T}°C | RH={RH}% | P={pressure}hPa | tm={tm:.2f}°C")
\ No newline at end of file
+            st.write("Esta sessão")
+            st.dataframe(pd.DataFrame(metricas_sessao.tabela()), hide_index=True)
+            st.write("Processo")
+            st.dataframe(pd.DataFrame(metricas.processo.tabela()), hide_index=True)
+            st.write("Cache de veredictos (climatologia.memo)")
+            st.dataframe(pd.DataFrame(memo.cache_de(tabelas_compiladas).stats()).T, hide_index=False)
+            st.code(metricas.prometheus(), language='text')
+    metricas.registar('app.render', time.perf_counter() - inicio_render)
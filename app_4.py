@@ -1,205 +1,224 @@
+import io
+import time
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import math
-import requests
-import yaml
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
-
-# Configuração de login (crie um config.yaml com credenciais)
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
-
-authenticator = stauth.Authenticate(
-    config['credentials'],
-    config['cookie']['name'],
-    config['cookie']['key'],
-    config['cookie']['expiry_days'],
-)
-
-login_result = authenticator.login(key='Login')
-if login_result is not None:
-    name, authentication_status, username = login_result
-else:
-    st.error("Login failed to render. Check library version or config.")
 
-if st.session_state["authentication_status"]:
-    authenticator.logout('Logout', 'main')
-    st.write(f'Bem-vindo *{st.session_state["name"]}*')
+from climatologia import atlas, autenticacao, fonte, historico, interpolacao, ipma, memo, metricas, paiois, partilha, prefetch, psicrometria, relatorio, resolucao
+from climatologia.motor import NOMES, MotorLote, avaliar_estacoes, texto_resultado
 
-    # Carregar cidades da folha "Locais" do Excel
-    locais_df = pd.read_excel('Climatologia_8.xlsx', sheet_name='Locais', header=None)
-    cidades_permitidas = sorted(locais_df[0].dropna().unique().tolist())  # Remove duplicatas e ordena
-
-    # Dicionário hardcoded de mappings (baseado em matches reais da API IPMA)
-    # Expandi com exemplos da sua lista "Locais" – adicione mais manualmente se necessário
-    city_to_id = {
-        'Portimão': '1210878',  # Correto: Portimão (Aeródromo)
-        'Lisboa': '1200535',    # Correto: Lisboa (Geofísico)
-        'Porto': '1200545',     # Correto: Porto, Pedras Rubras (Aeródromo)
-        'Angra do Heroísmo': '1200511',  # Correto
-        'Braga': '1210622',     # Correto: Braga, Merelim
-        'Faro': '1200554',      # Correto: Faro (Aeródromo)
-        'Beja': '1200571',      # Atualizado para Beja (Aeródromo) com dados recentes
-        'Évora': '1200843',     # Correto: Évora (Aeródromo)
-        'Coimbra': '1200559',   # Correto: Coimbra / Cernache
-        'Viseu': '1240675',     # Correto: Viseu (Cidade)
-        'Bragança': '1200575',  # Atualizado
-        'Castelo Branco': '1200570',  # Atualizado
-        'Guarda': '1200562',
-        'Leiria': '1210718',    # Atualizado para Leiria (Aeródromo) - o ID anterior não tem dados
-        'Santarém': '1200568',
-        'Setúbal': '1210770',   # Atualizado
-        'Aveiro': '1210702',
-        'Viana do Castelo': '1240610',
-        'Funchal': '1200548',
-        'Ponta Delgada': '1210513',
-        'Amadora': '1210881',   # Atualizado para Sintra/Granja do Marquês (close to Amadora with data)
-        'Abrantes': '1210812',  # Alvega
-        'Chaves': '1210616',    # Chaves (Aeródromo)
-        'Espinho': '1210704',   # Espinho
-        'Estremoz': '1210837',  # Estremoz
-        'Lamego': '1210655',    # Lamego
-        'Mafra': '1210747',     # Mafra
-        'Santa Margarida da Coutada': '1210800',  # Santa Margarida da Coutada
-        'São Jacinto': '1210704',  # São Jacinto (same as Espinho)
-        'Tavira': '1210883',    # Tavira
-        'Tomar': '1210724',     # Tomar, Valdonas
-        'Vila Nova de Gaia': '1240903',
-        'Vila Real': '1240566', # Vila Real (Cidade)
-        'Vendas Novas': '1210840',  # Vendas Novas
-        'Alcochete': '5210758', # Alcochete / Campo Tiro
-        # Adicione mais da "Locais" com IDs correspondentes (consulte https://api.ipma.pt/open-data/observation/meteorology/stations/stations.json para matches)
-        # Ex.: Se "Albufeira" não match exato, ignore ou mapeie para próximo como "Faro"
-    }
-
-    # Filtrar dropdown apenas para cidades da "Locais" com mapping válido
-    cidades_disponiveis = sorted(city_to_id.keys())  # Use todas as chaves do dictionary, em ordem alfabética
+# O pandas e o altair só são importados nos blocos que desenham tabelas e gráficos; os expansores
+# (key + on_change='rerun') só correm o conteúdo quando estão abertos, para o arranque não os carregar
 
-    # Carregar tabelas de CSV com correções (separador ajustado para ',', encoding para BOM, conversão numérica)
-    tabela_iii = pd.read_csv('tabela_iii.csv', skiprows=1, index_col=0, encoding='utf-8-sig')
-    tabela_iii.index = pd.to_numeric(tabela_iii.index, errors='coerce')
-    tabela_iii.columns = pd.to_numeric(tabela_iii.columns)
-    tabela_iii = tabela_iii.apply(pd.to_numeric, errors='coerce')  # Converte valores como '_' para NaN
+# Origem dos feeds do IPMA (climatologia.fonte): ao vivo ou, com CLIMATOLOGIA_FONTE, uma pasta com
+# feeds gravados ou o servidor substituto (python -m climatologia.servidor)
+fonte.ativar()
 
-    tabela_iiibis = pd.read_csv('tabela_iiibis.csv', encoding='utf-8-sig')
+# Com CLIMATOLOGIA_PARTILHA (vários workers), um só processo vai ao IPMA e as tabelas são partilhadas
+modo_partilhado = partilha.ativar()
 
-    tabela_iv = pd.read_csv('tabela_iv.csv', encoding='utf-8-sig')  # Default sep=','
-    tabela_iv['ts'] = pd.to_numeric(tabela_iv['ts'], errors='coerce')
-    tabela_iv['tm'] = pd.to_numeric(tabela_iv['tm'], errors='coerce')
-    tabela_iv['tv'] = pd.to_numeric(tabela_iv['tv'], errors='coerce')  # Converte valores como '-' para NaN
+# Feeds IPMA mantidos em segundo plano (uma thread por processo, partilhada por todas as sessões);
+# cada snapshot novo fica também gravado no histórico local
+historico_obs = historico.ativar()
+prefetch.iniciar()
 
-    # Função de Stull para tm (°C)
-    def stull_wet_bulb(T, RH):
-        import math
-        tw = T * math.atan(0.151977 * (RH + 8.313659)**0.5) + math.atan(T + RH) - math.atan(RH - 1.676331) + 0.00391838 * RH**1.5 * math.atan(0.023101 * RH) - 4.686035
-        return tw
+# Medições desta sessão (e do processo); /metrics em CLIMATOLOGIA_METRICAS_PORTA, se definida
+inicio_render = time.perf_counter()
+metricas_sessao = st.session_state.setdefault('metricas', metricas.Registo())
+metricas.usar_sessao(metricas_sessao)
+if metricas.ativo:
+    metricas.servir()
 
-    # Fetch dados IPMA (versão corrigida)
-    def get_ipma_data(station_id):
-        url = "https://api.ipma.pt/open-data/observation/meteorology/stations/observations.json"
-        response = requests.get(url)
-        if response.status_code != 200:
-            st.error(f"Erro na API IPMA: Código {response.status_code}. Verifique a conexão ou API.")
-            return None, None, None
-        data = response.json()
-        # Obter timestamps ordenadas (mais recente primeiro)
-        timestamps = sorted(data.keys(), reverse=True)
-        # Iterar até encontrar dados válidos
-        for ts in timestamps:
-            if station_id in data[ts] and data[ts][station_id] is not None:
-                obs = data[ts][station_id]
-                try:
-                    T = float(obs['temperatura'])
-                    RH = float(obs['humidade'])
-                    pressure = float(obs['pressao'])
-                    if pressure == -99.0:
-                        st.warning("Pressão ausente na API (-99.0 hPa). Usando valor padrão de 1013 hPa para cálculos.")
-                        pressure = 1013.0
-                    return T, RH, pressure
-                except KeyError as e:
-                    st.error(f"Dados incompletos para '{station_id}' em '{ts}': Campo '{e}' ausente.")
-                    return None, None, None
-        st.warning(f"Nenhuma observação recente encontrada para a estação '{station_id}'. Tente outra cidade ou verifique a API IPMA.")
-        return None, None, None
-
-    # Lookups com closest match
-    def get_P(ts, delta, tabela_iii):
-        ts_rounded = round(ts)
-        delta_rounded = round(delta)
-        if ts_rounded not in tabela_iii.index:
-            closest_ts = tabela_iii.index[np.abs(tabela_iii.index - ts_rounded).argmin()]
-        else:
-            closest_ts = ts_rounded
-        row = tabela_iii.loc[closest_ts]
-        if delta_rounded not in row.index:
-            closest_delta = row.index[np.abs(row.index - delta_rounded).argmin()]
-        else:
-            closest_delta = delta_rounded
-        return row[closest_delta]
+# Configuração de login (crie um config.yaml com credenciais); lida uma vez por processo.
+# Depois do login, um token de sessão evita o formulário e o bcrypt nos reruns.
+authenticator = autenticacao.autenticador()
 
-    def get_tv_tl(P, tabela_iiibis):
-        closest = tabela_iiibis.iloc[(tabela_iiibis['P'] - P).abs().argsort()[:1]]
-        return closest['tv'].values[0], closest['tl'].values[0]
+if not autenticacao.sessao_valida():
+    login_result = authenticator.login(key='Login')
+    if login_result is not None:
+        name, authentication_status, username = login_result
+    else:
+        st.error("Login failed to render. Check library version or config.")
+    autenticacao.registar_sessao()
 
-    def get_tv_classB(ts_F, tm_F, tabela_iv):
-        tabela_iv_clean = tabela_iv.dropna(subset=['ts', 'tm', 'tv'])
-        closest = tabela_iv_clean.iloc[((tabela_iv_clean['ts'] - ts_F).abs() + (tabela_iv_clean['tm'] - tm_F).abs()).argsort()[:1]]
-        if not closest.empty:
-            return closest['tv'].values[0]
-        return None
+if st.session_state["authentication_status"]:
+    autenticacao.logout(authenticator, 'Logout', 'main')
+    st.write(f'Bem-vindo *{st.session_state["name"]}*')
+    st.caption(prefetch.estado())
+    if offline := fonte.descricao():
+        st.caption(offline)
+
+    # Cidades da folha "Locais" do Excel, tabelas compiladas e mapeamento cidade → estação IPMA
+    # (climatologia.locais.CITY_TO_ID), lidos do pacote binário (python -m climatologia.pacote);
+    # sem pacote, ou desatualizado, lê o xlsx e os CSV (uma vez por processo)
+    tabelas_compiladas, cidades_permitidas, city_to_id = partilha.carregar_pacote()
+
+    # Célula mais próxima das tabelas (como sempre) ou interpolação entre células (climatologia.interpolacao)
+    interpolar = st.sidebar.toggle("Interpolar tabelas", help="Sem arredondamentos nem saltos entre células; fora das tabelas o resultado é 'Fora da tabela'")
+    # tm pelo ajuste de Stull (como sempre) ou pela equação do psicrómetro com a pressão da estação
+    bolbo_humido = st.sidebar.radio("Bolbo húmido", ["Stull", "Psicrómetro (com pressão)"], help="O psicrómetro usa a pressão do IPMA (1013 hPa quando em falta)")
+    motor_lote = MotorLote(
+        interpolacao.interpoladas() if interpolar else tabelas_compiladas,
+        psicrometria.stull_wet_bulb if bolbo_humido == "Stull" else psicrometria.psicrometrico,
+    )
+    # Com as tabelas compiladas o painel, o histórico e o gráfico leem os veredictos do atlas pré-calculado
+    # (climatologia.atlas; gerado com python -m climatologia.atlas, ou construído no arranque)
+    decisao = motor_lote if interpolar else atlas.de(tabelas_compiladas, motor_lote.bolbo_humido)
+
+    # Cada cidade da "Locais" usa a estação mais próxima com dados (climatologia.resolucao);
+    # até chegar o stations.json vale o mapeamento manual
+    resolvedor = resolucao.ativar(cidades_permitidas, city_to_id)
+    # Paióis do paiois.yaml, se existir: todos reavaliados a cada snapshot novo, alertas só nas mudanças
+    # (com vários workers corre à parte, em `python -m climatologia vigiar`, para não repetir alertas)
+    agendador = None if modo_partilhado else paiois.ativar(MotorLote(tabelas_compiladas), resolvedor.mapeamento)
+    estacoes_paiois = agendador.estacoes() if agendador else set()
+    ipma.cache.filtrar(resolvedor.estacoes() | estacoes_paiois)  # o feed passa a ser lido em fluxo, só com estas estações
+    city_to_id = resolvedor.mapeamento(ipma.cache.snapshot().ultima if ipma.cache.pronto else None)
+    cidades_disponiveis = sorted(city_to_id.keys())  # Use todas as chaves do dictionary, em ordem alfabética
+
+    # Fetch dados IPMA (snapshot partilhado entre sessões, refrescado no máximo uma vez por hora)
+    def get_ipma_data(station_id):
+        try:
+            obs = ipma.cache.ultima(station_id)
+        except ipma.IPMAErro as e:
+            st.error(f"Erro na API IPMA: {e}. Verifique a conexão ou API.")
+            return None, None, None
+        # Última observação válida da estação (índice pré-calculado por snapshot)
+        if obs is None:
+            st.warning(f"Nenhuma observação recente encontrada para a estação '{station_id}'. Tente outra cidade ou verifique a API IPMA.")
+            return None, None, None
+        ts, T, RH, pressure = obs
+        if pressure is None:
+            st.warning("Pressão ausente na API (-99.0 hPa). Usando valor padrão de 1013 hPa para cálculos.")
+            pressure = 1013.0
+        return T, RH, pressure
 
     # Formulário
     st.title("Climatologia Aplicada a Paióis")
     cidade = st.selectbox("Cidade", cidades_disponiveis)
     ti = st.number_input("Temperatura Interior do Paiol (°C)", value=20.0)
     classe = st.selectbox("Classe do Paiol", ["A", "B"])
+    distancia = resolvedor.distancia(cidade, city_to_id[cidade])
+    if distancia is not None:
+        st.caption(f"Estação IPMA {city_to_id[cidade]}, a {distancia:.0f} km")
 
     if st.button("Calcular"):
         station_id = city_to_id[cidade]
-        T, RH, pressure = get_ipma_data(station_id)
+        with metricas.medir('app.get_ipma_data'):
+            T, RH, pressure = get_ipma_data(station_id)
         if T is not None:
-            tm = stull_wet_bulb(T, RH)
-            delta = T - tm
-            ts_rounded = round(T)
-            tm_rounded = round(tm)
-
+            r = motor_lote.avaliar_um(T, RH, ti, classe, pressure)
             if classe == "A":
                 # Depuração atualizada para classe A
-                st.write(f"ts arredondado={ts_rounded}ºC")
-                st.write(f"ts-tm= {round(delta)}ºC")
-                P = get_P(ts_rounded, round(delta), tabela_iii)
-                st.write(f"Peso em gramas (g/m³) ={P}")
-                if P:
-                    tv, tl = get_tv_tl(P, tabela_iiibis)
-                    if ti >= tv:
-                        resultado = "ti ≥ tv – O paiol deve ser ventilado durante todo o tempo em que as condições atmosféricas o permitam."
-                    elif tv > ti >= tl:
-                        resultado = "tv > ti ≥ tl – O paiol deve ser ventilado rapidamente, apenas durante o tempo estritamente necessário para lançar uma corrente de ar que renove o ar interior."
-                    else:
-                        resultado = "tl > ti – O paiol deve manter-se fechado."
-                else:
-                    resultado = "Fora da tabela - Condições fora do range."
+                st.write(f"ts arredondado={int(r['ts'])}ºC")
+                st.write(f"ts-tm= {round(r['delta'])}ºC")
+                st.write(f"Peso em gramas (g/m³) ={r['P']}")
             else:  # Classe B
-                ts_F = (ts_rounded * 9/5) + 32
-                tm_F = (tm_rounded * 9/5) + 32
-                tv_F = get_tv_classB(round(ts_F), round(tm_F), tabela_iv)
                 # Depuração atualizada para classe B
-                st.write(f"ts arredondado={round(ts_F)}ºF")
-                st.write(f"tm={round(tm_F)}ºF")
-                st.write(f"tv={tv_F}ºF")
-                if tv_F:
-                    tv = (tv_F - 32) * 5/9
-                    if ti > tv:
-                        resultado = "ti > tv – ventilar"
-                    else:
-                        resultado = "ti < tv - manter fechado"
+                st.write(f"ts arredondado={int(r['ts_F'])}ºF")
+                st.write(f"tm={int(r['tm_F'])}ºF")
+                st.write(f"tv={r['tv_F']}ºF")
+
+            if r['fora_dominio']:
+                st.warning("Condições fora do domínio das tabelas" + ("" if interpolar else " (usada a margem mais próxima)"))
+            st.success(f"Resultado: {texto_resultado(classe, r['resultado'])}")
+            st.write(f"Dados: T={T}°C, RH={RH}%, Pressão={pressure}hPa, tm={r['tm']:.2f}°C")
+
+    # Painel: veredictos de todas as estações a partir do mesmo snapshot
+    st.divider()
+    st.subheader("Painel de estações")
+    if st.button("Avaliar todas as estações"):
+        try:
+            observacoes = ipma.cache.ultimas(set(city_to_id.values()))
+        except ipma.IPMAErro as e:
+            st.error(f"Erro na API IPMA: {e}. Verifique a conexão ou API.")
+        else:
+            import pandas as pd
+
+            st.dataframe(pd.DataFrame(avaliar_estacoes(decisao, city_to_id, observacoes, ti)), hide_index=True)
+
+    # Relatório diário: todos os Locais a partir de um só snapshot, avaliados e escritos em blocos (climatologia.relatorio)
+    with st.expander("Relatório diário (todos os locais)"):
+        formato = st.radio("Formato", list(relatorio.FORMATOS), horizontal=True)
+        if st.button("Gerar relatório"):
+            try:
+                ultima = ipma.cache.snapshot().ultima
+            except ipma.IPMAErro as e:
+                st.error(f"Erro API IPMA: {e}")
+            else:
+                ficheiro = io.BytesIO()
+                try:
+                    total = relatorio.exportar(relatorio.linhas(
+                        motor_lote, cidades_permitidas, resolvedor.mapeamento(ultima), ultima, ti), ficheiro, formato)
+                except RuntimeError as e:  # Parquet sem pyarrow
+                    st.error(str(e))
                 else:
-                    resultado = "Fora da tabela - Condições fora do range."
-
-            st.success(f"Resultado: {resultado}")
-            st.write(f"Dados: T={T}°C, RH={RH}%, Pressão={pressure}hPa, tm={tm:.2f}°C")
+                    st.download_button(f"Descarregar relatório ({total} linhas, ti={ti}°C)", ficheiro.getvalue(),
+                                       file_name=f"relatorio_paiois.{formato}", mime=relatorio.TIPOS[formato], on_click='ignore')
+
+    # Histórico: horas recentes em que o paiol selecionado podia ter sido ventilado
+    with st.expander("Janelas de ventilação (últimos 7 dias)", key='expansor_historico', on_change='rerun') as expansor:
+        if expansor.open:
+            import pandas as pd
+
+            janelas = historico_obs.horas_ventilaveis(decisao, city_to_id[cidade], ti, classe)
+            st.write(f"{len(janelas['hora'])} horas em que o paiol podia ser ventilado ({cidade}, classe {classe}, ti={ti}°C)")
+            if len(janelas['hora']):
+                st.dataframe(pd.DataFrame({
+                    'Hora (UTC)': janelas['hora'],
+                    'Resultado': [texto_resultado(classe, r) for r in janelas['resultado']],
+                }), hide_index=True)
+
+    # ---------------------- ATLAS ----------------------
+    with st.expander("Atlas de decisão", key='expansor_atlas', on_change='rerun') as expansor:
+        if expansor.open:
+            import altair as alt
+            import pandas as pd
+
+            if interpolar:
+                st.info("O atlas cobre as tabelas compiladas (célula mais próxima); desligue \"Interpolar tabelas\".")
+            else:
+                regioes = pd.DataFrame(decisao.regioes(classe, ti))
+                x, y = regioes.columns[:2]
+                legenda = alt.selection_point(fields=['Resultado'], bind='legend')
+                st.altair_chart(alt.Chart(regioes).mark_rect().encode(
+                    x=alt.X(field=x, type='ordinal'),
+                    y=alt.Y(field=y, type='ordinal', sort='descending'),
+                    color=alt.Color(field='Resultado', type='nominal', scale=alt.Scale(
+                        domain=['ventilar', 'ventilar_rapido', 'fechado', 'fora_da_tabela'],
+                        range=['#2ca02c', '#ffbf00', '#d62728', '#d3d3d3'])),
+                    opacity=alt.condition(legenda, alt.value(1.0), alt.value(0.2)),
+                    tooltip=[x, y, 'Resultado'],
+                ).add_params(legenda).interactive(), width='stretch')
+                st.caption(f"Classe {classe}, ti={ti}°C: cada célula da Tabela {'III' if classe == 'A' else 'IV'}; clicar na legenda destaca uma região")
+
+    # ---------------------- PAIÓIS ----------------------
+    if agendador:
+        with st.expander(f"Paióis registados ({paiois.REGISTO})", key='expansor_paiois', on_change='rerun') as expansor:
+            if expansor.open:
+                import pandas as pd
+
+                st.dataframe(pd.DataFrame(agendador.tabela()), hide_index=True)
+                alteracoes = agendador.veredictos.alteracoes()[-20:]
+                if alteracoes:
+                    st.write("Últimas mudanças de veredicto")
+                    st.dataframe(pd.DataFrame(alteracoes, columns=['Paiol', 'Hora (UTC)', 'Resultado']).assign(
+                        Resultado=lambda df: [NOMES[r] for r in df['Resultado']]), hide_index=True)
+
+    # ---------------------- MÉTRICAS ----------------------
+    # Só com CLIMATOLOGIA_METRICAS=1 (ver climatologia.metricas)
+    if metricas.ativo:
+        with st.expander("Métricas (admin)", key='expansor_metricas', on_change='rerun') as expansor:
+            if expansor.open:
+                import pandas as pd
+
+                st.write("Esta sessão")
+                st.dataframe(pd.DataFrame(metricas_sessao.tabela()), hide_index=True)
+                st.write("Processo")
+                st.dataframe(pd.DataFrame(metricas.processo.tabela()), hide_index=True)
+                st.write("Cache de veredictos (climatologia.memo)")
+                st.dataframe(pd.DataFrame(memo.cache_de(tabelas_compiladas).stats()).T, hide_index=False)
+                st.code(metricas.prometheus(), language='text')
+        metricas.registar('app.render', time.perf_counter() - inicio_render)
 
 elif st.session_state["authentication_status"] is False:
     st.error('Username/password incorreto')
@@ -0,0 +1,77 @@
+"""Erro do ajuste de Stull face à equação do psicrómetro, em todo o domínio da Tabela III.
+
+    python benchmarks/bolbo_humido.py
+    python benchmarks/bolbo_humido.py --pressoes 900 1013 1050 --passo 0.1
+
+Para cada pressão, percorre T (eixo ts da Tabela III, em passos de --passo °C)
+× RH (5 a 100 %) e mostra |tm psicrómetro - tm Stull|: máximo (e onde), média
+e percentil 95. Mostra também a fração de veredictos que mudam (classes A e B,
+uma grelha de ti) com as tabelas compiladas, e o custo de cada método em ns
+por elemento (mediana de --repeticoes chamadas em array).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from climatologia import psicrometria, tabelas  # noqa: E402
+from climatologia.motor import MotorLote  # noqa: E402
+
+
+def grelha(compiladas, passo):
+    """(T, RH) de todo o domínio da Tabela III, achatados."""
+    T = np.arange(compiladas.ts_min, compiladas.ts_min + compiladas.P.shape[0] - 1 + passo / 2, passo)
+    RH = np.arange(5.0, 100.0 + passo / 2, 1.0)
+    return tuple(g.ravel() for g in np.meshgrid(T, RH, indexing='ij'))
+
+
+def ns_por_elemento(metodo, T, RH, pressao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        metodo(T, RH, pressao)
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos)) / len(T) * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pressoes', type=float, nargs='+', default=[950.0, 1013.0, 1040.0])
+    parser.add_argument('--passo', type=float, default=0.5, help="passo de T (°C)")
+    parser.add_argument('--ti', type=float, nargs='+', default=[12.0, 15.0, 18.0, 21.0, 24.0, 27.0])
+    parser.add_argument('--repeticoes', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    compiladas = tabelas.compiladas(RAIZ)
+    T, RH = grelha(compiladas, args.passo)
+    stull = MotorLote(compiladas)
+    psicrometro = MotorLote(compiladas, psicrometria.psicrometrico)
+    tm_stull = psicrometria.stull_wet_bulb(T, RH)
+    print(f"domínio: T {T.min():g}..{T.max():g} °C, RH 5..100 %, {len(T)} pontos por pressão")
+    print(f"{'hPa':>7} {'máx °C':>8} {'em (T, RH)':>14} {'média':>7} {'p95':>7}"
+          + ''.join(f" {'mudam ' + c:>9}" for c in 'AB'))
+    for p in args.pressoes:
+        erro = np.abs(psicrometria.psicrometrico(T, RH, p) - tm_stull)
+        i = int(np.argmax(erro))
+        mudam = []
+        for classe in 'AB':
+            diferentes = sum(int(np.count_nonzero(
+                stull.avaliar(T, RH, ti, classe)['resultado'] != psicrometro.avaliar(T, RH, ti, classe, p)['resultado']))
+                for ti in args.ti)
+            mudam.append(diferentes / (len(T) * len(args.ti)))
+        print(f"{p:>7.0f} {erro[i]:>8.2f} {f'({T[i]:g}, {RH[i]:g})':>14} {erro.mean():>7.2f} {np.percentile(erro, 95):>7.2f}"
+              + ''.join(f" {m:>9.1%}" for m in mudam))
+
+    pressao = np.full_like(T, 1013.0)
+    for nome, metodo in psicrometria.METODOS.items():
+        print(f"{nome:<14} {ns_por_elemento(metodo, T, RH, pressao, args.repeticoes):>7.1f} ns/elemento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Teste de carga do modo multi-processo (climatologia.partilha).
+
+    python benchmarks/carga.py --workers 1 2 4 --duracao 10
+    python benchmarks/carga.py --workers 1 2 4 --sem-partilha
+
+Arranca um substituto local do IPMA (observations.json gravado, com latência)
+e, para cada número de workers, N processos que fazem o trabalho de um rerun
+da app: snapshot do feed, painel de estações e avaliação de um paiol. O feed
+expira a cada --ttl segundos para haver refrescamentos durante o ensaio.
+Mostra os pedidos por segundo (total e por worker), os pedidos que chegaram ao
+"IPMA" e o tempo até ao primeiro pedido servido (inclui a primeira carga do feed).
+Com partilha, os pedidos ao IPMA devem ficar iguais com 1 ou N workers; o débito
+só escala até ao nº de CPUs.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OBSERVACOES = os.path.join(RAIZ, 'climatologia', 'gravacoes', 'observations.json')
+sys.path.insert(0, RAIZ)
+
+from climatologia import fonte, servidor  # noqa: E402
+
+
+def servidor_ipma(atraso):
+    """Substituto local do IPMA (climatologia.servidor) com o observations.json gravado; devolve (url, substituto)."""
+    substituto = servidor.Substituto(os.path.dirname(OBSERVACOES), latencia=atraso)
+    return fonte.urls(substituto.iniciar())[0], substituto
+
+
+def worker(url, config, ttl, duracao, inicio, resultados):
+    sys.path.insert(0, RAIZ)
+    from climatologia import ipma, partilha
+    from climatologia.motor import MotorLote, avaliar_estacoes
+
+    if config:
+        partilha.ativar(config)
+    ipma.cache.url, ipma.cache.ttl = url, ttl
+    compiladas, _, city_to_id = partilha.carregar_pacote(RAIZ)
+    motor = MotorLote(compiladas)
+    estacoes = set(city_to_id.values())
+    inicio.wait()
+    arranque = time.perf_counter()
+    fim = arranque + duracao
+    n, primeiro = 0, None
+    while time.perf_counter() < fim:
+        observacoes = ipma.cache.ultimas(estacoes)
+        avaliar_estacoes(motor, city_to_id, observacoes, 20.0)
+        motor.avaliar_um(21.3, 64.0, 20.0, 'A')
+        n += 1
+        if primeiro is None:
+            primeiro = time.perf_counter() - arranque
+    resultados.put((n, primeiro))
+
+
+def ensaio(n_workers, url, substituto, config, ttl, duracao):
+    ctx = multiprocessing.get_context('spawn')
+    inicio = ctx.Event()
+    resultados = ctx.Queue()
+    pedidos_antes = substituto.pedidos
+    processos = [ctx.Process(target=worker, args=(url, config, ttl, duracao, inicio, resultados)) for _ in range(n_workers)]
+    for p in processos:
+        p.start()
+    time.sleep(1.0)  # imports e tabelas carregados antes de medir
+    inicio.set()
+    medidas = [resultados.get() for _ in processos]
+    for p in processos:
+        p.join()
+    total = sum(n for n, _ in medidas)
+    return total / duracao, substituto.pedidos - pedidos_antes, max(p for _, p in medidas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duracao', type=float, default=10.0, help="segundos de carga por ensaio")
+    parser.add_argument('--ttl', type=float, default=2.0, help="validade do feed em cada worker (segundos)")
+    parser.add_argument('--atraso', type=float, default=0.2, help="latência simulada do IPMA (segundos)")
+    parser.add_argument('--sem-partilha', action='store_true', help="cada worker vai ao IPMA por si (modo atual)")
+    args = parser.parse_args(argv)
+
+    url, substituto = servidor_ipma(args.atraso)
+    print(f"CPUs: {os.cpu_count()}  ttl={args.ttl}s  latência IPMA={args.atraso}s  partilha={'não' if args.sem_partilha else 'ficheiros'}")
+    print(f"{'workers':>8} {'pedidos/s':>10} {'por worker':>11} {'pedidos IPMA':>13} {'1.º pedido (s)':>15}")
+    try:
+        for n in args.workers:
+            with tempfile.TemporaryDirectory() as pasta:
+                config = None if args.sem_partilha else f'ficheiros:{pasta}'
+                debito, pedidos_ipma, primeiro = ensaio(n, url, substituto, config, args.ttl, args.duracao)
+            print(f"{n:>8} {debito:>10.1f} {debito / n:>11.1f} {pedidos_ipma:>13} {primeiro:>15.2f}")
+    finally:
+        substituto.parar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
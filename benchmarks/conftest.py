@@ -0,0 +1,45 @@
+"""Benchmarks (pytest-benchmark) dos caminhos quentes; ver README para gravar e comparar baselines."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from climatologia import tabelas  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OBSERVACOES = os.path.join(RAIZ, 'climatologia', 'gravacoes', 'observations.json')
+
+
+@pytest.fixture(scope='session')
+def compiladas():
+    return tabelas.compiladas(RAIZ)
+
+
+@pytest.fixture(scope='session')
+def grelha_iii(compiladas):
+    """Todas as células (ts, ts-tm) da Tabela III, com uma margem de 3 °C fora do domínio."""
+    ts = np.arange(compiladas.ts_min - 3, compiladas.ts_min + compiladas.P.shape[0] + 3, dtype=float)
+    delta = np.arange(compiladas.delta_min - 3, compiladas.delta_min + compiladas.P.shape[1] + 3, dtype=float)
+    return tuple(g.ravel() for g in np.meshgrid(ts, delta, indexing='ij'))
+
+
+@pytest.fixture(scope='session')
+def grelha_iv(compiladas):
+    """Todas as células (ts, tm) em °F da Tabela IV, com margem."""
+    ts_F = np.arange(compiladas.tsF_min - 3, compiladas.tsF_min + compiladas.tv_F.shape[0] + 3, dtype=float)
+    tm_F = np.arange(compiladas.tmF_min - 3, compiladas.tmF_min + compiladas.tv_F.shape[1] + 3, dtype=float)
+    return tuple(g.ravel() for g in np.meshgrid(ts_F, tm_F, indexing='ij'))
+
+
+@pytest.fixture(scope='session')
+def observacoes_json():
+    with open(OBSERVACOES, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='session')
+def observacoes(observacoes_json):
+    return json.loads(observacoes_json)
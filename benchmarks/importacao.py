@@ -0,0 +1,90 @@
+"""Tempo de import a frio (python -X importtime) dos módulos do arranque.
+
+    python benchmarks/importacao.py
+    python benchmarks/importacao.py --antes HEAD~1   # compara com outro commit
+
+Cada módulo é importado num processo novo (--repeticoes vezes, depois de um
+import de aquecimento que compila os .pyc); mostra a mediana do tempo
+cumulativo e se o pandas/openpyxl foram carregados. Com --antes, o commit
+indicado é extraído numa git worktree temporária e medido da mesma forma.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = (
+    'climatologia.motor',
+    'climatologia.pacote',
+    'climatologia.partilha',
+    'climatologia.cli',
+    'climatologia.autenticacao',
+)
+PESADOS = ('pandas', 'openpyxl')
+
+
+def importar(modulo, raiz):
+    """(µs cumulativos do import de `modulo`, pacotes pesados carregados) num processo novo."""
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=raiz, capture_output=True, text=True, check=True,
+    ).stderr
+    total, pesados = None, set()
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or linha.endswith('| package'):
+            continue
+        _, cumulativo, nome = (campo.strip() for campo in linha.split('|'))
+        if nome == modulo:
+            total = int(cumulativo)
+        if nome in PESADOS:
+            pesados.add(nome)
+    return total, pesados
+
+
+def medir(raiz, repeticoes):
+    resultados = {}
+    for modulo in MODULOS:
+        importar(modulo, raiz)  # aquecimento (.pyc)
+        medidas = [importar(modulo, raiz) for _ in range(repeticoes)]
+        resultados[modulo] = (statistics.median(t for t, _ in medidas), medidas[-1][1])
+    return resultados
+
+
+def _linha(modulo, ms, pesados):
+    return f"{modulo:<28} {ms:>9.1f} {', '.join(sorted(pesados)) or '-':>18}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--antes', help="commit a comparar (extraído numa git worktree temporária)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    depois = medir(RAIZ, args.repeticoes)
+    antes = None
+    if args.antes:
+        with tempfile.TemporaryDirectory() as pasta:
+            arvore = os.path.join(pasta, 'arvore')
+            subprocess.run(['git', 'worktree', 'add', '--detach', arvore, args.antes], cwd=RAIZ, check=True, capture_output=True)
+            try:
+                antes = medir(arvore, args.repeticoes)
+            finally:
+                subprocess.run(['git', 'worktree', 'remove', '--force', arvore], cwd=RAIZ, check=True, capture_output=True)
+
+    print(f"{'módulo':<28} {'ms':>9} {'pesados':>18}" + (f" {'antes (ms)':>11} {'pesados antes':>18}" if antes else ''))
+    for modulo in MODULOS:
+        ms, pesados = depois[modulo]
+        linha = _linha(modulo, ms / 1000, pesados)
+        if antes:
+            ms_antes, pesados_antes = antes[modulo]
+            linha += f" {ms_antes / 1000:>11.1f} {', '.join(sorted(pesados_antes)) or '-':>18}"
+        print(linha)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
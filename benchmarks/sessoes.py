@@ -0,0 +1,171 @@
+"""Gerador de carga: N sessões Streamlit em simultâneo a carregar em "Calcular".
+
+    python benchmarks/sessoes.py --sessoes 1 4 8 --duracao 20
+    python benchmarks/sessoes.py --sessoes 8 --latencia 0.3 --erros 0.1 --refrescar 2
+
+Arranca o substituto do IPMA (climatologia.servidor) com os feeds gravados e
+aponta a app para ele (CLIMATOLOGIA_FONTE). Cada sessão é uma AppTest da app
+numa thread — no servidor Streamlit cada sessão também corre o script numa
+thread do mesmo processo — que escolhe uma cidade ao acaso e carrega em
+"Calcular" (um rerun completo do script), sem pausas. Com --refrescar o feed é
+pedido de novo ao substituto a cada N segundos durante a carga, como faz o
+prefetcher a cada publicação. Mostra os reruns por segundo, a latência de cada
+rerun (p50/p95/p99/máx), quantos deram resultado, "sem dados" ou exceção, e os
+pedidos que chegaram ao "IPMA". Com --semente os ensaios são reprodutíveis.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from unittest.mock import MagicMock  # noqa: E402
+
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest, app_test  # noqa: E402
+
+from climatologia import ipma, servidor  # noqa: E402
+
+_compilar = ScriptCache.get_bytecode
+_bytecode = {}
+_lock = threading.Lock()
+
+
+def _bytecode_partilhado(self, caminho):
+    """Como no servidor Streamlit, o script é compilado uma vez e o bytecode partilhado por todas as sessões.
+
+    A AppTest compila-o a cada rerun (custo que o servidor não tem) e, em
+    threads, o ast.parse do Python 3.11 não é seguro.
+    """
+    with _lock:
+        if caminho not in _bytecode:
+            _bytecode[caminho] = _compilar(self, caminho)
+        return _bytecode[caminho]
+
+
+ScriptCache.get_bytecode = _bytecode_partilhado
+
+
+def _runtime_partilhado():
+    """Um só runtime para todas as sessões, como no servidor Streamlit (caches st.cache_* partilhadas).
+
+    A AppTest põe o seu runtime em Runtime._instance a cada rerun e tira-o no
+    fim; com várias em threads, uma sessão ficava sem runtime a meio do rerun
+    de outra. As AppTest passam a mexer numa subclasse e o Runtime real fica fixo.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type('Runtime', (Runtime,), {})
+
+
+_runtime_partilhado()
+
+
+def sessao(app, duracao, semente, partida, resultados):
+    """Uma sessão: um rerun inicial (não medido) e depois cliques em "Calcular" até acabar o tempo."""
+    aleatorio = random.Random(semente)
+    try:
+        at = AppTest.from_file(app, default_timeout=120).run()
+        if at.exception:
+            raise RuntimeError(f"a app falhou no arranque: {at.exception[0].message}")
+        cidades = at.selectbox[0].options
+    except BaseException:
+        partida.abort()  # o ensaio não fica à espera desta sessão
+        raise
+    latencias, contagem = [], {'resultado': 0, 'sem_dados': 0, 'excecao': 0}
+    partida.wait()  # todas as sessões abertas antes de medir
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        if not at.button:  # o rerun anterior falhou antes de desenhar a página
+            at.run()
+            continue
+        at.selectbox[0].set_value(aleatorio.choice(cidades))
+        at.button[0].click()
+        t = time.perf_counter()
+        at.run()
+        latencias.append(time.perf_counter() - t)
+        if at.exception:
+            contagem['excecao'] += 1
+        elif at.success:
+            contagem['resultado'] += 1
+        else:
+            contagem['sem_dados'] += 1
+    resultados.append((latencias, contagem))
+
+
+def refrescamentos(intervalo, parar):
+    while not parar.wait(intervalo):
+        try:
+            ipma.cache.refrescar()
+        except ipma.IPMAErro:
+            pass
+
+
+def ensaio(app, n, duracao, semente, refrescar):
+    partida, parar, resultados = threading.Barrier(n + 1), threading.Event(), []
+    threads = [threading.Thread(target=sessao, args=(app, duracao, semente + i, partida, resultados)) for i in range(n)]
+    for t in threads:
+        t.start()
+    partida.wait()
+    if refrescar:
+        threading.Thread(target=refrescamentos, args=(refrescar, parar), daemon=True).start()
+    for t in threads:
+        t.join()
+    parar.set()
+    latencias = sorted(x for l, _ in resultados for x in l)
+    contagem = {chave: sum(c[chave] for _, c in resultados) for chave in ('resultado', 'sem_dados', 'excecao')}
+    return latencias, contagem
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] if ordenados else float('nan')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=os.path.join(RAIZ, 'app.py'))
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--duracao', type=float, default=10.0, help="segundos de carga por ensaio")
+    parser.add_argument('--gravacoes', default=servidor.FIXTURES, help="pasta com os feeds gravados")
+    parser.add_argument('--latencia', type=float, default=0.0, help="latência simulada do IPMA (segundos)")
+    parser.add_argument('--erros', type=float, default=0.0, help="fração de pedidos ao IPMA com 503")
+    parser.add_argument('--refrescar', type=float, help="pedir o feed de novo a cada N segundos durante a carga")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    substituto = servidor.Substituto(args.gravacoes, latencia=args.latencia, erros=args.erros, semente=args.semente)
+    os.environ['CLIMATOLOGIA_FONTE'] = substituto.iniciar()
+    os.chdir(os.path.dirname(os.path.abspath(args.app)))  # a app lê as tabelas e o pacote da pasta atual, como no `streamlit run`
+    print(f"CPUs: {os.cpu_count()}  app={os.path.basename(args.app)}  latência IPMA={args.latencia}s  erros={args.erros:.0%}")
+    print(f"{'sessões':>8} {'reruns/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'máx (ms)':>9}"
+          f" {'resultado':>10} {'sem dados':>10} {'exceções':>9} {'pedidos IPMA':>13}")
+    try:
+        for n in args.sessoes:
+            pedidos_antes = substituto.pedidos
+            latencias, contagem = ensaio(args.app, n, args.duracao, args.semente, args.refrescar)
+            ms = [1000 * percentil(latencias, p) for p in (50, 95, 99, 100)]
+            print(f"{n:>8} {len(latencias) / args.duracao:>9.1f} " + ' '.join(f"{x:>9.0f}" for x in ms)
+                  + f" {contagem['resultado']:>10} {contagem['sem_dados']:>10} {contagem['excecao']:>9}"
+                  + f" {substituto.pedidos - pedidos_antes:>13}")
+    except threading.BrokenBarrierError:
+        print("erro: uma sessão falhou no arranque (ver acima)", file=sys.stderr)
+        return 2
+    finally:
+        substituto.parar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Leitura das tabelas/xlsx, pacote compilado e arranque a frio de cada app."""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from climatologia import locais, pacote, tabelas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = ('app.py', 'app_2.py', 'app_3.py', 'app_4.py')
+
+# Corre a app num processo novo, até ao fim do primeiro render (sem cliques); as apps com
+# login arrancam já com sessão iniciada (config.yaml e token de teste, como em tests/test_apps.py)
+ARRANQUE = """
+import os, sys
+from streamlit.testing.v1 import AppTest
+from climatologia import autenticacao
+at = AppTest.from_file(sys.argv[1])
+if os.path.exists(autenticacao.CONFIG):
+    at.session_state['sessao_token'] = autenticacao.emitir_token('ana', 'Ana', autenticacao.segredo())
+at.run(timeout=60)
+sys.exit(1 if at.exception else 0)
+"""
+
+CONFIG = """
+credentials:
+  usernames:
+    ana: {name: Ana, email: ana@example.com, password: $2b$12$abcdefghijklmnopqrstuuFJ6rO1m0Yx1tC0m8bZ5VgN5w1fQk3Ta}
+cookie: {name: climatologia, key: chave-de-teste, expiry_days: 1}
+preauthorized: {emails: []}
+"""
+
+
+def test_ler_csv(benchmark):
+    benchmark(tabelas._ler_tabelas, *tabelas._caminhos(RAIZ))
+
+
+def test_compilar(benchmark):
+    benchmark(tabelas._compilar_ficheiros, *tabelas._caminhos(RAIZ))
+
+
+def test_ler_xlsx(benchmark):
+    benchmark(locais.ler_locais, os.path.join(RAIZ, 'Climatologia_8.xlsx'))
+
+
+def test_ler_pacote(benchmark, tmp_path):
+    caminho = pacote.construir(RAIZ, str(tmp_path / pacote.PACOTE))
+    benchmark(pacote._ler_pacote, caminho)
+
+
+@pytest.fixture(scope='module')
+def pasta_apps(tmp_path_factory):
+    """Cópia das apps e das fontes com um config.yaml de teste; o feed vem de climatologia/gravacoes."""
+    pasta = tmp_path_factory.mktemp('apps')
+    for nome in APPS + ('locais_coordenadas.csv',) + pacote.FONTES:
+        shutil.copy(os.path.join(RAIZ, nome), pasta)
+    (pasta / 'config.yaml').write_text(CONFIG)
+    return str(pasta)
+
+
+def _arrancar(pasta, app):
+    env = dict(os.environ, PYTHONPATH=RAIZ, CLIMATOLOGIA_FONTE=os.path.join(RAIZ, 'climatologia', 'gravacoes'))
+    return subprocess.run([sys.executable, '-c', ARRANQUE, os.path.join(pasta, app)],
+                          cwd=pasta, env=env, capture_output=True).returncode
+
+
+@pytest.mark.parametrize('app', APPS)
+def test_arranque_a_frio(benchmark, pasta_apps, app):
+    assert _arrancar(pasta_apps, app) == 0, f"{app} falhou no primeiro render (ver tests/test_apps.py)"
+    benchmark.pedantic(_arrancar, args=(pasta_apps, app), rounds=3, iterations=1)
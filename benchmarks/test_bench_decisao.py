@@ -0,0 +1,40 @@
+"""Caminho completo: JSON do IPMA gravado → índice por estação → veredictos A e B."""
+import json
+
+import numpy as np
+
+from climatologia import atlas, ipma
+from climatologia.locais import CITY_TO_ID
+from climatologia.motor import MotorLote, avaliar_estacoes
+
+TI = np.arange(0.0, 40.0, 0.5)
+
+
+def _decidir(motor, corpo):
+    indice = ipma.IndiceEstacoes()
+    indice.atualizar(json.loads(corpo))
+    estacoes = sorted(indice.ultima)
+    T = np.array([indice.ultima[s][1] for s in estacoes])
+    RH = np.array([indice.ultima[s][2] for s in estacoes])
+    # Todas as estações × classes A/B × uma gama de temperaturas interiores
+    return motor.avaliar(T[:, None, None], RH[:, None, None], TI[None, None, :], np.array(['A', 'B'])[None, :, None])
+
+
+def test_decisao_feed_completo(benchmark, compiladas, observacoes_json):
+    res = benchmark(_decidir, MotorLote(compiladas), observacoes_json)
+    benchmark.extra_info['veredictos'] = len(res['resultado'])
+
+
+def test_painel_estacoes(benchmark, compiladas, observacoes):
+    indice = ipma.IndiceEstacoes()
+    indice.atualizar(observacoes)
+    benchmark(avaliar_estacoes, MotorLote(compiladas), CITY_TO_ID, indice.ultima, 20.0)
+
+
+def test_avaliar_um(benchmark, compiladas):
+    benchmark(MotorLote(compiladas).avaliar_um, 21.3, 64.0, 20.0, 'A')
+
+
+def test_decisao_feed_completo_atlas(benchmark, compiladas, observacoes_json):
+    res = benchmark(_decidir, atlas.Atlas(atlas.construir(compiladas)), observacoes_json)
+    benchmark.extra_info['veredictos'] = len(res['resultado'])
@@ -0,0 +1,53 @@
+"""Psicrometria e lookups das tabelas, em chamada escalar (uma por clique) e em lote."""
+import numpy as np
+
+from climatologia.psicrometria import psicrometrico, stull_wet_bulb
+
+T = np.linspace(-10, 50, 601)
+RH = np.linspace(5, 100, 96)
+T_LOTE, RH_LOTE = (g.ravel() for g in np.meshgrid(T, RH))
+
+
+def test_stull_escalar(benchmark):
+    benchmark(stull_wet_bulb, 21.3, 64.0)
+
+
+def test_stull_array(benchmark):
+    benchmark(stull_wet_bulb, T_LOTE, RH_LOTE)
+
+
+def test_psicrometrico_escalar(benchmark):
+    benchmark(psicrometrico, 21.3, 64.0, 1008.0)
+
+
+def test_psicrometrico_array(benchmark):
+    benchmark(psicrometrico, T_LOTE, RH_LOTE, np.full_like(T_LOTE, 1008.0))
+
+
+def test_get_P_escalar(benchmark, compiladas):
+    benchmark(compiladas.get_P, 24.0, 6.0)
+
+
+def test_get_P_grelha(benchmark, compiladas, grelha_iii):
+    benchmark(compiladas.get_P, *grelha_iii)
+
+
+def test_get_tv_tl_A_grelha(benchmark, compiladas, grelha_iii):
+    benchmark(compiladas.get_tv_tl_A, *grelha_iii)
+
+
+def test_get_tv_tl_escalar(benchmark, compiladas):
+    benchmark(compiladas.get_tv_tl, 11.9)
+
+
+def test_get_tv_tl_todos_P(benchmark, compiladas):
+    P = np.unique(compiladas.P[np.isfinite(compiladas.P)])
+    benchmark(compiladas.get_tv_tl, P)
+
+
+def test_get_tv_classB_escalar(benchmark, compiladas):
+    benchmark(compiladas.get_tv_classB, 77.0, 72.0)
+
+
+def test_get_tv_classB_grelha(benchmark, compiladas, grelha_iv):
+    benchmark(compiladas.get_tv_classB, *grelha_iv)
@@ -0,0 +1 @@
+"""Núcleo partilhado das apps de Climatologia Aplicada a Paióis."""
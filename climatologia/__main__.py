@@ -0,0 +1,5 @@
+import sys
+
+from climatologia.cli import main
+
+sys.exit(main())
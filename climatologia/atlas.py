@@ -0,0 +1,194 @@
+"""Atlas de veredictos: a superfície de decisão das tabelas compiladas, pré-calculada.
+
+Com as tabelas compiladas o veredicto só depende de inteiros limitados — a
+célula da Tabela III (round(T), round(T - tm)) na classe A, a da Tabela IV
+(ts_F, tm_F) na classe B — e de ti. O atlas enumera todas as células × uma
+grelha de ti (passo PASSO_TI, de abaixo do menor limiar a acima do maior) num
+array uint8 por classe: depois do tm, cada veredicto é uma leitura do array.
+Um ti fora da grelha fica com o veredicto da ponta (já está para lá de todos os
+limiares); um ti entre dois pontos (p.ex. 18.25 com passo 0.1) é comparado com
+os limiares da célula, também guardados. O resultado é sempre o de MotorLote
+sobre as mesmas tabelas, incluindo a margem fora do domínio.
+
+Gerar o artefacto (climatologia_atlas.npz) com `python -m climatologia.atlas
+[pasta]`; `de(compiladas)` usa-o quando corresponde às tabelas e senão constrói
+o atlas em memória, uma vez por processo.
+"""
+import argparse
+import hashlib
+import math
+import os
+import sys
+import threading
+
+import numpy as np
+
+from climatologia import metricas, tabelas
+from climatologia.motor import NOMES, decisao_A, decisao_B, validar_classes
+from climatologia.psicrometria import stull_wet_bulb
+
+VERSAO = 1
+ATLAS = 'climatologia_atlas.npz'
+PASSO_TI = 0.1  # °C; os limiares da III-bis têm uma casa decimal
+
+_arrays = None
+_lock = threading.Lock()
+
+
+def assinatura(compiladas):
+    """SHA-256 das grelhas compiladas: o atlas só serve as tabelas de onde saiu."""
+    h = hashlib.sha256()
+    for nome, array in sorted(compiladas.como_arrays().items()):
+        h.update(nome.encode())
+        h.update(np.ascontiguousarray(array).tobytes())
+    return h.hexdigest()
+
+
+def construir(compiladas, passo_ti=PASSO_TI):
+    """Dict de arrays do atlas (o conteúdo do .npz) para estas tabelas."""
+    t = compiladas
+    limiar_B = (t.tv_F - 32) * 5/9
+    limiares = np.concatenate([a[np.isfinite(a)].ravel() for a in (t.tv_A, t.tl_A, limiar_B)])
+    ti_min, ti_max = math.floor(limiares.min()) - 1, math.ceil(limiares.max()) + 1
+    ti = np.round(ti_min + np.arange(round((ti_max - ti_min) / passo_ti) + 1) * passo_ti, 6)
+
+    veredicto_A, _ = decisao_A(ti, t.P[..., None], t.tv_A[..., None], t.tl_A[..., None])
+    veredicto_B, _ = decisao_B(ti, t.tv_F[..., None])
+    return dict(
+        t.como_arrays(),
+        versao=np.array(VERSAO),
+        assinatura=np.array(assinatura(t)),
+        ti=ti,
+        fora_iiibis=t.fora_dominio_iiibis(t.P),
+        veredicto_A=veredicto_A.astype(np.uint8),
+        veredicto_B=veredicto_B.astype(np.uint8),
+    )
+
+
+def gravar(arrays, caminho):
+    np.savez_compressed(caminho, **arrays)
+    return caminho
+
+
+def ler(caminho):
+    with metricas.medir('atlas.ler'), np.load(caminho, allow_pickle=False) as dados:
+        return {nome: dados[nome] for nome in dados.files}
+
+
+def _arrays_de(compiladas, caminho):
+    if os.path.exists(caminho):
+        arrays = ler(caminho)
+        if int(arrays['versao']) == VERSAO and str(arrays['assinatura']) == assinatura(compiladas):
+            return arrays
+    with metricas.medir('atlas.construir'):
+        return construir(compiladas)
+
+
+def de(compiladas, bolbo_humido=stull_wet_bulb, pasta='.'):
+    """Atlas destas tabelas: do artefacto da pasta se estiver atualizado, senão construído (uma vez por processo)."""
+    global _arrays
+    with _lock:
+        if _arrays is None or _arrays[0] is not compiladas:
+            _arrays = (compiladas, _arrays_de(compiladas, os.path.join(pasta, ATLAS)))
+        return Atlas(_arrays[1], bolbo_humido)
+
+
+class Atlas:
+    """Veredictos por leitura direta do atlas; `avaliar` tem a assinatura de MotorLote.avaliar."""
+
+    interpolado = False
+
+    def __init__(self, arrays, bolbo_humido=stull_wet_bulb):
+        self.tabelas = tabelas.TabelasCompiladas.de_arrays(arrays)
+        self.ti = arrays['ti']
+        self.fora_iiibis = arrays['fora_iiibis']
+        self.veredicto_A = arrays['veredicto_A']
+        self.veredicto_B = arrays['veredicto_B']
+        self.bolbo_humido = bolbo_humido
+
+    def _indice_ti(self, ti):
+        """(índice na grelha de ti, True onde esse ponto dá o veredicto exato de ti)."""
+        passo = (self.ti[-1] - self.ti[0]) / (len(self.ti) - 1)
+        k = np.clip(np.rint((np.nan_to_num(ti) - self.ti[0]) / passo), 0, len(self.ti) - 1).astype(int)
+        return k, (self.ti[k] == ti) | (ti < self.ti[0]) | (ti > self.ti[-1])
+
+    def _veredicto_A(self, i, j, ti):
+        k, exato = self._indice_ti(ti)
+        resultado = self.veredicto_A[i, j, k]
+        if not exato.all():
+            t, entre = self.tabelas, ~exato
+            resultado[entre] = decisao_A(ti[entre], t.P[i[entre], j[entre]], t.tv_A[i[entre], j[entre]],
+                                         t.tl_A[i[entre], j[entre]])[0]
+        return resultado
+
+    def _veredicto_B(self, i, j, ti):
+        k, exato = self._indice_ti(ti)
+        resultado = self.veredicto_B[i, j, k]
+        if not exato.all():
+            entre = ~exato
+            resultado[entre] = decisao_B(ti[entre], self.tabelas.tv_F[i[entre], j[entre]])[0]
+        return resultado
+
+    def avaliar(self, T, RH, ti, classe, pressao=None):
+        """Dict de arrays com tm, `resultado` e `fora_dominio`, iguais aos de MotorLote.avaliar."""
+        with metricas.medir('atlas.avaliar'):
+            T, RH, ti, classe, pressao = (a.ravel() for a in np.broadcast_arrays(
+                np.asarray(T, dtype=float), np.asarray(RH, dtype=float),
+                np.asarray(ti, dtype=float), np.asarray(classe),
+                np.asarray(np.nan if pressao is None else pressao, dtype=float),
+            ))
+            validar_classes(classe)
+            t = self.tabelas
+            tm = self.bolbo_humido(T, RH, pressao)
+            ts = np.round(T)
+            i, j = t._celula_iii(ts, T - tm)
+            ts_F, tm_F = np.round(ts * 9/5 + 32), np.round(np.round(tm) * 9/5 + 32)
+            iF = np.clip(ts_F.astype(int) - t.tsF_min, 0, t.tv_F.shape[0] - 1)
+            jF = np.clip(tm_F.astype(int) - t.tmF_min, 0, t.tv_F.shape[1] - 1)
+
+            classe_A = classe == 'A'
+            return {
+                'tm': tm,
+                'resultado': np.where(classe_A, self._veredicto_A(i, j, ti), self._veredicto_B(iF, jF, ti)),
+                'fora_dominio': np.where(classe_A, t.fora_dominio_iii(ts, T - tm) | self.fora_iiibis[i, j],
+                                         t.fora_dominio_iv(ts_F, tm_F)),
+            }
+
+    def regioes(self, classe, ti):
+        """Superfície de decisão para um ti: uma linha por célula da tabela (colunas para um DataFrame).
+
+        Classe A nos eixos da Tabela III (ts e ts - tm em °C), classe B nos da Tabela IV (°F).
+        """
+        t = self.tabelas
+        if classe == 'A':
+            eixos = ('ts (°C)', 'ts - tm (°C)')
+            i, j = (g.ravel() for g in np.indices(t.P.shape))
+            resultado = self._veredicto_A(i, j, np.full(len(i), float(ti)))
+            valores = (i + t.ts_min, j + t.delta_min)
+        else:
+            eixos = ('ts (°F)', 'tm (°F)')
+            i, j = (g.ravel() for g in np.indices(t.tv_F.shape))
+            resultado = self._veredicto_B(i, j, np.full(len(i), float(ti)))
+            valores = (i + t.tsF_min, j + t.tmF_min)
+        return {
+            eixos[0]: valores[0],
+            eixos[1]: valores[1],
+            'Resultado': [NOMES[r] for r in resultado.tolist()],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o atlas de veredictos (climatologia_atlas.npz) das tabelas da pasta.")
+    parser.add_argument('pasta', nargs='?', default='.')
+    parser.add_argument('--passo-ti', type=float, default=PASSO_TI, help="passo da grelha de ti (°C)")
+    parser.add_argument('-o', '--saida', help=f"ficheiro de saída (por omissão, {ATLAS} na pasta)")
+    args = parser.parse_args(argv)
+    arrays = construir(tabelas.compiladas(args.pasta), args.passo_ti)
+    caminho = gravar(arrays, args.saida or os.path.join(args.pasta, ATLAS))
+    print(f"{caminho}: {len(arrays['ti'])} valores de ti, "
+          f"{arrays['veredicto_A'].size + arrays['veredicto_B'].size} veredictos, {os.path.getsize(caminho)} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Login das apps (streamlit-authenticator) sem reler o config.yaml nem refazer o bcrypt a cada rerun.
+
+- O config.yaml é lido uma vez por processo e relido só quando o ficheiro muda
+  (climatologia.cache).
+- O `stauth.Authenticate` fica na sessão e é reconstruído quando o config muda.
+  Não é partilhado entre sessões: guarda o utilizador e o gestor de cookies da
+  sessão que fez login.
+- Um login bem sucedido deixa na sessão um token assinado (HMAC-SHA256) válido
+  por VALIDADE_SESSAO segundos. Enquanto for válido, os reruns seguintes não
+  passam pelo formulário nem pela verificação bcrypt. A chave deriva da chave do
+  cookie e das credenciais: mudar o config.yaml invalida todos os tokens.
+  Quando o token expira, o autenticador volta a verificar o cookie de
+  reautenticação (ou mostra o formulário) e o login seguinte emite um token novo.
+"""
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import time
+
+import streamlit as st
+import streamlit_authenticator as stauth
+import yaml
+from yaml.loader import SafeLoader
+
+from climatologia.cache import em_cache
+
+CONFIG = 'config.yaml'
+VALIDADE_SESSAO = 15 * 60  # segundos
+
+_TOKEN = 'sessao_token'
+_AUTENTICADOR = 'autenticador'
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b'=').decode()
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def _ler_config(caminho):
+    with open(caminho) as file:
+        config = yaml.load(file, Loader=SafeLoader)
+    material = json.dumps([config['cookie']['key'], config['credentials']], sort_keys=True, default=str)
+    return config, hashlib.sha256(material.encode()).digest()
+
+
+def config(caminho=CONFIG):
+    """config.yaml em cache por processo (só de leitura)."""
+    return em_cache(_ler_config, caminho)[0]
+
+
+def segredo(caminho=CONFIG):
+    """Chave dos tokens de sessão; muda com a chave do cookie ou com as credenciais."""
+    return em_cache(_ler_config, caminho)[1]
+
+
+def emitir_token(utilizador, nome, chave, validade=VALIDADE_SESSAO, agora=None):
+    """Token 'dados.assinatura' com o utilizador e o prazo, assinado com `chave`."""
+    expira = (time.time() if agora is None else agora) + validade
+    dados = _b64(json.dumps({'utilizador': utilizador, 'nome': nome, 'expira': expira}).encode())
+    return dados + '.' + _b64(hmac.new(chave, dados.encode(), hashlib.sha256).digest())
+
+
+def ler_token(token, chave, agora=None):
+    """Dados do token, ou None se faltar, estiver adulterado, assinado com outra chave ou expirado."""
+    if not token or token.count('.') != 1:
+        return None
+    dados, assinatura = token.split('.')
+    try:
+        valida = hmac.compare_digest(_de_b64(assinatura), hmac.new(chave, dados.encode(), hashlib.sha256).digest())
+        conteudo = json.loads(_de_b64(dados)) if valida else None
+    except ValueError:
+        return None
+    if conteudo is None or conteudo['expira'] <= (time.time() if agora is None else agora):
+        return None
+    return conteudo
+
+
+def autenticador(caminho=CONFIG):
+    """stauth.Authenticate desta sessão, reconstruído só quando o config.yaml muda."""
+    cfg = config(caminho)
+    guardado = st.session_state.get(_AUTENTICADOR)
+    if guardado is None or guardado[0] is not cfg:
+        objeto = stauth.Authenticate(
+            copy.deepcopy(cfg['credentials']),  # a biblioteca pode alterar as credenciais
+            cfg['cookie']['name'],
+            cfg['cookie']['key'],
+            cfg['cookie']['expiry_days'],
+        )
+        guardado = st.session_state[_AUTENTICADOR] = (cfg, objeto)
+    return guardado[1]
+
+
+def sessao_valida(caminho=CONFIG):
+    """True se a sessão tem um token válido; nesse caso repõe o estado de login sem o formulário.
+
+    Com um token expirado (ou inválido) só o token é descartado: o login volta a
+    depender do autenticador, que aceita o cookie de reautenticação ainda válido
+    sem pedir a senha (não é um logout).
+    """
+    token = st.session_state.pop(_TOKEN, None)
+    dados = ler_token(token, segredo(caminho))
+    if dados is None:
+        if token is not None:
+            st.session_state['authentication_status'] = None  # senão o login() nem olha para o cookie
+        return False
+    st.session_state[_TOKEN] = token
+    st.session_state['authentication_status'] = True
+    st.session_state['name'] = dados['nome']
+    st.session_state['username'] = dados['utilizador']
+    return True
+
+
+def registar_sessao(caminho=CONFIG):
+    """Depois de um login bem sucedido, guarda o token da sessão."""
+    if st.session_state.get('authentication_status'):
+        st.session_state[_TOKEN] = emitir_token(
+            st.session_state.get('username'), st.session_state.get('name'), segredo(caminho))
+
+
+def logout(autenticador, *args, **kwargs):
+    """authenticator.logout que também descarta o token da sessão."""
+    autenticador.logout(*args, **kwargs)
+    if not st.session_state.get('authentication_status'):
+        st.session_state.pop(_TOKEN, None)
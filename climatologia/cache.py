@@ -0,0 +1,34 @@
+"""Cache por processo de dados lidos do disco, invalidada pelo mtime dos ficheiros."""
+import os
+import threading
+
+_entradas = {}
+_lock = threading.Lock()
+
+
+def _assinatura(caminhos):
+    assinatura = []
+    for caminho in caminhos:
+        st = os.stat(caminho)
+        assinatura.append((os.path.abspath(caminho), st.st_mtime_ns, st.st_size))
+    return tuple(assinatura)
+
+
+def em_cache(funcao, *caminhos):
+    """Devolve funcao(*caminhos), reutilizando o resultado enquanto nenhum dos ficheiros mudar.
+
+    O resultado é partilhado por todas as sessões do processo: tratar como só de leitura.
+    """
+    assinatura = _assinatura(caminhos)
+    chave = (funcao.__module__, funcao.__qualname__, tuple(a[0] for a in assinatura))
+    with _lock:
+        entrada = _entradas.get(chave)
+        if entrada is None or entrada[0] != assinatura:
+            entrada = (assinatura, funcao(*caminhos))
+            _entradas[chave] = entrada
+        return entrada[1]
+
+
+def limpar():
+    with _lock:
+        _entradas.clear()
@@ -0,0 +1,329 @@
+"""Linha de comandos: avaliação de paióis em lote, sem Streamlit.
+
+    python -m climatologia avaliar paiois.csv > veredictos.csv
+    cat paiois.jsonl | python -m climatologia avaliar -f json -s json
+    python -m climatologia vigiar paiois.yaml >> alteracoes.jsonl
+    python -m climatologia reprocessar arquivo/*.json --comparar tabelas_corrigidas/ > diferencas.csv
+    python -m climatologia relatorio --ti 20 -f pdf -o relatorio.pdf
+
+Cada registo traz `ti`, `classe` e, ou `T` e `RH` (e `pressao` em hPa, opcional),
+ou uma `estacao` (ID IPMA) / `cidade` (ver climatologia.locais.CITY_TO_ID); nesse
+caso usa-se a última observação do IPMA, com um único snapshot do feed para todo o lote. Os registos
+são lidos e escritos em blocos, pelo que a memória não cresce com o tamanho da entrada.
+
+`vigiar` reavalia os paióis do registo (climatologia.paiois) a cada publicação
+do IPMA e escreve em JSON Lines só as mudanças de veredicto.
+
+`reprocessar` passa o histórico (climatologia.reprocessamento) pelo motor e
+escreve a linha do tempo de cada paiol ou, com --comparar/--comparar-modo/
+--comparar-bolbo-humido, os intervalos em que duas versões divergem.
+
+`relatorio` escreve o veredicto de todos os Locais, a partir de um só snapshot
+do IPMA, em CSV, Parquet ou PDF (climatologia.relatorio).
+
+Com CLIMATOLOGIA_FONTE os feeds vêm de ficheiros gravados ou do servidor
+substituto em vez do IPMA (climatologia.fonte).
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from climatologia import fonte, interpolacao, ipma, pacote, paiois, partilha, prefetch, psicrometria, relatorio, reprocessamento, resolucao
+from climatologia.motor import CLASSES, NOMES, MotorLote, texto_resultado
+
+CAMPOS_SAIDA = ('T', 'RH', 'tm', 'delta', 'P', 'tv', 'tl', 'tv_F', 'fora_dominio', 'resultado', 'texto')
+
+
+def ler_registos(fonte, formato):
+    """Itera dicts a partir de CSV (com cabeçalho) ou JSON (JSON Lines ou um array)."""
+    if formato == 'csv':
+        yield from csv.DictReader(fonte)
+        return
+    for linha in fonte:
+        linha = linha.strip()
+        if not linha:
+            continue
+        if linha.startswith('['):
+            yield from json.loads(linha + fonte.read())
+            return
+        yield json.loads(linha)
+
+
+def _formato(caminho, formato):
+    if formato:
+        return formato
+    return 'json' if caminho and os.path.splitext(caminho)[1].lower() in ('.json', '.jsonl') else 'csv'
+
+
+def _vazio(valor):
+    return valor is None or valor == ''
+
+
+def _ti(registo):
+    try:
+        return float(registo['ti'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"registo sem ti numérico: {registo}") from None
+
+
+def _classe(registo):
+    classe = str(registo.get('classe') or '').strip().upper()
+    if classe not in CLASSES:
+        raise ValueError(f"registo com classe {registo.get('classe')!r} (esperado A ou B): {registo}")
+    return classe
+
+
+class Avaliador:
+    """Resolve T/RH de cada registo (diretamente ou pela estação) e avalia blocos no motor."""
+
+    def __init__(self, motor, city_to_id, cache=None):
+        self.motor = motor
+        self.city_to_id = city_to_id
+        self.cache = cache or ipma.cache
+        self._indice = None
+
+    def _observacao(self, registo):
+        station_id = registo.get('estacao') or self.city_to_id.get(registo.get('cidade'))
+        if not station_id:
+            raise ValueError(f"registo sem T/RH nem estacao/cidade conhecida: {registo}")
+        if self._indice is None:
+            self._indice = self.cache.snapshot()
+        return self._indice.ultima.get(str(station_id))
+
+    def avaliar(self, registos):
+        """Devolve os registos do bloco com os campos de CAMPOS_SAIDA acrescentados."""
+        T = np.full(len(registos), np.nan)
+        RH = np.full(len(registos), np.nan)
+        pressao = np.full(len(registos), np.nan)  # em falta: psicrometria.PRESSAO_PADRAO
+        for i, registo in enumerate(registos):
+            if not _vazio(registo.get('T')) and not _vazio(registo.get('RH')):
+                T[i], RH[i] = float(registo['T']), float(registo['RH'])
+                if not _vazio(registo.get('pressao')):
+                    pressao[i] = float(registo['pressao'])
+            else:
+                obs = self._observacao(registo)
+                if obs is not None:
+                    T[i], RH[i] = obs[1], obs[2]
+                    pressao[i] = np.nan if obs[3] is None else obs[3]
+        ti = np.array([_ti(r) for r in registos])
+        classe = np.array([_classe(r) for r in registos])
+        res = self.motor.avaliar(np.nan_to_num(T), np.nan_to_num(RH), ti, classe, pressao)
+
+        saida = []
+        for i, registo in enumerate(registos):
+            linha = dict(registo)
+            sem_dados = np.isnan(T[i])
+            for campo in ('T', 'RH'):
+                linha[campo] = None if sem_dados else float((T if campo == 'T' else RH)[i])
+            for campo in ('tm', 'delta', 'P', 'tv', 'tl', 'tv_F'):
+                valor = float(res[campo][i])
+                linha[campo] = None if sem_dados or math.isnan(valor) else valor
+            linha['fora_dominio'] = None if sem_dados else bool(res['fora_dominio'][i])
+            codigo = int(res['resultado'][i])
+            linha['resultado'] = 'sem_dados' if sem_dados else NOMES[codigo]
+            linha['texto'] = "Sem dados recentes" if sem_dados else texto_resultado(classe[i], codigo)
+            saida.append(linha)
+        return saida
+
+
+def _blocos(registos, tamanho):
+    it = iter(registos)
+    while True:
+        bloco = list(itertools.islice(it, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def _escrever(linhas, saida, formato, estado, campos_saida=CAMPOS_SAIDA):
+    if formato == 'json':
+        for linha in linhas:
+            saida.write(json.dumps(linha, ensure_ascii=False) + '\n')
+        return
+    if not linhas:
+        return
+    if 'escritor' not in estado:
+        campos = [c for c in linhas[0] if c not in campos_saida] + list(campos_saida)
+        estado['escritor'] = csv.DictWriter(saida, fieldnames=campos, extrasaction='ignore')
+        estado['escritor'].writeheader()
+    estado['escritor'].writerows(linhas)
+
+
+def cmd_avaliar(args):
+    compiladas, _, city_to_id = pacote.carregar(args.pasta)
+    tabelas = interpolacao.interpoladas(args.pasta) if args.modo == 'interpolado' else compiladas
+    avaliador = Avaliador(MotorLote(tabelas, psicrometria.METODOS[args.bolbo_humido]), city_to_id)
+    estado = {}
+    for caminho in args.ficheiros or ['-']:
+        fonte = sys.stdin if caminho == '-' else open(caminho, newline='', encoding='utf-8-sig')
+        try:
+            for bloco in _blocos(ler_registos(fonte, _formato(caminho if caminho != '-' else None, args.formato)), args.bloco):
+                _escrever(avaliador.avaliar(bloco), sys.stdout, args.saida, estado)
+                sys.stdout.flush()
+        finally:
+            if fonte is not sys.stdin:
+                fonte.close()
+    return 0
+
+
+def cmd_vigiar(args):
+    partilha.ativar()  # com workers Streamlit em CLIMATOLOGIA_PARTILHA, usa os mesmos pedidos ao IPMA
+    compiladas, cidades, city_to_id = partilha.carregar_pacote(args.pasta)
+    if not os.path.exists(args.registo):
+        raise ValueError(f"registo de paióis não encontrado: {args.registo}")
+    resolvedor = resolucao.ativar(cidades, city_to_id, args.pasta)
+    agendador = paiois.ativar(MotorLote(compiladas), resolvedor.mapeamento, args.registo, args.base)
+
+    def escrever(alteracoes):
+        for a in alteracoes:
+            sys.stdout.write(json.dumps(a, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    agendador.ao_mudar(escrever)
+    ipma.cache_estacoes.snapshot()  # candidatas do resolvedor antes do filtro e da primeira passagem
+    ipma.cache.filtrar(resolvedor.estacoes() | agendador.estacoes())
+    if args.uma_vez:
+        agendador.avaliar(ipma.cache.snapshot())  # já avaliado se havia snapshot; sem mudanças, não escreve
+        return 0
+    prefetch.iniciar()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_reprocessar(args):
+    _, _, city_to_id = pacote.carregar(args.pasta)
+    por_estacao = reprocessamento.estacoes_dos_paiois(paiois.ler_registo(args.registo), city_to_id)
+    versao = (args.pasta, args.modo, args.bolbo_humido)
+    comparar = None
+    if args.comparar or args.comparar_modo or args.comparar_bolbo_humido:
+        comparar = (args.comparar or args.pasta, args.comparar_modo or args.modo,
+                    args.comparar_bolbo_humido or args.bolbo_humido)
+        if comparar == versao:
+            raise ValueError("--comparar/--comparar-modo/--comparar-bolbo-humido indicam a mesma versão")
+
+    base = args.base
+    direta = base is None and len(args.ficheiros) == 1 and reprocessamento.e_sqlite(args.ficheiros[0])
+    if direta:
+        base = args.ficheiros[0]  # já é uma base do histórico: usada diretamente
+    elif not args.ficheiros and base is None:
+        raise ValueError("sem observações: indicar ficheiros ou --base")
+    temporaria = base is None
+    if temporaria:
+        fd, base = tempfile.mkstemp(prefix='reprocessamento-', suffix='.sqlite')
+        os.close(fd)
+
+    try:
+        if args.ficheiros and not direta:
+            inicio = time.perf_counter()
+            novas = reprocessamento.importar(args.ficheiros, base, por_estacao)
+            print(f"{novas} horas de estação importadas para {base} em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+        inicio = time.perf_counter()
+        estado, total, resumo = {}, 0, {}
+        for r in reprocessamento.reprocessar(base, por_estacao, versao, comparar, args.processos,
+                                             args.inicio, args.fim, args.bloco):
+            _escrever(r['linhas'], sys.stdout, args.saida, estado, campos_saida=())
+            sys.stdout.flush()
+            total += r['horas']
+            resumo.update(r['resumo'])
+        print(f"{len(por_estacao)} estações, {total} horas de estação reprocessadas em {time.perf_counter() - inicio:.1f}s",
+              file=sys.stderr)
+        if comparar is not None:
+            for nome, r in sorted(resumo.items()):
+                pares = ', '.join(f"{a}→{b}: {n}" for (a, b), n in sorted(r['pares'].items()))
+                percentagem = 100 * r['diferentes'] / r['horas'] if r['horas'] else 0.0
+                print(f"{nome}: {r['diferentes']} de {r['horas']} horas diferentes ({percentagem:.2f}%)"
+                      + (f" [{pares}]" if pares else ''), file=sys.stderr)
+    finally:
+        if temporaria:
+            os.remove(base)
+    return 0
+
+
+def cmd_relatorio(args):
+    compiladas, cidades, city_to_id = pacote.carregar(args.pasta)
+    tabelas = interpolacao.interpoladas(args.pasta) if args.modo == 'interpolado' else compiladas
+    motor = MotorLote(tabelas, psicrometria.METODOS[args.bolbo_humido])
+    resolvedor = resolucao.ativar(cidades, city_to_id, args.pasta)
+    ipma.cache_estacoes.snapshot()  # candidatas do resolvedor antes do filtro
+    ipma.cache.filtrar(resolvedor.estacoes())
+    ultima = ipma.cache.snapshot().ultima  # o mesmo snapshot para todos os locais
+    blocos = relatorio.linhas(motor, cidades, resolvedor.mapeamento(ultima), ultima, args.ti, args.classe, args.bloco)
+    if args.saida == '-':
+        total = relatorio.exportar(blocos, sys.stdout.buffer, args.formato)
+        sys.stdout.flush()
+    else:
+        with open(args.saida, 'wb') as destino:
+            total = relatorio.exportar(blocos, destino, args.formato)
+    print(f"{len(cidades)} locais, {total} linhas", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m climatologia', description="Climatologia Aplicada a Paióis")
+    parser.add_argument('--pasta', default='.', help="pasta com as tabelas, o xlsx e o pacote compilado")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('avaliar', help="avalia registos (T/RH ou estação, ti, classe) de ficheiros ou do stdin")
+    p.add_argument('ficheiros', nargs='*', help="ficheiros CSV/JSON ('-' ou nada para stdin)")
+    p.add_argument('-f', '--formato', choices=('csv', 'json'), help="formato da entrada (por omissão, pela extensão; stdin: csv)")
+    p.add_argument('-s', '--saida', choices=('csv', 'json'), default='csv', help="formato da saída (json = JSON Lines)")
+    p.add_argument('--bloco', type=int, default=10000, help="registos avaliados de cada vez")
+    p.add_argument('--modo', choices=('proximo', 'interpolado'), default='proximo',
+                   help="célula mais próxima das tabelas (como nas apps) ou interpolação (climatologia.interpolacao)")
+    p.add_argument('--bolbo-humido', choices=tuple(psicrometria.METODOS), default='stull',
+                   help="método de tm: ajuste de Stull ou equação do psicrómetro com a pressão (climatologia.psicrometria)")
+    p.set_defaults(funcao=cmd_avaliar)
+
+    p = sub.add_parser('vigiar', help="reavalia os paióis do registo a cada snapshot do IPMA e escreve as mudanças")
+    p.add_argument('registo', nargs='?', default=paiois.REGISTO, help="registo YAML dos paióis")
+    p.add_argument('--base', default=paiois.BASE, help="base SQLite dos veredictos")
+    p.add_argument('--uma-vez', action='store_true', help="uma só passagem (p.ex. a partir do cron) em vez de ficar a correr")
+    p.set_defaults(funcao=cmd_vigiar)
+
+    p = sub.add_parser('reprocessar', help="veredictos dos paióis sobre o histórico (linha do tempo ou diferenças entre versões)")
+    p.add_argument('ficheiros', nargs='*', help="observações: JSON com a forma do observations.json, CSV ou base SQLite do histórico")
+    p.add_argument('--registo', default=paiois.REGISTO, help="registo YAML dos paióis")
+    p.add_argument('--base', help="base SQLite onde juntar as observações (por omissão, temporária)")
+    p.add_argument('--modo', choices=('proximo', 'interpolado'), default='proximo', help="modo das tabelas de --pasta")
+    p.add_argument('--comparar', metavar='PASTA', help="compara com as tabelas desta pasta e escreve só as diferenças")
+    p.add_argument('--comparar-modo', choices=('proximo', 'interpolado'), help="modo da versão comparada (por omissão, --modo)")
+    p.add_argument('--bolbo-humido', choices=tuple(psicrometria.METODOS), default='stull', help="método de tm")
+    p.add_argument('--comparar-bolbo-humido', choices=tuple(psicrometria.METODOS),
+                   help="método de tm da versão comparada (por omissão, --bolbo-humido)")
+    p.add_argument('--inicio', help="primeira hora (p.ex. 2024-01-01T00:00)")
+    p.add_argument('--fim', help="hora a seguir à última")
+    p.add_argument('--processos', type=int, help="processos do pool (por omissão, um por CPU)")
+    p.add_argument('--bloco', type=int, default=reprocessamento.BLOCO, help="horas de uma estação avaliadas de cada vez")
+    p.add_argument('-s', '--saida', choices=('csv', 'json'), default='csv', help="formato da saída (json = JSON Lines)")
+    p.set_defaults(funcao=cmd_reprocessar)
+
+    p = sub.add_parser('relatorio', help="veredicto de todos os Locais a partir de um só snapshot (CSV, Parquet ou PDF)")
+    p.add_argument('--ti', type=float, required=True, help="temperatura interior (°C)")
+    p.add_argument('--classe', nargs='+', choices=('A', 'B'), default=['A', 'B'], help="classes do relatório")
+    p.add_argument('-f', '--formato', choices=tuple(relatorio.FORMATOS), default='csv')
+    p.add_argument('-o', '--saida', default='-', help="ficheiro de saída ('-' para stdout)")
+    p.add_argument('--bloco', type=int, default=relatorio.BLOCO, help="locais avaliados e escritos de cada vez")
+    p.add_argument('--modo', choices=('proximo', 'interpolado'), default='proximo', help="modo das tabelas")
+    p.add_argument('--bolbo-humido', choices=tuple(psicrometria.METODOS), default='stull', help="método de tm")
+    p.set_defaults(funcao=cmd_relatorio)
+
+    args = parser.parse_args(argv)
+    try:
+        fonte.ativar()  # CLIMATOLOGIA_FONTE: feeds gravados ou servidor substituto em vez do IPMA
+        return args.funcao(args)
+    except (ValueError, KeyError, RuntimeError, ipma.IPMAErro) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
@@ -0,0 +1,94 @@
+"""Cliente HTTP do IPMA: sessão com pool de ligações, timeouts, retries e single-flight."""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = (3.05, 15)  # (ligação, leitura) em segundos
+
+
+class _Voo:
+    """Pedido em curso, partilhado pelos chamadores que pedem o mesmo URL ao mesmo tempo."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resposta = None
+        self.erro = None
+
+
+class ClienteIPMA:
+    """GET com retries em erros 5xx/rede (backoff exponencial com jitter).
+
+    Pedidos idênticos em simultâneo (mesmo URL e cabeçalhos) são colapsados num
+    só: o primeiro faz o pedido e os restantes esperam e recebem a mesma resposta.
+    """
+
+    def __init__(self, timeout=TIMEOUT, tentativas=3, backoff=0.5, backoff_max=8.0, sessao=None):
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        if sessao is None:
+            sessao = requests.Session()
+            sessao.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+            sessao.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.sessao = sessao
+        self._voos = {}
+        self._lock = threading.Lock()
+        self.pedidos = 0
+        self.retries = 0
+        self.colapsados = 0
+
+    def _espera(self, tentativa):
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** tentativa))
+
+    def _pedir(self, url, headers, stream=False):
+        for tentativa in range(self.tentativas):
+            ultima = tentativa == self.tentativas - 1
+            self.pedidos += 1
+            try:
+                response = self.sessao.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if ultima:
+                    raise
+            else:
+                if response.status_code < 500 or ultima:
+                    return response
+                response.close()
+            self.retries += 1
+            time.sleep(self._espera(tentativa))
+
+    def get(self, url, headers=None, stream=False):
+        """Devolve a requests.Response; erros de rede após a última tentativa são propagados.
+
+        Com `stream` o corpo fica por ler (response.iter_content) e o pedido não é
+        partilhado, já que um corpo em fluxo só pode ser consumido uma vez.
+        """
+        headers = dict(headers or {})
+        if stream:
+            return self._pedir(url, headers, stream=True)
+        chave = (url, tuple(sorted(headers.items())))
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+            else:
+                self.colapsados += 1
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resposta
+        try:
+            voo.resposta = self._pedir(url, headers)
+            return voo.resposta
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._voos[chave]
+            voo.evento.set()
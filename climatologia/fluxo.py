@@ -0,0 +1,127 @@
+"""Leitura em fluxo do observations.json, guardando só as estações pedidas.
+
+`response.json()` constrói um dict por estação e por hora (milhares, para o
+feed nacional) para depois se usar meia dúzia. Aqui o corpo é lido aos pedaços:
+cada estação de cada hora ("id": {obs} ou null) é reconhecida por uma expressão
+regular e só as pedidas passam por json.loads; as restantes são saltadas sem
+criar objetos Python, e a memória fica limitada a um pedaço do feed.
+"""
+import codecs
+import json
+import re
+
+PEDACO = 64 * 1024  # bytes lidos de cada vez
+
+_ESPACO = re.compile(r'\s*')
+_CHAVE = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+# Uma estação dentro de uma hora: "id": objeto plano (sem objetos aninhados) ou null, e o separador.
+# A primeira forma (id sem escapes) é a rápida; a segunda só é tentada quando ela falha.
+_ESTACAO = re.compile(r'\s*"([^"\\]*)"\s*:\s*(null|\{[^}]*\})\s*([,}])')
+_ESTACAO_ESCAPES = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*(null|\{[^}]*\})\s*([,}])')
+
+
+def _chave(texto):
+    return json.loads(f'"{texto}"') if '\\' in texto else texto
+
+
+class _Leitor:
+    """Texto descodificado de um iterável de pedaços de bytes UTF-8, consumido da esquerda."""
+
+    def __init__(self, pedacos):
+        self._pedacos = iter(pedacos)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.fim = False
+
+    def ler_mais(self):
+        pedaco = next(self._pedacos, None)
+        if pedaco is None:
+            texto = self._decoder.decode(b'', final=True)
+            self.fim = True
+        else:
+            texto = self._decoder.decode(pedaco)
+        self.buf = self.buf[self.pos:] + texto
+        self.pos = 0
+
+    def casar(self, regex):
+        """Match de `regex` na posição atual, lendo mais enquanto puder estar cortado a meio."""
+        while True:
+            m = regex.match(self.buf, self.pos)
+            if self.fim or (m is not None and m.end() < len(self.buf)):
+                break
+            self.ler_mais()
+        if m is not None:
+            self.pos = m.end()
+        return m
+
+    def comeca_por(self, texto):
+        """Consome `texto` se vier a seguir (depois de espaços); nunca lê mais do que precisa."""
+        self.casar(_ESPACO)
+        while not self.fim and len(self.buf) - self.pos < len(texto):
+            self.ler_mais()
+        if self.buf.startswith(texto, self.pos):
+            self.pos += len(texto)
+            return True
+        return False
+
+    def simbolo(self, esperados):
+        self.casar(_ESPACO)
+        if self.pos >= len(self.buf) or self.buf[self.pos] not in esperados:
+            encontrado = self.buf[self.pos:self.pos + 20] or 'fim'
+            raise ValueError(f"JSON inválido: esperado {esperados!r}, encontrado {encontrado!r}")
+        self.pos += 1
+        return self.buf[self.pos - 1]
+
+    def obrigatorio(self, regex, descricao):
+        m = self.casar(regex)
+        if m is None:
+            raise ValueError(f"JSON inválido: esperado {descricao} em {self.buf[self.pos:self.pos + 20]!r}")
+        return m
+
+
+def ler_observacoes(pedacos, estacoes):
+    """{timestamp: {station_id: obs ou None}} só com as `estacoes` pedidas.
+
+    `pedacos` é um iterável de bytes (p.ex. response.iter_content). O resultado
+    tem a mesma forma que o JSON completo, pelo que IndiceEstacoes o trata igual.
+    Levanta ValueError se o corpo não for JSON com a estrutura do feed.
+    """
+    return dict(iterar_horas(pedacos, estacoes))
+
+
+def iterar_horas(pedacos, estacoes=None):
+    """Gera (timestamp, {station_id: obs ou None} ou None) à medida que o JSON é lido.
+
+    Sem `estacoes`, guarda todas. Só uma hora fica em memória de cada vez, pelo
+    que serve para arquivos com a forma do feed e muitos meses de dados.
+    """
+    leitor = _Leitor(pedacos)
+    estacoes = None if estacoes is None else {str(e) for e in estacoes}
+    leitor.simbolo('{')
+    fim = '}' if leitor.comeca_por('}') else ','
+    while fim == ',':
+        ts = _chave(leitor.obrigatorio(_CHAVE, 'timestamp').group(1))
+        if leitor.comeca_por('null'):
+            yield ts, None
+        else:
+            hora = {}
+            leitor.simbolo('{')
+            fim = '}' if leitor.comeca_por('}') else ','
+            while fim == ',':
+                # Caminho rápido (é aqui que passa quase todo o feed): match direto no buffer
+                m = _ESTACAO.match(leitor.buf, leitor.pos)
+                if m is None or m.end() >= len(leitor.buf):
+                    m = leitor.casar(_ESTACAO) or leitor.obrigatorio(_ESTACAO_ESCAPES, 'estação')
+                else:
+                    leitor.pos = m.end()
+                station_id, obs, fim = m.groups()
+                if '\\' in station_id:
+                    station_id = _chave(station_id)
+                if estacoes is None or station_id in estacoes:
+                    hora[station_id] = None if obs == 'null' else json.loads(obs)
+            yield ts, hora
+        fim = leitor.simbolo(',}')
+    leitor.casar(_ESPACO)
+    if leitor.pos < len(leitor.buf):
+        raise ValueError("JSON inválido: dados depois do fim")
@@ -0,0 +1,92 @@
+"""Origem dos feeds do IPMA: ao vivo, uma cópia local em ficheiros ou um servidor substituto.
+
+Escolhida por CLIMATOLOGIA_FONTE (ou `ativar(config)`), antes do primeiro pedido:
+
+- vazio ou `ipma`: api.ipma.pt (por omissão);
+- uma pasta: o observations.json e o stations.json lá gravados, servidos às
+  caches como se viessem da rede (URL file://, ETag do mtime e 304), pelo que
+  todo o caminho das caches e do cliente corre igual; substituir um ficheiro
+  equivale a uma publicação nova do IPMA;
+- `http://host:porta`: um espelho com os caminhos da API do IPMA, p.ex. o
+  substituto de climatologia.servidor (latência e erros configuráveis).
+"""
+import email.utils
+import io
+import os
+import threading
+import urllib.parse
+import urllib.request
+
+import requests
+from requests.adapters import BaseAdapter
+
+from climatologia import ipma
+
+_config = None
+_lock = threading.Lock()
+
+
+class AdaptadorFicheiros(BaseAdapter):
+    """Adaptador do requests para URLs file:// com as respostas condicionais do IPMA (200/304/404)."""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        caminho = urllib.request.url2pathname(urllib.parse.urlparse(request.url).path)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        try:
+            with open(caminho, 'rb') as f:
+                estado = os.fstat(f.fileno())
+                etag = f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+                if request.headers.get('If-None-Match') == etag:
+                    response.status_code, corpo = 304, b''
+                else:
+                    response.status_code, corpo = 200, f.read()
+        except FileNotFoundError:
+            response.status_code, corpo = 404, b''
+        else:
+            response.headers['ETag'] = etag
+            response.headers['Last-Modified'] = email.utils.formatdate(estado.st_mtime, usegmt=True)
+        response.headers['Content-Length'] = str(len(corpo))
+        response.raw = io.BytesIO(corpo)
+        return response
+
+    def close(self):
+        pass
+
+
+def urls(config):
+    """(url das observações, url das estações) de uma configuração de CLIMATOLOGIA_FONTE."""
+    if not config or config == 'ipma':
+        return ipma.OBSERVATIONS_URL, ipma.STATIONS_URL
+    if config.startswith(('http://', 'https://')):
+        base = config.rstrip('/')
+        caminho = urllib.parse.urlparse(ipma.OBSERVATIONS_URL).path.rsplit('/', 1)[0]
+        return f'{base}{caminho}/observations.json', f'{base}{caminho}/stations.json'
+    if not os.path.isdir(config):
+        raise ValueError(f"CLIMATOLOGIA_FONTE: {config!r} não é 'ipma', um URL http(s) nem uma pasta")
+    pasta = os.path.abspath(config)
+    return tuple('file://' + urllib.request.pathname2url(os.path.join(pasta, nome))
+                 for nome in ('observations.json', 'stations.json'))
+
+
+def ativar(config=None, caches=None):
+    """Aponta as caches do IPMA para a origem de CLIMATOLOGIA_FONTE (idempotente); devolve a configuração."""
+    global _config
+    config = config or os.environ.get('CLIMATOLOGIA_FONTE', '')
+    with _lock:
+        if _config is None:
+            caches = caches or (ipma.cache, ipma.cache_estacoes)
+            for cache, url in zip(caches, urls(config)):
+                cache.url = url
+                if url.startswith('file://'):
+                    cache.cliente.sessao.mount('file://', AdaptadorFicheiros())
+            _config = config
+        return _config or 'ipma'
+
+
+def descricao():
+    """Texto curto sobre a origem dos dados quando não é o IPMA ao vivo (None se for)."""
+    if not _config or _config == 'ipma':
+        return None
+    return f"Modo offline: dados IPMA de {_config}"
@@ -0,0 +1,131 @@
+"""Histórico local das observações do IPMA (SQLite), para tendências e janelas de ventilação.
+
+Cada snapshot do feed é acrescentado à base; a chave (estação, hora) elimina
+duplicados, e a tabela sem rowid fica ordenada por estação e hora, pelo que uma
+consulta de uma estação num intervalo de dias é uma leitura contígua.
+"""
+import contextlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from climatologia import ipma
+from climatologia.motor import VENTILAR, VENTILAR_RAPIDO
+
+BASE = 'historico_observacoes.sqlite'
+FORMATO_HORA = '%Y-%m-%dT%H:%M'  # formato das horas no observations.json (UTC)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS observacoes (
+    station_id TEXT NOT NULL,
+    hora TEXT NOT NULL,
+    temperatura REAL NOT NULL,
+    humidade REAL NOT NULL,
+    pressao REAL,
+    PRIMARY KEY (station_id, hora)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observacoes_hora ON observacoes (hora);
+"""
+
+_historico = None
+_lock = threading.Lock()
+
+
+class HistoricoObservacoes:
+    def __init__(self, caminho=BASE):
+        self.caminho = caminho
+        with self._ligar() as con:
+            con.executescript(_ESQUEMA)
+
+    @contextlib.contextmanager
+    def _ligar(self):
+        # O `with` da ligação só faz commit/rollback; closing() fecha-a (senão fica aberta até ao GC)
+        with contextlib.closing(sqlite3.connect(self.caminho, timeout=30)) as con, con:
+            yield con
+
+    def gravar(self, indice):
+        """Acrescenta o histórico de um IndiceEstacoes; devolve o nº de horas novas gravadas."""
+        linhas = [
+            (station_id, hora, T, RH, pressao)
+            for station_id, horas in indice.historico.items()
+            for hora, (T, RH, pressao) in horas.items()
+        ]
+        with self._ligar() as con:
+            antes = con.total_changes
+            con.executemany("INSERT OR IGNORE INTO observacoes VALUES (?, ?, ?, ?, ?)", linhas)
+            return con.total_changes - antes
+
+    def gravar_feed(self, data):
+        """Acrescenta um observations.json já descodificado ({hora: {estação: obs}})."""
+        indice = ipma.IndiceEstacoes()
+        indice.atualizar(data)
+        return self.gravar(indice)
+
+    def gravar_linhas(self, linhas):
+        """Acrescenta (station_id, hora, T, RH, pressão) de um iterável, numa transação; devolve quantas eram novas.
+
+        O iterável é consumido à medida que é gravado (arquivos grandes sem os ter em memória).
+        """
+        with self._ligar() as con:
+            antes = con.total_changes
+            con.executemany("INSERT OR IGNORE INTO observacoes VALUES (?, ?, ?, ?, ?)", linhas)
+            return con.total_changes - antes
+
+    def iterar_serie(self, station_id, inicio=None, fim=None, bloco=100_000):
+        """Como `serie`, em blocos de até `bloco` horas (memória limitada para anos de dados)."""
+        with self._ligar() as con:
+            cursor = con.execute(
+                "SELECT hora, temperatura, humidade, pressao FROM observacoes"
+                " WHERE station_id = ? AND hora >= ? AND hora < ? ORDER BY hora",
+                (station_id, inicio or '', fim or '9999'),
+            )
+            while linhas := cursor.fetchmany(bloco):
+                horas, T, RH, pressao = zip(*linhas)
+                yield {
+                    'hora': np.array(horas, dtype=str),
+                    'temperatura': np.array(T, dtype=float),
+                    'humidade': np.array(RH, dtype=float),
+                    'pressao': np.array([np.nan if p is None else p for p in pressao], dtype=float),
+                }
+
+    def serie(self, station_id, inicio=None, fim=None):
+        """Observações da estação com inicio <= hora < fim, como dict de arrays NumPy."""
+        with self._ligar() as con:
+            linhas = con.execute(
+                "SELECT hora, temperatura, humidade, pressao FROM observacoes"
+                " WHERE station_id = ? AND hora >= ? AND hora < ? ORDER BY hora",
+                (station_id, inicio or '', fim or '9999'),
+            ).fetchall()
+        horas, T, RH, pressao = zip(*linhas) if linhas else ((), (), (), ())
+        return {
+            'hora': np.array(horas, dtype=str),
+            'temperatura': np.array(T, dtype=float),
+            'humidade': np.array(RH, dtype=float),
+            'pressao': np.array([np.nan if p is None else p for p in pressao], dtype=float),
+        }
+
+    def veredictos(self, motor, station_id, ti, classe, inicio=None, fim=None):
+        """Veredicto de cada hora do intervalo para um paiol (ti, classe), numa só passagem do motor."""
+        serie = self.serie(station_id, inicio, fim)
+        res = motor.avaliar(serie['temperatura'], serie['humidade'], ti, classe, serie['pressao'])
+        return {'hora': serie['hora'], 'resultado': res['resultado']}
+
+    def horas_ventilaveis(self, motor, station_id, ti, classe, dias=7, agora=None):
+        """Horas dos últimos `dias` em que o paiol podia ser ventilado (VENTILAR ou VENTILAR_RAPIDO)."""
+        agora = agora or datetime.now(timezone.utc)
+        inicio = (agora - timedelta(days=dias)).strftime(FORMATO_HORA)
+        v = self.veredictos(motor, station_id, ti, classe, inicio=inicio)
+        ventilavel = np.isin(v['resultado'], (VENTILAR, VENTILAR_RAPIDO))
+        return {chave: valores[ventilavel] for chave, valores in v.items()}
+
+
+def ativar(caminho=BASE, cache=None):
+    """Grava no histórico cada snapshot novo da cache de observações (uma vez por processo)."""
+    global _historico
+    with _lock:
+        if _historico is None:
+            _historico = HistoricoObservacoes(caminho)
+            (cache or ipma.cache).ao_atualizar(_historico.gravar)
+        return _historico
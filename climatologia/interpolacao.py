@@ -0,0 +1,147 @@
+"""Motor de tabelas por interpolação, alternativo ao "closest match" das grelhas compiladas.
+
+- Tabela III: bilinear na grelha retilínea (ts, ts-tm), com os passos de 5 °C do topo.
+- Tabela III-bis: linear por troços em P (tv e tl são monótonos em P, e a interpolação também).
+- Tabela IV: grelha inteira (ts, tm) em °F triangulada ao longo das diagonais ts-tm
+  constante, que são as fronteiras da banda (tm de ts-10 a ts-1) onde a tabela tem
+  valores; cada ponto é interpolado no triângulo que o contém (baricêntrico).
+
+Ao contrário das grelhas compiladas, fora do domínio não há aproximação à margem:
+o valor é NaN e `fora_dominio_*` devolve True (na Tabela IV, também fora da
+banda). Células vazias da Tabela III ("_") dão NaN, como nas compiladas.
+Selecionar com `MotorLote(interpoladas())`.
+"""
+import numpy as np
+
+from climatologia import metricas, tabelas
+from climatologia.cache import em_cache
+
+
+def _celulas(eixo, x):
+    """Índice da célula [eixo[i], eixo[i+1]] de cada x e a posição relativa t ∈ [0, 1]."""
+    i = np.clip(np.searchsorted(eixo, x, side='right') - 1, 0, len(eixo) - 2)
+    return i, (x - eixo[i]) / (eixo[i + 1] - eixo[i])
+
+
+def _fora(eixo, x):
+    return ~((x >= eixo[0]) & (x <= eixo[-1]))
+
+
+def _combinar(pesos, valores):
+    """Σ peso·valor, ignorando vértices de peso 0 (que podem ser NaN); NaN se faltar algum com peso."""
+    total = np.zeros(np.shape(pesos[0]))
+    falta = np.zeros(np.shape(pesos[0]), dtype=bool)
+    for peso, valor in zip(pesos, valores):
+        usado = peso > 0
+        total += np.where(usado, peso * np.nan_to_num(valor), 0.0)
+        falta |= usado & np.isnan(valor)
+    return np.where(falta, np.nan, total)
+
+
+class TabelasInterpoladas:
+    """Mesma interface de lookups que tabelas.TabelasCompiladas, com valores interpolados."""
+
+    interpolado = True
+
+    def __init__(self, ts, delta, P, P_bis, tv_bis, tl_bis, tsF, tmF, tv_F):
+        self.ts = ts
+        self.delta = delta
+        self.P = P
+        self.P_bis = P_bis
+        self.tv_bis = tv_bis
+        self.tl_bis = tl_bis
+        self.tsF = tsF
+        self.tmF = tmF
+        self.tv_F = tv_F
+        for array in (ts, delta, P, P_bis, tv_bis, tl_bis, tsF, tmF, tv_F):
+            array.flags.writeable = False  # partilhadas entre sessões
+
+    def fora_dominio_iii(self, ts, delta):
+        return _fora(self.ts, np.asarray(ts, dtype=float)) | _fora(self.delta, np.asarray(delta, dtype=float))
+
+    def fora_dominio_iiibis(self, P):
+        P = np.asarray(P, dtype=float)
+        return np.isfinite(P) & _fora(self.P_bis, P)
+
+    def fora_dominio_iv(self, ts_F, tm_F):
+        return np.isnan(self.get_tv_classB(ts_F, tm_F))
+
+    def get_P(self, ts, delta):
+        """P (g/m³) bilinear na Tabela III; NaN fora do domínio ou junto a células vazias."""
+        with metricas.medir('lookup.get_P'):
+            ts, delta = np.asarray(ts, dtype=float), np.asarray(delta, dtype=float)
+            i, u = _celulas(self.ts, ts)
+            j, v = _celulas(self.delta, delta)
+            P = _combinar(
+                ((1 - u) * (1 - v), u * (1 - v), (1 - u) * v, u * v),
+                (self.P[i, j], self.P[i + 1, j], self.P[i, j + 1], self.P[i + 1, j + 1]),
+            )
+            return tabelas._escalar(np.where(self.fora_dominio_iii(ts, delta), np.nan, P))
+
+    def get_tv_tl(self, P):
+        """(tv, tl) da Tabela III-bis, lineares em P; NaN fora da gama de P da tabela."""
+        with metricas.medir('lookup.get_tv_tl'):
+            P = np.asarray(P, dtype=float)
+            invalido = ~np.isfinite(P) | _fora(self.P_bis, P)
+            tv = np.where(invalido, np.nan, np.interp(np.nan_to_num(P), self.P_bis, self.tv_bis))
+            tl = np.where(invalido, np.nan, np.interp(np.nan_to_num(P), self.P_bis, self.tl_bis))
+            return tabelas._escalar(tv), tabelas._escalar(tl)
+
+    def get_tv_tl_A(self, ts, delta):
+        with metricas.medir('lookup.get_tv_tl_A'):
+            return self.get_tv_tl(self.get_P(ts, delta))
+
+    def get_tv_classB(self, ts_F, tm_F):
+        """tv (°F) interpolado na Tabela IV triangulada; NaN fora da banda da tabela."""
+        with metricas.medir('lookup.get_tv_classB'):
+            ts_F, tm_F = np.asarray(ts_F, dtype=float), np.asarray(tm_F, dtype=float)
+            i, u = _celulas(self.tsF, ts_F)
+            j, v = _celulas(self.tmF, tm_F)
+            f00, f10 = self.tv_F[i, j], self.tv_F[i + 1, j]
+            f01, f11 = self.tv_F[i, j + 1], self.tv_F[i + 1, j + 1]
+            # Triângulo inferior (u ≥ v): (0,0), (1,0), (1,1); superior: (0,0), (0,1), (1,1)
+            inferior = u >= v
+            tv = np.where(
+                inferior,
+                _combinar((1 - u, u - v, v), (f00, f10, f11)),
+                _combinar((1 - v, v - u, u), (f00, f01, f11)),
+            )
+            fora = _fora(self.tsF, ts_F) | _fora(self.tmF, tm_F)
+            return tabelas._escalar(np.where(fora, np.nan, tv))
+
+
+def interpolar(tabela_iii, tabela_iiibis, tabela_iv):
+    """Interpolantes a partir das tabelas lidas com pandas (tabelas.carregar)."""
+    return interpolar_valores(*tabelas.valores_de(tabela_iii, tabela_iiibis, tabela_iv))
+
+
+def interpolar_valores(iii, iiibis, iv):
+    """Prepara os interpolantes a partir dos arrays de tabelas.ler_valores (corre uma vez, no arranque)."""
+    ts, delta, P = iii
+    tabelas.verificar_ts(ts)
+    linhas, colunas = np.argsort(ts), np.argsort(delta)
+
+    P_bis, tv_bis, tl_bis = iiibis
+    ordem_bis = np.argsort(P_bis, kind='stable')
+
+    completas = np.isfinite(iv[0]) & np.isfinite(iv[1]) & np.isfinite(iv[2])
+    ts_iv, tm_iv, tv_iv = (coluna[completas] for coluna in iv)
+    tsF = np.arange(ts_iv.min(), ts_iv.max() + 1, dtype=float)
+    tmF = np.arange(tm_iv.min(), tm_iv.max() + 1, dtype=float)
+    tv_F = np.full((len(tsF), len(tmF)), np.nan)
+    tv_F[(ts_iv - tsF[0]).astype(int), (tm_iv - tmF[0]).astype(int)] = tv_iv
+
+    return TabelasInterpoladas(
+        ts[linhas], delta[colunas], P[np.ix_(linhas, colunas)],
+        P_bis[ordem_bis], tv_bis[ordem_bis], tl_bis[ordem_bis],
+        tsF, tmF, tv_F,
+    )
+
+
+def _interpolar_ficheiros(caminho_iii, caminho_iiibis, caminho_iv):
+    return interpolar_valores(*tabelas.ler_valores(caminho_iii, caminho_iiibis, caminho_iv))
+
+
+def interpoladas(pasta='.'):
+    """TabelasInterpoladas dos CSV da pasta, em cache por processo como tabelas.compiladas."""
+    return em_cache(_interpolar_ficheiros, *tabelas._caminhos(pasta))
@@ -0,0 +1,406 @@
+"""Caches partilhadas dos feeds do IPMA (observações e estações).
+
+O feed observations.json traz todas as estações, hora a hora. Em vez de ser
+descarregado a cada clique em "Calcular", é mantido um único snapshot por
+processo, indexado por estação, que serve todas as sessões Streamlit.
+"""
+import logging
+import threading
+import time
+
+import requests
+
+from climatologia import fluxo, metricas
+from climatologia.cliente import ClienteIPMA
+
+OBSERVATIONS_URL = "https://api.ipma.pt/open-data/observation/meteorology/stations/observations.json"
+STATIONS_URL = "https://api.ipma.pt/open-data/observation/meteorology/stations/stations.json"
+INTERVALO_IPMA = 3600  # o IPMA publica as observações de hora a hora (segundos)
+ESPERA_FALHA = 60  # após uma falha, tentar de novo ao fim deste tempo (segundos)
+HORAS_REVISTAS = 3  # horas já vistas relidas a cada snapshot: o IPMA preenche valores em atraso
+
+log = logging.getLogger(__name__)
+
+
+class IPMAErro(Exception):
+    """Falha ao obter o feed do IPMA: código diferente de 200/304 ou sem resposta."""
+
+    def __init__(self, status_code=None, motivo=None):
+        super().__init__(f"código {status_code}" if status_code is not None else f"sem resposta ({motivo})")
+        self.status_code = status_code
+        self.motivo = motivo
+
+
+SENTINELA = -99.0  # valor usado pelo IPMA para campos sem leitura
+
+
+def _valor(obs, campo):
+    """Valor numérico do campo, ou None se ausente, inválido ou sentinela."""
+    try:
+        valor = float(obs[campo])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return None if valor == SENTINELA else valor
+
+
+class IndiceEstacoes:
+    """Última observação válida e histórico horário de cada estação.
+
+    `ultima[station_id]` guarda (timestamp, T, RH, pressão) e `historico[station_id]`
+    guarda {timestamp: (T, RH, pressão)}. Registos sem temperatura ou humidade
+    são ignorados; a pressão fica None quando em falta (-99.0 ou campo ausente).
+    O índice é atualizado incrementalmente: cada snapshot só processa as horas
+    ainda não vistas e as HORAS_REVISTAS mais recentes já vistas (valores que
+    chegam, mudam ou desaparecem numa publicação posterior), e descarta as que
+    saíram da janela do feed.
+    """
+
+    def __init__(self):
+        self.ultima = {}
+        self.historico = {}
+        self._timestamps = set()
+
+    def copia(self):
+        """Cópia independente, para atualizar sem afetar quem ainda lê a atual."""
+        novo = IndiceEstacoes()
+        novo.ultima = dict(self.ultima)
+        novo.historico = {station_id: dict(horas) for station_id, horas in self.historico.items()}
+        novo._timestamps = set(self._timestamps)
+        return novo
+
+    @property
+    def hora_mais_recente(self):
+        return max(self._timestamps) if self._timestamps else None
+
+    def atualizar(self, data):
+        """Incorpora um novo snapshot {timestamp: {estação: obs}}; devolve o nº de horas novas."""
+        novos = sorted(ts for ts in data if ts not in self._timestamps)
+        revistas = sorted(ts for ts in data if ts in self._timestamps)[-HORAS_REVISTAS:]
+        # As horas que saíram e as revistas são retiradas; as revistas voltam a entrar com os valores atuais
+        retiradas = self._timestamps.difference(data).union(revistas)
+        afetadas = []
+        if retiradas:
+            for station_id, horas in self.historico.items():
+                comuns = retiradas.intersection(horas)
+                if comuns:
+                    for ts in comuns:
+                        del horas[ts]
+                    afetadas.append(station_id)
+
+        for ts in revistas + novos:
+            for station_id, obs in (data[ts] or {}).items():
+                if not obs:
+                    continue
+                T = _valor(obs, 'temperatura')
+                RH = _valor(obs, 'humidade')
+                if T is None or RH is None:
+                    continue
+                registo = (T, RH, _valor(obs, 'pressao'))
+                self.historico.setdefault(station_id, {})[ts] = registo
+                atual = self.ultima.get(station_id)
+                if atual is None or ts > atual[0]:
+                    self.ultima[station_id] = (ts,) + registo
+
+        for station_id in afetadas:
+            horas = self.historico[station_id]
+            if not horas:
+                del self.historico[station_id]
+                del self.ultima[station_id]
+            elif self.ultima[station_id][0] in retiradas:
+                ts = max(horas)
+                self.ultima[station_id] = (ts,) + horas[ts]
+        self._timestamps = set(data)
+        return len(novos)
+
+
+class FeedCache:
+    """Snapshot de um feed do IPMA partilhado entre sessões, refrescado no máximo uma vez por `ttl`.
+
+    O refrescamento usa pedidos condicionais (ETag / If-Modified-Since): um 304
+    mantém o snapshot atual e só renova o prazo de validade. Um snapshot novo é
+    construído à parte e trocado atomicamente, pelo que os leitores nunca veem
+    um estado intermédio. Se o IPMA falhar depois de já haver dados, continua a
+    servir o último snapshot bom e volta a tentar ao fim de ESPERA_FALHA segundos.
+
+    Com `em_fundo` ativo (ver climatologia.prefetch) os leitores nunca vão à rede
+    depois da primeira carga: é o prefetcher que chama `refrescar`.
+    """
+
+    nome = 'feed'  # prefixo das métricas (climatologia.metricas)
+    partilha = None  # climatologia.partilha.Partilha no modo multi-processo (ver partilha.ativar)
+
+    def __init__(self, url, ttl=INTERVALO_IPMA, cliente=None):
+        self.url = url
+        self.ttl = ttl
+        self.cliente = cliente or ClienteIPMA()
+        self.em_fundo = False
+        self.acordar = None  # com o prefetcher: pede-lhe um ciclo já (ver pedir_refrescamento)
+        self.ouvintes = []
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._expira = 0.0
+        self._etag = None
+        self._last_modified = None
+        self.atualizado_em = None  # time.time() da última resposta 200/304
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.nao_modificado = 0
+        self.falhas = 0
+        self.latencia_ultima = 0.0
+        self.latencia_total = 0.0
+
+    def _incorporar(self, anterior, data):
+        """Novo snapshot a partir do anterior (None na primeira carga) e do JSON recebido."""
+        raise NotImplementedError
+
+    em_fluxo = False  # ler o corpo aos pedaços em `_ler` (pedido com stream=True)
+
+    def _ler(self, response):
+        """JSON do corpo de uma resposta 200; ValueError se for inválido."""
+        metricas.registar_bytes(f'ipma_{self.nome}.payload', len(response.content))
+        return response.json()
+
+    def _descarregar(self):
+        """Novo snapshot, ou None se nada mudou; no modo partilhado só um processo vai ao IPMA."""
+        if self.partilha is not None:
+            return self.partilha.descarregar(self)
+        return self._descarregar_ipma()
+
+    def _descarregar_ipma(self, publicar=None):
+        """Pedido (condicional) ao IPMA; `publicar(data)` recebe o JSON lido, ou None num 304."""
+        headers = {}
+        if self._snapshot is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+        inicio = time.perf_counter()
+        try:
+            with metricas.medir(f'ipma_{self.nome}.rede'):
+                response = self.cliente.get(self.url, headers=headers, stream=self.em_fluxo)
+            with response:
+                novo = data = None
+                if response.status_code == 304 and self._snapshot is not None:
+                    self.nao_modificado += 1
+                elif response.status_code == 200:
+                    with metricas.medir(f'ipma_{self.nome}.parse'):
+                        try:
+                            data = self._ler(response)
+                        except ValueError as e:
+                            raise IPMAErro(motivo='JSON inválido') from e
+                        novo = self._incorporar(self._snapshot, data)
+                    self._etag = response.headers.get('ETag')
+                    self._last_modified = response.headers.get('Last-Modified')
+                else:
+                    raise IPMAErro(response.status_code)
+        except requests.RequestException as e:
+            raise IPMAErro(motivo=type(e).__name__) from e
+        self.refreshes += 1
+        self.latencia_ultima = time.perf_counter() - inicio
+        self.latencia_total += self.latencia_ultima
+        if publicar is not None:
+            publicar(data)
+        return novo
+
+    def refrescar(self, forcar=True):
+        """Vai ao IPMA e troca o snapshot; devolve True se chegaram dados novos (200).
+
+        Só um refrescamento corre de cada vez; os leitores continuam a usar o snapshot atual.
+        """
+        with self._lock:
+            if not forcar and self._snapshot is not None and time.monotonic() < self._expira:
+                return False
+            try:
+                novo = self._descarregar()
+            except IPMAErro:
+                if self._snapshot is None:
+                    raise
+                self.falhas += 1
+                self._expira = time.monotonic() + min(self.ttl, ESPERA_FALHA)
+                return False
+            if novo is not None:
+                self._snapshot = novo
+                self._notificar(novo)
+            self._expira = time.monotonic() + self.ttl
+            self.atualizado_em = time.time()
+            return novo is not None
+
+    def ao_atualizar(self, funcao):
+        """Regista funcao(snapshot), chamada a cada snapshot novo (e já, se houver dados)."""
+        if funcao not in self.ouvintes:
+            self.ouvintes.append(funcao)
+            if self._snapshot is not None:
+                funcao(self._snapshot)
+
+    def _notificar(self, snapshot):
+        for funcao in self.ouvintes:
+            try:
+                funcao(snapshot)
+            except Exception:  # um ouvinte com erro não pode impedir a atualização
+                log.exception("Erro ao processar snapshot de %s", self.url)
+
+    def snapshot(self):
+        """Snapshot atual; só vai à rede se ainda não houver dados ou (sem prefetcher) se expirou."""
+        snapshot = self._snapshot
+        if snapshot is None or (not self.em_fundo and time.monotonic() >= self._expira):
+            self.misses += 1
+            self.refrescar(forcar=False)
+            snapshot = self._snapshot
+        else:
+            self.hits += 1
+        return snapshot
+
+    def invalidar(self):
+        self._expira = 0.0
+
+    def pedir_refrescamento(self):
+        """Refrescamento antecipado, sem esperar por ele: acorda o prefetcher ou, sem ele, fica para o próximo leitor."""
+        self.invalidar()
+        acordar = self.acordar
+        if self.em_fundo and acordar is not None:
+            acordar()
+
+    @property
+    def pronto(self):
+        return self._snapshot is not None
+
+    def idade(self):
+        """Segundos desde a última resposta válida do IPMA, ou None se nunca houve."""
+        return None if self.atualizado_em is None else time.time() - self.atualizado_em
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'nao_modificado': self.nao_modificado,
+            'falhas': self.falhas,
+            'latencia_ultima': self.latencia_ultima,
+            'latencia_media': self.latencia_total / self.refreshes if self.refreshes else 0.0,
+            'idade': self.idade(),
+        }
+
+
+class ObservacoesCache(FeedCache):
+    """observations.json indexado por estação (IndiceEstacoes).
+
+    Com `filtrar(estacoes)` o feed passa a ser lido em fluxo (climatologia.fluxo)
+    e só essas estações entram no índice; sem filtro é lido inteiro. O filtro
+    pedido só entra em vigor no refrescamento seguinte (`estacoes` é o que está
+    a ser usado nos pedidos ao IPMA).
+    """
+
+    nome = 'observacoes'
+
+    def __init__(self, url=OBSERVATIONS_URL, ttl=INTERVALO_IPMA, cliente=None, estacoes=None):
+        super().__init__(url, ttl, cliente)
+        self.estacoes = None if estacoes is None else frozenset(map(str, estacoes))
+        self._recomecar = False
+        self._lock_filtro = threading.Lock()
+        self._pedidas = self.estacoes
+        self._filtrado = estacoes is not None
+        self._recarregar = False
+
+    @property
+    def em_fluxo(self):
+        return self.estacoes is not None
+
+    def _ler(self, response):
+        if self.estacoes is None:
+            return super()._ler(response)
+        pedacos = response.iter_content(fluxo.PEDACO)
+        if metricas.ativo:
+            pedacos = self._contar(pedacos)
+        return fluxo.ler_observacoes(pedacos, self.estacoes)
+
+    def _contar(self, pedacos):
+        for pedaco in pedacos:
+            metricas.registar_bytes(f'ipma_{self.nome}.payload', len(pedaco))
+            yield pedaco
+
+    def _descarregar(self):
+        # Corre com self._lock: o filtro pedido só muda entre pedidos, nunca a meio de uma leitura
+        with self._lock_filtro:
+            self.estacoes = self._pedidas
+            if self._recarregar:
+                self._recarregar = False
+                self._etag = self._last_modified = None
+                self._recomecar = True
+        return super()._descarregar()
+
+    def _incorporar(self, anterior, data):
+        if self._recomecar:
+            anterior, self._recomecar = None, False
+        indice = anterior.copia() if anterior is not None else IndiceEstacoes()
+        indice.atualizar(data)
+        return indice
+
+    def filtrar(self, estacoes):
+        """Alarga o filtro a estas estações (None = todas), sem ir à rede.
+
+        O primeiro filtro substitui o feed inteiro; os seguintes juntam-se aos
+        anteriores (sessões e apps diferentes no mesmo processo). Se o snapshot
+        atual não cobrir alguma das pedidas, o refrescamento seguinte descarrega
+        o feed de novo por inteiro (sem pedido condicional): com o prefetcher é
+        pedido já, em segundo plano; sem ele, fica para o próximo leitor. Até lá
+        continua a servir o snapshot atual.
+        """
+        estacoes = None if estacoes is None else frozenset(map(str, estacoes))
+        with self._lock_filtro:
+            if not self._filtrado:
+                pedidas = estacoes
+            elif estacoes is None or self._pedidas is None:
+                pedidas = None
+            else:
+                pedidas = self._pedidas | estacoes
+            self._filtrado = True
+            if pedidas == self._pedidas:
+                return
+            recarregar = self._snapshot is not None and self._pedidas is not None
+            self._pedidas = pedidas
+            self._recarregar = self._recarregar or recarregar
+        if recarregar:
+            self.pedir_refrescamento()
+
+    def ultima(self, station_id):
+        """(timestamp, T, RH, pressão) da observação válida mais recente, ou None."""
+        return self.snapshot().ultima.get(station_id)
+
+    def ultimas(self, station_ids):
+        """{station_id: última observação ou None} para várias estações, todas do mesmo snapshot."""
+        indice = self.snapshot()
+        return {station_id: indice.ultima.get(station_id) for station_id in station_ids}
+
+    def historico(self, station_id):
+        """{timestamp: (T, RH, pressão)} da estação na janela atual do feed."""
+        return dict(self.snapshot().historico.get(station_id, {}))
+
+    def hora_mais_recente(self):
+        """Hora (UTC, formato do feed) da observação mais recente no snapshot, ou None."""
+        return self._snapshot.hora_mais_recente if self._snapshot is not None else None
+
+
+class EstacoesCache(FeedCache):
+    """stations.json como {station_id: (nome, latitude, longitude)}."""
+
+    nome = 'estacoes'
+
+    def __init__(self, url=STATIONS_URL, ttl=24 * INTERVALO_IPMA, cliente=None):
+        super().__init__(url, ttl, cliente)
+
+    def _incorporar(self, anterior, data):
+        estacoes = {}
+        for feature in data:
+            lon, lat = feature['geometry']['coordinates']
+            propriedades = feature['properties']
+            estacoes[str(propriedades['idEstacao'])] = (propriedades['localEstacao'], float(lat), float(lon))
+        return estacoes
+
+    def estacoes(self):
+        return self.snapshot()
+
+
+# Instâncias únicas por processo, partilhadas por todas as sessões
+cache = ObservacoesCache()
+cache_estacoes = EstacoesCache()
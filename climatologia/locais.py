@@ -0,0 +1,58 @@
+"""Locais da folha "Locais" de Climatologia_8.xlsx e mapeamento cidade → estação IPMA."""
+from climatologia import metricas
+from climatologia.cache import em_cache
+
+# Dicionário hardcoded de mappings cidade → estação IPMA (baseado em matches reais da API IPMA)
+CITY_TO_ID = {
+    'Portimão': '1210878',  # Correto: Portimão (Aeródromo)
+    'Lisboa': '1200535',    # Correto: Lisboa (Geofísico)
+    'Porto': '1200545',     # Correto: Porto, Pedras Rubras (Aeródromo)
+    'Angra do Heroísmo': '1200511',  # Correto
+    'Braga': '1210622',     # Correto: Braga, Merelim
+    'Faro': '1200554',      # Correto: Faro (Aeródromo)
+    'Beja': '1200571',      # Atualizado para Beja (Aeródromo) com dados recentes
+    'Évora': '1200843',     # Correto: Évora (Aeródromo)
+    'Coimbra': '1200559',   # Correto: Coimbra / Cernache
+    'Viseu': '1240675',     # Correto: Viseu (Cidade)
+    'Bragança': '1200575',  # Atualizado
+    'Castelo Branco': '1200570',  # Atualizado
+    'Guarda': '1200562',
+    'Leiria': '1210718',    # Atualizado para Leiria (Aeródromo) - o ID anterior não tem dados
+    'Santarém': '1200568',
+    'Setúbal': '1210770',   # Atualizado
+    'Aveiro': '1210702',
+    'Viana do Castelo': '1240610',
+    'Funchal': '1200548',
+    'Ponta Delgada': '1210513',
+    'Amadora': '1210881',   # Atualizado para Sintra/Granja do Marquês (close to Amadora with data)
+    'Abrantes': '1210812',  # Alvega
+    'Chaves': '1210616',    # Chaves (Aeródromo)
+    'Espinho': '1210704',   # Espinho
+    'Estremoz': '1210837',  # Estremoz
+    'Lamego': '1210655',    # Lamego
+    'Mafra': '1210747',     # Mafra
+    'Santa Margarida da Coutada': '1210800',  # Santa Margarida da Coutada
+    'São Jacinto': '1210704',  # São Jacinto (same as Espinho)
+    'Tavira': '1210883',    # Tavira
+    'Tomar': '1210724',     # Tomar, Valdonas
+    'Vila Nova de Gaia': '1240903',
+    'Vila Real': '1240566', # Vila Real (Cidade)
+    'Vendas Novas': '1210840',  # Vendas Novas
+    'Alcochete': '5210758', # Alcochete / Campo Tiro
+    'Sesimbra': '1210770',  # Marco do Grilo (usa estação de Setúbal)
+    # Adicione mais da "Locais" com IDs correspondentes (consulte https://api.ipma.pt/open-data/observation/meteorology/stations/stations.json para matches)
+    # Ex.: Se "Albufeira" não match exato, ignore ou mapeie para próximo como "Faro"
+}
+
+
+def ler_locais(caminho='Climatologia_8.xlsx'):
+    import pandas as pd  # e openpyxl: só para ler o xlsx (sem pacote compilado atualizado)
+
+    with metricas.medir('tabelas.ler_xlsx'):
+        locais_df = pd.read_excel(caminho, sheet_name='Locais', header=None)
+    return tuple(sorted(locais_df[0].dropna().unique().tolist()))  # Remove duplicatas e ordena
+
+
+def cidades_permitidas(caminho='Climatologia_8.xlsx'):
+    """Locais do Excel, lidos uma vez por processo (relidos só se o ficheiro mudar)."""
+    return em_cache(ler_locais, caminho)
@@ -0,0 +1,178 @@
+"""Cache LRU dos veredictos por chaves quantizadas, partilhada por todas as sessões do processo.
+
+Com as tabelas compiladas (célula mais próxima) o veredicto só depende da
+célula: classe A de (round(T), round(T - tm)), classe B de (round(ts_F),
+round(tm_F)); ti só é comparado no fim com o tv/tl da célula. A cache tem dois
+níveis, ambos LRU limitados:
+
+- observação (T, RH) → ts, tm e células, o que poupa a fórmula de Stull (o IPMA
+  dá T com uma casa decimal e RH inteira, pelo que as chaves repetem-se muito
+  entre paióis e sessões);
+- célula → valores das tabelas (P, tv, tl / tv_F), que `aquecer` preenche para
+  todo o domínio das tabelas.
+
+Serve `MotorLote.avaliar_um`, o caminho escalar. As avaliações em array
+(painel, histórico, paióis) ficam na passagem NumPy, que é mais rápida do que
+consultar um dict elemento a elemento. As tabelas interpoladas não são
+quantizadas e não passam por aqui. A cache pertence a um objeto de tabelas:
+quando os CSV mudam, `cache_de` recebe tabelas novas e começa uma cache nova.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from climatologia.motor import decisao_A, decisao_B
+from climatologia.psicrometria import stull_wet_bulb
+
+MAXIMO = 32768  # entradas de cada nível
+
+_cache = None
+_lock = threading.Lock()
+
+
+class LRU:
+    """Dict limitado a `maximo` entradas, que descarta a usada há mais tempo; conta hits e misses."""
+
+    def __init__(self, maximo=MAXIMO):
+        self.maximo = maximo
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._dados.get(chave)
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._dados.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maximo:
+                self._dados.popitem(last=False)
+
+    def __len__(self):
+        return len(self._dados)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taxa': self.hits / total if total else 0.0,
+            'entradas': len(self._dados),
+            'maximo': self.maximo,
+        }
+
+
+class CacheVeredictos:
+    """`avaliar_um` com o mesmo resultado de MotorLote.avaliar_um sobre tabelas compiladas."""
+
+    def __init__(self, tabelas, maximo=MAXIMO):
+        self.tabelas = tabelas
+        self.observacoes = LRU(maximo)
+        self.celulas = LRU(maximo)
+
+    def _observacao(self, T, RH):
+        chave = (T, RH)
+        valor = self.observacoes.obter(chave)
+        if valor is None:
+            tm = stull_wet_bulb(T, RH)
+            ts = float(np.round(T))
+            ts_F = float(np.round(ts * 9/5 + 32))
+            tm_F = float(np.round(np.round(tm) * 9/5 + 32))
+            valor = (tm, T - tm, ts, ts_F, tm_F)
+            self.observacoes.guardar(chave, valor)
+        return valor
+
+    def _celula_A(self, ts, delta):
+        chave = ('A', ts, delta)
+        valor = self.celulas.obter(chave)
+        if valor is None:
+            P = self.tabelas.get_P(ts, delta)
+            tv, tl = self.tabelas.get_tv_tl_A(ts, delta)
+            fora = bool(self.tabelas.fora_dominio_iii(ts, delta) | self.tabelas.fora_dominio_iiibis(P))
+            valor = (P, tv, tl, fora)
+            self.celulas.guardar(chave, valor)
+        return valor
+
+    def _celula_B(self, ts_F, tm_F):
+        chave = ('B', ts_F, tm_F)
+        valor = self.celulas.obter(chave)
+        if valor is None:
+            valor = (self.tabelas.get_tv_classB(ts_F, tm_F), bool(self.tabelas.fora_dominio_iv(ts_F, tm_F)))
+            self.celulas.guardar(chave, valor)
+        return valor
+
+    def avaliar_um(self, T, RH, ti, classe):
+        tm, delta, ts, ts_F, tm_F = self._observacao(float(T), float(RH))
+        P = tv = tl = tv_F = math.nan
+        if classe == 'A':
+            P, tv, tl, fora = self._celula_A(ts, float(np.round(delta)))
+            resultado, valido = decisao_A(ti, P, tv, tl)
+            if not valido:
+                tv = tl = math.nan
+            ts_F = tm_F = math.nan
+        elif classe == 'B':
+            tv_F, fora = self._celula_B(ts_F, tm_F)
+            resultado, _ = decisao_B(ti, tv_F)
+        else:
+            raise ValueError(f"classe {classe!r} (esperado A ou B)")
+        return {
+            'tm': tm, 'delta': delta, 'ts': ts,
+            'P': P, 'tv': tv, 'tl': tl,
+            'ts_F': ts_F, 'tm_F': tm_F, 'tv_F': tv_F,
+            'resultado': int(resultado), 'fora_dominio': fora,
+        }
+
+    def aquecer(self):
+        """Preenche o nível das células com todo o domínio das Tabelas III e IV; devolve quantas.
+
+        Os lookups correm em array, de uma vez, e não contam para os hits/misses.
+        """
+        t = self.tabelas
+        ts, delta = (g.ravel().astype(float) for g in np.meshgrid(
+            np.arange(t.P.shape[0]) + t.ts_min, np.arange(t.P.shape[1]) + t.delta_min, indexing='ij'))
+        P = t.get_P(ts, delta)
+        tv, tl = t.get_tv_tl_A(ts, delta)
+        fora = t.fora_dominio_iii(ts, delta) | t.fora_dominio_iiibis(P)
+        for valores in zip(ts.tolist(), delta.tolist(), P.tolist(), tv.tolist(), tl.tolist(), fora.tolist()):
+            self.celulas.guardar(('A',) + valores[:2], valores[2:])
+
+        ts_F, tm_F = (g.ravel().astype(float) for g in np.meshgrid(
+            np.arange(t.tv_F.shape[0]) + t.tsF_min, np.arange(t.tv_F.shape[1]) + t.tmF_min, indexing='ij'))
+        tv_F = t.get_tv_classB(ts_F, tm_F)
+        fora = t.fora_dominio_iv(ts_F, tm_F)
+        for valores in zip(ts_F.tolist(), tm_F.tolist(), tv_F.tolist(), fora.tolist()):
+            self.celulas.guardar(('B',) + valores[:2], valores[2:])
+        return len(ts) + len(ts_F)
+
+    def limpar(self):
+        self.observacoes.limpar()
+        self.celulas.limpar()
+
+    def stats(self):
+        return {'observacoes': self.observacoes.stats(), 'celulas': self.celulas.stats()}
+
+
+def cache_de(tabelas):
+    """Cache do processo para estas tabelas, já aquecida; tabelas novas (CSV alterados) substituem a anterior."""
+    global _cache
+    with _lock:
+        if _cache is None or _cache.tabelas is not tabelas:
+            _cache = CacheVeredictos(tabelas)
+            _cache.aquecer()
+        return _cache
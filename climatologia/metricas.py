@@ -0,0 +1,192 @@
+"""Medição dos caminhos quentes (IPMA, tabelas, lookups, motor, render) e exportação Prometheus.
+
+Desligada por omissão: `medir` devolve então um context manager vazio e o custo
+é uma chamada de função. Liga-se com a variável de ambiente CLIMATOLOGIA_METRICAS=1
+(ou `ativar()`); com CLIMATOLOGIA_METRICAS_PORTA definida, `servir()` expõe
+/metrics num servidor HTTP próprio, já que o Streamlit não aceita rotas extra.
+O servidor só escuta em 127.0.0.1; para o expor (p.ex. a um Prometheus noutra
+máquina) é preciso pedi-lo com CLIMATOLOGIA_METRICAS_ENDERECO=0.0.0.0.
+
+Cada medição vai para o registo do processo e, se houver, para o da sessão
+Streamlit atual (ver `usar_sessao`).
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+AMOSTRAS = 2048  # durações guardadas por medida, para os percentis
+QUANTIS = (0.5, 0.95, 0.99)
+
+ativo = os.environ.get('CLIMATOLOGIA_METRICAS', '') not in ('', '0')
+
+_NULO = contextlib.nullcontext()
+_sessao = contextvars.ContextVar('climatologia_metricas_sessao', default=None)
+
+
+class Registo:
+    """Contagens, somas e últimas AMOSTRAS durações por medida, e bytes por feed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duracoes = {}
+        self.contagens = {}
+        self.somas = {}
+        self.bytes = {}
+
+    def adicionar(self, nome, segundos):
+        with self._lock:
+            amostras = self.duracoes.get(nome)
+            if amostras is None:
+                amostras = self.duracoes[nome] = deque(maxlen=AMOSTRAS)
+            amostras.append(segundos)
+            self.contagens[nome] = self.contagens.get(nome, 0) + 1
+            self.somas[nome] = self.somas.get(nome, 0.0) + segundos
+
+    def adicionar_bytes(self, nome, n):
+        with self._lock:
+            self.bytes[nome] = self.bytes.get(nome, 0) + n
+
+    def resumo(self):
+        """{medida: {'n', 'total', 'p50', 'p95', 'p99'}} em segundos."""
+        with self._lock:
+            copia = {nome: (list(a), self.contagens[nome], self.somas[nome]) for nome, a in self.duracoes.items()}
+        resumo = {}
+        for nome, (amostras, n, total) in sorted(copia.items()):
+            p50, p95, p99 = np.quantile(amostras, QUANTIS)
+            resumo[nome] = {'n': n, 'total': total, 'p50': p50, 'p95': p95, 'p99': p99}
+        return resumo
+
+    def tabela(self):
+        """Resumo em colunas (durações em ms), pronto para um DataFrame."""
+        resumo = self.resumo()
+        return {
+            'Medida': list(resumo),
+            'N': [r['n'] for r in resumo.values()],
+            'p50 (ms)': [round(r['p50'] * 1000, 3) for r in resumo.values()],
+            'p95 (ms)': [round(r['p95'] * 1000, 3) for r in resumo.values()],
+            'p99 (ms)': [round(r['p99'] * 1000, 3) for r in resumo.values()],
+            'Total (ms)': [round(r['total'] * 1000, 1) for r in resumo.values()],
+        }
+
+    def limpar(self):
+        with self._lock:
+            self.duracoes.clear()
+            self.contagens.clear()
+            self.somas.clear()
+            self.bytes.clear()
+
+
+processo = Registo()
+
+
+class _Medicao:
+    __slots__ = ('nome', 'inicio')
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registar(self.nome, time.perf_counter() - self.inicio)
+        return False
+
+
+def medir(nome):
+    """Context manager que regista a duração do bloco em `nome` (nada, se desligado)."""
+    return _Medicao(nome) if ativo else _NULO
+
+
+def registar(nome, segundos):
+    processo.adicionar(nome, segundos)
+    sessao = _sessao.get()
+    if sessao is not None:
+        sessao.adicionar(nome, segundos)
+
+
+def registar_bytes(nome, n):
+    if not ativo:
+        return
+    processo.adicionar_bytes(nome, n)
+    sessao = _sessao.get()
+    if sessao is not None:
+        sessao.adicionar_bytes(nome, n)
+
+
+def usar_sessao(registo):
+    """Associa as medições seguintes desta thread (o rerun Streamlit atual) ao registo da sessão."""
+    _sessao.set(registo)
+
+
+def ativar(valor=True):
+    global ativo
+    ativo = valor
+
+
+def _nome(medida):
+    return 'climatologia_' + ''.join(c if c.isalnum() else '_' for c in medida)
+
+
+def prometheus(registo=None):
+    """Texto no formato de exposição do Prometheus (summaries em segundos e contadores de bytes)."""
+    registo = registo or processo
+    linhas = []
+    for medida, r in registo.resumo().items():
+        nome = _nome(medida) + '_seconds'
+        linhas.append(f'# TYPE {nome} summary')
+        for q in QUANTIS:
+            linhas.append(f'{nome}{{quantile="{q}"}} {r[f"p{round(q * 100)}"]:.9f}')
+        linhas.append(f'{nome}_sum {r["total"]:.9f}')
+        linhas.append(f'{nome}_count {r["n"]}')
+    with registo._lock:
+        totais = sorted(registo.bytes.items())
+    for medida, n in totais:
+        nome = _nome(medida) + '_bytes_total'
+        linhas.append(f'# TYPE {nome} counter')
+        linhas.append(f'{nome} {n}')
+    return '\n'.join(linhas) + '\n'
+
+
+_servidor = None
+_lock_servidor = threading.Lock()
+
+
+def servir(porta=None, endereco=None):
+    """Arranca (uma vez por processo) o servidor de /metrics; sem porta configurada não faz nada.
+
+    Por omissão escuta só em 127.0.0.1 (ou em CLIMATOLOGIA_METRICAS_ENDERECO).
+    """
+    global _servidor
+    porta = porta or os.environ.get('CLIMATOLOGIA_METRICAS_PORTA')
+    endereco = endereco or os.environ.get('CLIMATOLOGIA_METRICAS_ENDERECO', '127.0.0.1')
+    if not porta:
+        return None
+    with _lock_servidor:
+        if _servidor is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != '/metrics':
+                        self.send_error(404)
+                        return
+                    corpo = prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+
+                def log_message(self, *args):
+                    pass
+
+            _servidor = ThreadingHTTPServer((endereco, int(porta)), Handler)
+            threading.Thread(target=_servidor.serve_forever, name='metricas', daemon=True).start()
+        return _servidor
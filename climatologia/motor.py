@@ -0,0 +1,153 @@
+"""Motor de decisão vetorizado: avalia muitos paióis (T, RH, ti, classe) numa só passagem NumPy."""
+import numpy as np
+
+from climatologia import metricas
+from climatologia.psicrometria import stull_wet_bulb
+
+# Códigos de resultado
+FORA_DA_TABELA = 0
+VENTILAR = 1
+VENTILAR_RAPIDO = 2
+FECHADO = 3
+
+RESULTADOS = {
+    ('A', VENTILAR): "ti ≥ tv – O paiol deve ser ventilado durante todo o tempo em que as condições atmosféricas o permitam",
+    ('A', VENTILAR_RAPIDO): "tv > ti ≥ tl – O paiol deve ser ventilado rapidamente, apenas durante o tempo estritamente necessário para lançar uma corrente de ar que renove o ar interior",
+    ('A', FECHADO): "tl > ti – O paiol deve manter-se fechado.",
+    ('B', VENTILAR): "ti > tv – ventilar",
+    ('B', FECHADO): "ti < tv - manter fechado",
+}
+
+
+CLASSES = ('A', 'B')
+
+# Nomes estáveis dos códigos, para saídas em ficheiro (CSV/JSON)
+NOMES = {
+    FORA_DA_TABELA: 'fora_da_tabela',
+    VENTILAR: 'ventilar',
+    VENTILAR_RAPIDO: 'ventilar_rapido',
+    FECHADO: 'fechado',
+}
+
+
+def texto_resultado(classe, codigo):
+    return RESULTADOS.get((classe, int(codigo)), "Fora da tabela")
+
+
+def validar_classes(classe):
+    """ValueError se algum elemento não for 'A' ou 'B' (uma classe desconhecida não é tratada como B)."""
+    invalidas = ~np.isin(classe, CLASSES)
+    if invalidas.any():
+        raise ValueError(f"classe {sorted(set(np.asarray(classe)[invalidas].tolist()))} (esperado A ou B)")
+
+
+def decisao_A(ti, P, tv, tl):
+    """Código do veredicto da classe A a partir dos valores das Tabelas III / III-bis."""
+    valido = np.isfinite(P) & (P != 0) & np.isfinite(tv)  # tv NaN: P fora da III-bis (interpolado)
+    resultado = np.where(ti >= tv, VENTILAR, np.where(ti >= tl, VENTILAR_RAPIDO, FECHADO))
+    return np.where(valido, resultado, FORA_DA_TABELA), valido
+
+
+def decisao_B(ti, tv_F):
+    """Código do veredicto da classe B a partir do tv (°F) da Tabela IV."""
+    valido = np.isfinite(tv_F) & (tv_F != 0)
+    return np.where(valido, np.where(ti > (tv_F - 32) * 5/9, VENTILAR, FECHADO), FORA_DA_TABELA), valido
+
+
+class MotorLote:
+    """Avaliação vetorizada sobre as tabelas.
+
+    Com tabelas.TabelasCompiladas (modo das apps) ts, tm e os °F são arredondados
+    e cada lookup vai à célula mais próxima; com interpolacao.TabelasInterpoladas
+    os valores contínuos são interpolados e nada é arredondado. `bolbo_humido` é
+    o método de tm (ver climatologia.psicrometria): Stull por omissão.
+    """
+
+    def __init__(self, tabelas, bolbo_humido=stull_wet_bulb):
+        self.tabelas = tabelas
+        self.bolbo_humido = bolbo_humido
+
+    def avaliar(self, T, RH, ti, classe, pressao=None):
+        """Avalia arrays (difundíveis) de T, RH, ti, classe ('A'/'B') e pressão (hPa, opcional).
+
+        Devolve um dict de arrays: tm, delta, ts (T arredondada), P, tv, tl (classe A),
+        ts_F, tm_F, tv_F (classe B), `resultado` com os códigos VENTILAR,
+        VENTILAR_RAPIDO, FECHADO ou FORA_DA_TABELA e `fora_dominio`, True quando
+        a entrada sai das tabelas (nas compiladas, dos seus eixos, e o lookup usa a margem).
+        """
+        with metricas.medir('motor.avaliar'):
+            T, RH, ti, classe, pressao = np.broadcast_arrays(
+                np.asarray(T, dtype=float), np.asarray(RH, dtype=float),
+                np.asarray(ti, dtype=float), np.asarray(classe),
+                np.asarray(np.nan if pressao is None else pressao, dtype=float),
+            )
+            T, RH, ti, classe, pressao = (a.ravel() for a in (T, RH, ti, classe, pressao))
+            validar_classes(classe)
+            tm = self.bolbo_humido(T, RH, pressao)
+            delta = T - tm
+            interpolado = self.tabelas.interpolado
+            ts_rounded = T if interpolado else np.round(T)
+
+            # Classe A: Tabela III → P → Tabela III-bis
+            P = self.tabelas.get_P(ts_rounded, delta)
+            tv, tl = self.tabelas.get_tv_tl_A(ts_rounded, delta)
+            fora_A = self.tabelas.fora_dominio_iii(ts_rounded, delta) | self.tabelas.fora_dominio_iiibis(P)
+            resultado_A, valido_A = decisao_A(ti, P, tv, tl)
+
+            # Classe B: Tabela IV em °F
+            if interpolado:
+                ts_F, tm_F = T * 9/5 + 32, tm * 9/5 + 32
+            else:
+                ts_F = np.round(ts_rounded * 9/5 + 32)
+                tm_F = np.round(np.round(tm) * 9/5 + 32)
+            tv_F = self.tabelas.get_tv_classB(ts_F, tm_F)
+            fora_B = self.tabelas.fora_dominio_iv(ts_F, tm_F)
+            resultado_B, _ = decisao_B(ti, tv_F)
+
+            classe_A = classe == 'A'
+            return {
+                'tm': tm,
+                'delta': delta,
+                'ts': ts_rounded,
+                'P': np.where(classe_A, P, np.nan),
+                'tv': np.where(classe_A & valido_A, tv, np.nan),
+                'tl': np.where(classe_A & valido_A, tl, np.nan),
+                'ts_F': np.where(classe_A, np.nan, ts_F),
+                'tm_F': np.where(classe_A, np.nan, tm_F),
+                'tv_F': np.where(classe_A, np.nan, tv_F),
+                'resultado': np.where(classe_A, resultado_A, resultado_B),
+                'fora_dominio': np.where(classe_A, fora_A, fora_B),
+            }
+
+    def avaliar_um(self, T, RH, ti, classe, pressao=None):
+        """Avaliação de um só paiol: o mesmo dict de `avaliar`, com escalares Python.
+
+        Com tabelas compiladas e Stull passa pela cache de veredictos do processo (climatologia.memo).
+        """
+        if not self.tabelas.interpolado and self.bolbo_humido is stull_wet_bulb:
+            from climatologia import memo  # import tardio: memo usa decisao_A/decisao_B deste módulo
+            return memo.cache_de(self.tabelas).avaliar_um(T, RH, ti, classe)
+        return {chave: valores[0].item() for chave, valores in self.avaliar(T, RH, ti, classe, pressao).items()}
+
+
+def avaliar_estacoes(motor, city_to_id, observacoes, ti):
+    """Veredictos das classes A e B para cada cidade, a partir de um único snapshot.
+
+    `observacoes` mapeia station_id → (timestamp, T, RH, pressão); cidades sem
+    observação válida ficam de fora. Devolve um dict de colunas pronto para um DataFrame.
+    """
+    cidades = sorted(c for c in city_to_id if observacoes.get(city_to_id[c]) is not None)
+    T = np.array([observacoes[city_to_id[c]][1] for c in cidades], dtype=float)
+    RH = np.array([observacoes[city_to_id[c]][2] for c in cidades], dtype=float)
+    pressao = np.array([observacoes[city_to_id[c]][3] for c in cidades], dtype=float)  # None → NaN
+    n = len(cidades)
+    res = motor.avaliar(np.tile(T, 2), np.tile(RH, 2), ti, np.repeat(['A', 'B'], n), np.tile(pressao, 2))
+    return {
+        'Cidade': cidades,
+        'Observação': [observacoes[city_to_id[c]][0] for c in cidades],
+        'T (°C)': T,
+        'RH (%)': RH,
+        'tm (°C)': np.round(res['tm'][:n], 2),
+        'Classe A': [texto_resultado('A', r) for r in res['resultado'][:n]],
+        'Classe B': [texto_resultado('B', r) for r in res['resultado'][n:]],
+    }
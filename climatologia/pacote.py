@@ -0,0 +1,85 @@
+"""Pacote binário (.npz) com as tabelas compiladas, os Locais e o city_to_id.
+
+Construir com `python -m climatologia.pacote [pasta]`. As apps carregam o pacote
+em milissegundos e só voltam às fontes (xlsx/CSV) quando ele está desatualizado:
+versão diferente ou checksum que já não corresponde aos ficheiros de origem.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from climatologia import locais, metricas, tabelas
+from climatologia.cache import em_cache
+
+VERSAO = 1
+PACOTE = 'climatologia_dados.npz'
+FONTES = ('Climatologia_8.xlsx', 'tabela_iii.csv', 'tabela_iiibis.csv', 'tabela_iv.csv')
+
+
+def _soma_ficheiros(*caminhos):
+    h = hashlib.sha256()
+    for caminho in caminhos:
+        with open(caminho, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def checksum(pasta='.', city_to_id=locais.CITY_TO_ID):
+    """SHA-256 das fontes e do mapeamento cidade → estação (recalculado só quando uma fonte muda)."""
+    h = hashlib.sha256(em_cache(_soma_ficheiros, *(os.path.join(pasta, nome) for nome in FONTES)).encode())
+    h.update(json.dumps(city_to_id, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def construir(pasta='.', destino=None):
+    """Compila as fontes da pasta num único .npz e devolve o caminho escrito."""
+    destino = destino or os.path.join(pasta, PACOTE)
+    compiladas = tabelas.compilar_valores(*tabelas.ler_valores(*tabelas._caminhos(pasta)))
+    cidades = locais.ler_locais(os.path.join(pasta, 'Climatologia_8.xlsx'))
+    np.savez(
+        destino,
+        versao=np.array(VERSAO),
+        checksum=np.array(checksum(pasta)),
+        locais=np.array(cidades),
+        cidades=np.array(list(locais.CITY_TO_ID.keys())),
+        estacoes=np.array(list(locais.CITY_TO_ID.values())),
+        **compiladas.como_arrays(),
+    )
+    return destino
+
+
+def _ler_pacote(caminho):
+    with metricas.medir('tabelas.ler_pacote'), np.load(caminho, allow_pickle=False) as dados:
+        return (
+            int(dados['versao']),
+            str(dados['checksum']),
+            tabelas.TabelasCompiladas.de_arrays(dados),
+            tuple(dados['locais'].tolist()),
+            dict(zip(dados['cidades'].tolist(), dados['estacoes'].tolist())),
+        )
+
+
+def carregar(pasta='.', caminho=None):
+    """Devolve (tabelas_compiladas, cidades_permitidas, city_to_id).
+
+    Usa o pacote quando existe e está atualizado; caso contrário lê as fontes.
+    Em ambos os casos o resultado fica em cache no processo.
+    """
+    with metricas.medir('tabelas.carregar'):
+        caminho = caminho or os.path.join(pasta, PACOTE)
+        if os.path.exists(caminho):
+            versao, soma, compiladas, cidades, city_to_id = em_cache(_ler_pacote, caminho)
+            if versao == VERSAO and soma == checksum(pasta):
+                return compiladas, cidades, city_to_id
+        return (
+            tabelas.compiladas(pasta),
+            locais.cidades_permitidas(os.path.join(pasta, 'Climatologia_8.xlsx')),
+            dict(locais.CITY_TO_ID),
+        )
+
+
+if __name__ == '__main__':
+    print(construir(sys.argv[1] if len(sys.argv) > 1 else '.'))
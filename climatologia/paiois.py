@@ -0,0 +1,257 @@
+"""Registo de paióis (paiois.yaml) reavaliados em conjunto a cada snapshot novo do IPMA.
+
+O paiois.yaml fica ao lado do config.yaml:
+
+    paiois:
+      - nome: Paiol Norte
+        classe: A
+        ti: 18.5          # leitura do sensor interior (°C)
+        local: Coimbra    # cidade da folha "Locais" (ver climatologia.resolucao)...
+      - nome: Paiol Sul
+        classe: B
+        ti: 21
+        estacao: '1200554'  # ...ou diretamente o ID da estação IPMA
+
+O Agendador é ouvinte da cache de observações: cada snapshot novo dá uma só
+passagem do MotorLote, e só para os paióis cuja entrada (observação, ti,
+classe) mudou desde a anterior. Os veredictos ficam numa base SQLite local e só
+as mudanças de veredicto são passadas aos ouvintes (`ao_mudar`). O estado
+sobrevive a reinícios, pelo que um paiol sem mudança não volta a ser notificado.
+O ficheiro é relido quando muda (p.ex. novas leituras de ti).
+"""
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import yaml
+from yaml.loader import SafeLoader
+
+from climatologia import ipma
+from climatologia.motor import NOMES, texto_resultado
+
+REGISTO = 'paiois.yaml'
+BASE = 'veredictos_paiois.sqlite'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS veredictos (
+    paiol TEXT NOT NULL,
+    hora TEXT NOT NULL,
+    station_id TEXT NOT NULL,
+    temperatura REAL NOT NULL,
+    humidade REAL NOT NULL,
+    ti REAL NOT NULL,
+    classe TEXT NOT NULL,
+    resultado INTEGER NOT NULL,
+    alterado INTEGER NOT NULL,
+    PRIMARY KEY (paiol, hora)
+) WITHOUT ROWID;
+"""
+
+log = logging.getLogger(__name__)
+
+_agendador = None
+_lock = threading.Lock()
+
+
+def ler_registo(caminho=REGISTO):
+    """Lista de paióis do YAML, como dicts {nome, classe, ti, estacao, local}; ValueError se inválido."""
+    with open(caminho, encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader) or {}
+    paiois, nomes = [], set()
+    for i, p in enumerate(config.get('paiois') or []):
+        nome = str(p.get('nome') or '').strip()
+        if not nome or nome in nomes:
+            raise ValueError(f"{caminho}: paiol {i + 1} sem nome ou com nome repetido ({nome!r})")
+        classe = str(p.get('classe', '')).strip().upper()
+        if classe not in ('A', 'B'):
+            raise ValueError(f"{caminho}: paiol {nome!r} com classe {p.get('classe')!r} (esperado A ou B)")
+        try:
+            ti = float(p['ti'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{caminho}: paiol {nome!r} sem ti numérico") from None
+        estacao, local = p.get('estacao'), p.get('local')
+        if estacao is None and local is None:
+            raise ValueError(f"{caminho}: paiol {nome!r} sem estacao nem local")
+        nomes.add(nome)
+        paiois.append({
+            'nome': nome, 'classe': classe, 'ti': ti,
+            'estacao': None if estacao is None else str(estacao), 'local': local,
+        })
+    return paiois
+
+
+class VeredictosPaiois:
+    """Veredictos de cada paiol por hora de observação; `alterado` marca as mudanças notificadas."""
+
+    def __init__(self, caminho=BASE):
+        self.caminho = caminho
+        with self._ligar() as con:
+            con.executescript(_ESQUEMA)
+
+    @contextlib.contextmanager
+    def _ligar(self):
+        with contextlib.closing(sqlite3.connect(self.caminho, timeout=30)) as con, con:
+            yield con
+
+    def gravar(self, linhas):
+        """linhas: (paiol, hora, station_id, T, RH, ti, classe, resultado, alterado)."""
+        with self._ligar() as con:
+            # Reavaliar a mesma hora (novo ti, reinício) não apaga a marca de mudança já notificada
+            con.executemany(
+                "INSERT INTO veredictos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (paiol, hora) DO UPDATE SET"
+                " station_id = excluded.station_id, temperatura = excluded.temperatura, humidade = excluded.humidade,"
+                " ti = excluded.ti, classe = excluded.classe, resultado = excluded.resultado,"
+                " alterado = veredictos.alterado OR excluded.alterado",
+                linhas,
+            )
+
+    def ultimos(self):
+        """{paiol: código do veredicto mais recente}."""
+        with self._ligar() as con:
+            return dict(con.execute(
+                "SELECT paiol, resultado FROM veredictos v"
+                " WHERE hora = (SELECT MAX(hora) FROM veredictos WHERE paiol = v.paiol)"
+            ).fetchall())
+
+    def alteracoes(self, paiol=None, inicio=None):
+        """[(paiol, hora, resultado)] das mudanças de veredicto, por ordem de hora."""
+        with self._ligar() as con:
+            return con.execute(
+                "SELECT paiol, hora, resultado FROM veredictos WHERE alterado AND hora >= ?"
+                + (" AND paiol = ?" if paiol is not None else "") + " ORDER BY hora, paiol",
+                (inicio or '',) + ((paiol,) if paiol is not None else ()),
+            ).fetchall()
+
+
+class Agendador:
+    """Reavalia os paióis do registo a cada snapshot e notifica só as mudanças de veredicto.
+
+    `mapa` dá a estação de cada `local`: um dict, ou uma função das últimas
+    observações ({station_id: obs}) como Resolvedor.mapeamento.
+    """
+
+    def __init__(self, caminho, motor, veredictos, mapa=None):
+        self.caminho = caminho
+        self.motor = motor
+        self.veredictos = veredictos
+        self.mapa = mapa if callable(mapa) else (lambda ultima, m=dict(mapa or {}): m)
+        self.ouvintes = []
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.paiois = []
+        self._entradas = {}  # nome → (station_id, obs, ti, classe) da última avaliação
+        self.estado = veredictos.ultimos()
+        self._tentar_recarregar()  # um registo inválido não impede o arranque: fica vazio até ser corrigido
+
+    def recarregar(self):
+        """Relê o registo se o ficheiro mudou; devolve True se foi relido."""
+        mtime = os.path.getmtime(self.caminho)
+        if mtime == self._mtime:
+            return False
+        self.paiois = ler_registo(self.caminho)
+        self._mtime = mtime
+        return True
+
+    def _tentar_recarregar(self):
+        try:
+            self.recarregar()
+        except (OSError, ValueError, yaml.YAMLError) as e:  # mantém o registo anterior
+            log.warning("Registo de paióis não relido: %s", e)
+
+    def estacoes(self):
+        """Estações diretas do registo (para juntar ao filtro de ipma.ObservacoesCache)."""
+        return {p['estacao'] for p in self.paiois if p['estacao'] is not None}
+
+    def ao_mudar(self, funcao):
+        """Regista funcao(alteracoes), chamada com a lista de mudanças de cada passagem."""
+        if funcao not in self.ouvintes:
+            self.ouvintes.append(funcao)
+
+    def avaliar(self, indice):
+        """Passagem sobre um snapshot (IndiceEstacoes); devolve a lista de mudanças de veredicto."""
+        with self._lock:
+            self._tentar_recarregar()
+            ultima = indice.ultima
+            mapa = self.mapa(ultima)
+            pendentes = []
+            for p in self.paiois:
+                station_id = p['estacao'] or mapa.get(p['local'])
+                obs = ultima.get(station_id)
+                if obs is None:
+                    continue  # sem dados: mantém o último veredicto
+                entrada = (station_id, obs, p['ti'], p['classe'])
+                if self._entradas.get(p['nome']) != entrada:
+                    pendentes.append((p['nome'], entrada))
+            if not pendentes:
+                return []
+
+            obs = [entrada[1] for _, entrada in pendentes]
+            res = self.motor.avaliar(
+                np.array([o[1] for o in obs], dtype=float),
+                np.array([o[2] for o in obs], dtype=float),
+                np.array([entrada[2] for _, entrada in pendentes], dtype=float),
+                np.array([entrada[3] for _, entrada in pendentes]),
+                np.array([o[3] for o in obs], dtype=float),
+            )
+            linhas, alteracoes = [], []
+            for (nome, (station_id, o, ti, classe)), codigo in zip(pendentes, res['resultado'].tolist()):
+                anterior = self.estado.get(nome)
+                alterado = anterior != codigo
+                linhas.append((nome, o[0], station_id, o[1], o[2], ti, classe, codigo, int(alterado)))
+                if alterado:
+                    alteracoes.append({
+                        'paiol': nome,
+                        'hora': o[0],
+                        'estacao': station_id,
+                        'classe': classe,
+                        'anterior': None if anterior is None else NOMES[anterior],
+                        'resultado': NOMES[codigo],
+                        'texto': texto_resultado(classe, codigo),
+                    })
+            self.veredictos.gravar(linhas)
+            for nome, entrada in pendentes:
+                self._entradas[nome] = entrada
+            self.estado.update((linha[0], linha[7]) for linha in linhas)
+
+        if alteracoes:
+            for funcao in self.ouvintes:
+                funcao(alteracoes)
+        return alteracoes
+
+    def tabela(self):
+        """Último veredicto de cada paiol do registo, em colunas prontas para um DataFrame."""
+        with self._lock:
+            paiois, estado, entradas = list(self.paiois), dict(self.estado), dict(self._entradas)
+        sem = (None, (None,))
+        return {
+            'Paiol': [p['nome'] for p in paiois],
+            'Classe': [p['classe'] for p in paiois],
+            'ti (°C)': [p['ti'] for p in paiois],
+            'Estação': [entradas.get(p['nome'], sem)[0] or p['estacao'] for p in paiois],
+            'Observação': [entradas.get(p['nome'], sem)[1][0] for p in paiois],
+            'Resultado': [
+                texto_resultado(p['classe'], estado[p['nome']]) if p['nome'] in estado else "Sem dados"
+                for p in paiois
+            ],
+        }
+
+
+def _registar_log(alteracoes):
+    for a in alteracoes:
+        log.info("Paiol %s: %s → %s (%s)", a['paiol'], a['anterior'], a['resultado'], a['hora'])
+
+
+def ativar(motor, mapa=None, caminho=REGISTO, base=BASE, cache=None):
+    """Agendador do processo ligado à cache de observações, ou None se não houver registo (idempotente)."""
+    global _agendador
+    with _lock:
+        if _agendador is None:
+            if not os.path.exists(caminho):
+                return None
+            _agendador = Agendador(caminho, motor, VeredictosPaiois(base), mapa)
+            _agendador.ao_mudar(_registar_log)
+            (cache or ipma.cache).ao_atualizar(_agendador.avaliar)
+        return _agendador
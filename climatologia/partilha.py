@@ -0,0 +1,349 @@
+"""Modo multi-processo: snapshots do IPMA e tabelas partilhados entre workers.
+
+Com vários processos Streamlit atrás de um proxy, cada um descarregaria o feed
+e carregaria as tabelas por sua conta. Com CLIMATOLOGIA_PARTILHA definida,
+`ativar()` liga as caches do IPMA a um backend comum:
+
+    CLIMATOLOGIA_PARTILHA=/var/lib/climatologia   (ou ficheiros:/var/lib/...)
+    CLIMATOLOGIA_PARTILHA=redis://localhost:6379/0 (Redis ou compatível; pacote `redis`)
+
+Cada feed tem no backend uma entrada (versão, hora de obtenção, ETag e estações
+filtradas), o JSON à parte e um trinco com prazo. Quem precisa de refrescar usa a
+entrada se outro processo a obteve há menos de FRESCO segundos; senão tenta o
+trinco: um só processo vai ao IPMA (pedido condicional) e publica, os outros
+esperam pela publicação. As tabelas compiladas são publicadas uma vez por
+checksum das fontes; no backend de ficheiros ficam em .npy abertos com mmap, pelo
+que os workers partilham as mesmas páginas de memória.
+
+A cache de veredictos (climatologia.memo) continua por processo: aquece em
+~10 ms e uma ida ao backend custa mais do que o cálculo que poupa. O
+`Memoria()` faz de backend nos testes (um só processo).
+"""
+import io
+import json
+import logging
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from climatologia import ipma, pacote, tabelas
+
+FRESCO = 60  # uma entrada obtida há menos do que isto dispensa ir ao IPMA (segundos)
+PRAZO_TRINCO = 60  # um trinco abandonado (processo morto) expira ao fim de (segundos)
+ESPERA_LIDER = 30  # máximo à espera da publicação de outro processo, antes de ir ao IPMA (segundos)
+INTERVALO_ESPERA = 0.1
+
+log = logging.getLogger(__name__)
+
+_partilha = None
+_lock = threading.Lock()
+
+
+class Backend:
+    """Armazenamento chave → bytes com trincos; as tabelas vão como .npz."""
+
+    def ler(self, chave):
+        raise NotImplementedError
+
+    def escrever(self, chave, valor):
+        raise NotImplementedError
+
+    def trancar(self, chave, prazo=PRAZO_TRINCO):
+        """Ficha do trinco (que expira sozinho ao fim de `prazo`), ou None se outro processo o tem."""
+        raise NotImplementedError
+
+    def destrancar(self, chave, ficha):
+        """Liberta o trinco só se ainda for o desta ficha (pode ter expirado e passado a outro processo)."""
+        raise NotImplementedError
+
+    def ler_arrays(self, chave):
+        valor = self.ler(chave)
+        if valor is None:
+            return None
+        with np.load(io.BytesIO(valor), allow_pickle=False) as dados:
+            return {nome: dados[nome] for nome in dados.files}
+
+    def escrever_arrays(self, chave, arrays):
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        self.escrever(chave, buffer.getvalue())
+
+
+class Memoria(Backend):
+    """Backend num dict do processo (testes)."""
+
+    def __init__(self):
+        self._dados = {}
+        self._trincos = {}
+        self._lock = threading.Lock()
+
+    def ler(self, chave):
+        return self._dados.get(chave)
+
+    def escrever(self, chave, valor):
+        self._dados[chave] = bytes(valor)
+
+    def trancar(self, chave, prazo=PRAZO_TRINCO):
+        with self._lock:
+            agora = time.monotonic()
+            if self._trincos.get(chave, (0.0, None))[0] > agora:
+                return None
+            ficha = _ficha()
+            self._trincos[chave] = (agora + prazo, ficha)
+            return ficha
+
+    def destrancar(self, chave, ficha):
+        with self._lock:
+            if self._trincos.get(chave, (0.0, None))[1] == ficha:
+                del self._trincos[chave]
+
+
+def _ficha():
+    return f'{os.getpid()}:{secrets.token_hex(8)}'
+
+
+def _nome_ficheiro(chave):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in chave)
+
+
+class Ficheiros(Backend):
+    """Backend numa pasta local: escrita atómica (os.replace), trincos O_EXCL e tabelas em .npy com mmap."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave, sufixo=''):
+        return os.path.join(self.pasta, _nome_ficheiro(chave) + sufixo)
+
+    def ler(self, chave):
+        try:
+            with open(self._caminho(chave), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def escrever(self, chave, valor):
+        fd, temporario = tempfile.mkstemp(dir=self.pasta, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(valor)
+        os.replace(temporario, self._caminho(chave))
+
+    def trancar(self, chave, prazo=PRAZO_TRINCO):
+        caminho = self._caminho(chave, '.trinco')
+        for _ in range(2):
+            try:
+                fd = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(caminho) < prazo:
+                        return None
+                    os.remove(caminho)  # abandonado: tenta outra vez
+                except FileNotFoundError:
+                    pass
+                continue
+            ficha = _ficha()
+            with os.fdopen(fd, 'w') as f:
+                f.write(ficha)
+            return ficha
+        return None
+
+    def destrancar(self, chave, ficha):
+        caminho = self._caminho(chave, '.trinco')
+        try:
+            with open(caminho) as f:
+                if f.read() != ficha:
+                    return
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+    def ler_arrays(self, chave):
+        pasta = self._caminho(chave, '.npy.d')
+        if not os.path.isdir(pasta):
+            return None
+        return {
+            os.path.splitext(nome)[0]: np.load(os.path.join(pasta, nome), mmap_mode='r', allow_pickle=False)
+            for nome in os.listdir(pasta)
+        }
+
+    def escrever_arrays(self, chave, arrays):
+        temporaria = tempfile.mkdtemp(dir=self.pasta, prefix='.tmp-')
+        for nome, array in arrays.items():
+            np.save(os.path.join(temporaria, nome + '.npy'), np.asarray(array), allow_pickle=False)
+        try:
+            os.rename(temporaria, self._caminho(chave, '.npy.d'))
+        except OSError:  # outro processo publicou primeiro
+            shutil.rmtree(temporaria, ignore_errors=True)
+
+
+class Redis(Backend):
+    """Backend Redis (ou compatível: Valkey, KeyDB); precisa do pacote `redis`."""
+
+    PREFIXO = 'climatologia:'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CLIMATOLOGIA_PARTILHA=redis://… precisa do pacote redis (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+
+    def ler(self, chave):
+        return self._redis.get(self.PREFIXO + chave)
+
+    def escrever(self, chave, valor):
+        self._redis.set(self.PREFIXO + chave, valor)
+
+    # Compara e apaga numa só operação: o trinco pode ter expirado e passado a outro processo
+    DESTRANCAR = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def trancar(self, chave, prazo=PRAZO_TRINCO):
+        ficha = _ficha()
+        if self._redis.set(self.PREFIXO + 'trinco:' + chave, ficha, nx=True, px=int(prazo * 1000)):
+            return ficha
+        return None
+
+    def destrancar(self, chave, ficha):
+        self._redis.eval(self.DESTRANCAR, 1, self.PREFIXO + 'trinco:' + chave, ficha)
+
+
+def backend_de(config):
+    """Backend a partir do valor de CLIMATOLOGIA_PARTILHA."""
+    if config.startswith(('redis://', 'rediss://', 'unix://')):
+        return Redis(config)
+    if config == 'memoria':
+        return Memoria()
+    return Ficheiros(config.removeprefix('ficheiros:'))
+
+
+def _filtro(cache):
+    return cache.estacoes if isinstance(cache, ipma.ObservacoesCache) else None
+
+
+def _cobre(entrada, pedidas):
+    """A entrada publicada traz todas as estações de que este processo precisa?"""
+    return entrada['estacoes'] is None or (pedidas is not None and pedidas <= set(entrada['estacoes']))
+
+
+class Partilha:
+    """Coordena as caches do IPMA e as tabelas deste processo através de um backend comum."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.versoes = {}  # url → versão da entrada já incorporada
+        self.pedidos_ipma = 0
+        self.publicacoes_lidas = 0
+        self._pacotes = {}
+
+    def _entrada(self, chave):
+        valor = self.backend.ler(chave)
+        return None if valor is None else json.loads(valor)
+
+    def _usar(self, chave, cache, entrada):
+        """Incorpora a publicação de outro processo (ou nada, se já a tinha)."""
+        if self.versoes.get(cache.url) == entrada['versao']:
+            return None
+        novo = cache._incorporar(cache._snapshot, json.loads(self.backend.ler(chave + ':json')))
+        cache._etag, cache._last_modified = entrada['etag'], entrada['last_modified']
+        self.versoes[cache.url] = entrada['versao']
+        self.publicacoes_lidas += 1
+        return novo
+
+    def _publicar(self, chave, cache, anterior, valida, data):
+        """Publica o resultado do pedido ao IPMA; `anterior` é a entrada lida antes dele (ou None)."""
+        if data is None:  # 304: renova a hora de obtenção, se a entrada for a que este processo tem
+            if not valida or self.versoes.get(cache.url) != anterior['versao']:
+                return
+            entrada = dict(anterior, obtido=time.time())
+        else:
+            # A versão avança sempre sobre a entrada atual, mesmo que esta não cubra o filtro deste
+            # processo: quem já tem a versão anterior tem de ver esta como nova
+            atual = self._entrada(chave) or anterior
+            filtro = _filtro(cache)
+            entrada = {
+                'versao': (atual['versao'] if atual else 0) + 1,
+                'obtido': time.time(),
+                'etag': cache._etag,
+                'last_modified': cache._last_modified,
+                'estacoes': None if filtro is None else sorted(filtro),
+            }
+            self.versoes[cache.url] = entrada['versao']
+            self.backend.escrever(chave + ':json', json.dumps(data).encode())  # antes da entrada que o anuncia
+        self.backend.escrever(chave, json.dumps(entrada).encode())
+
+    def descarregar(self, cache):
+        """Substitui FeedCache._descarregar: usa a entrada partilhada ou, com o trinco, vai ao IPMA."""
+        chave = 'feed:' + cache.url
+        pedidas = _filtro(cache)
+        limite = time.monotonic() + ESPERA_LIDER
+        while True:
+            entrada = self._entrada(chave)
+            valida = entrada is not None and _cobre(entrada, pedidas)
+            if valida and time.time() - entrada['obtido'] < min(cache.ttl, FRESCO):
+                return self._usar(chave, cache, entrada)
+            if ficha := self.backend.trancar(chave):
+                break
+            if time.monotonic() >= limite:
+                log.warning("Sem publicação de %s há %ss: a ir ao IPMA sem trinco", cache.url, ESPERA_LIDER)
+                break
+            time.sleep(INTERVALO_ESPERA)  # outro processo está a ir ao IPMA
+        try:
+            self.pedidos_ipma += 1
+            return cache._descarregar_ipma(publicar=lambda data: self._publicar(chave, cache, entrada, valida, data))
+        finally:
+            if ficha:  # sem trinco (esgotada a espera) não há nada a libertar: seria o de outro processo
+                self.backend.destrancar(chave, ficha)
+
+    def carregar_pacote(self, pasta='.'):
+        """(tabelas_compiladas, cidades_permitidas, city_to_id), publicados uma vez por versão das fontes."""
+        chave = 'pacote:' + pacote.checksum(pasta)
+        if chave in self._pacotes:
+            return self._pacotes[chave]
+        limite = time.monotonic() + ESPERA_LIDER
+        while (arrays := self.backend.ler_arrays(chave)) is None:
+            if (ficha := self.backend.trancar(chave)) or time.monotonic() >= limite:
+                try:
+                    compiladas, cidades, city_to_id = pacote.carregar(pasta)
+                    self.backend.escrever_arrays(chave, dict(
+                        compiladas.como_arrays(),
+                        locais=np.array(cidades),
+                        cidades=np.array(list(city_to_id)),
+                        estacoes=np.array(list(city_to_id.values())),
+                    ))
+                finally:
+                    if ficha:
+                        self.backend.destrancar(chave, ficha)
+                break
+            time.sleep(INTERVALO_ESPERA)
+        else:
+            compiladas = tabelas.TabelasCompiladas.de_arrays(arrays)
+            cidades = tuple(arrays['locais'].tolist())
+            city_to_id = dict(zip(arrays['cidades'].tolist(), arrays['estacoes'].tolist()))
+        self._pacotes[chave] = (compiladas, cidades, city_to_id)
+        return self._pacotes[chave]
+
+    def stats(self):
+        return {'pedidos_ipma': self.pedidos_ipma, 'publicacoes_lidas': self.publicacoes_lidas}
+
+
+def ativar(config=None, caches=None):
+    """Liga as caches do IPMA ao backend de CLIMATOLOGIA_PARTILHA (idempotente); None sem configuração."""
+    global _partilha
+    config = config or os.environ.get('CLIMATOLOGIA_PARTILHA')
+    with _lock:
+        if _partilha is None and config:
+            _partilha = Partilha(backend_de(config))
+            for cache in caches or (ipma.cache, ipma.cache_estacoes):
+                cache.partilha = _partilha
+        return _partilha
+
+
+def carregar_pacote(pasta='.'):
+    """pacote.carregar, ou a cópia partilhada entre processos quando o modo partilhado está ativo."""
+    return _partilha.carregar_pacote(pasta) if _partilha is not None else pacote.carregar(pasta)
@@ -0,0 +1,105 @@
+"""Prefetcher em segundo plano que mantém os feeds do IPMA sempre carregados.
+
+Corre numa thread daemon, uma única vez por processo (as sessões Streamlit
+partilham o processo), e refresca as caches pouco depois de cada publicação
+horária do IPMA. Com ele ativo, `get_ipma_data` nunca espera pela rede.
+"""
+import logging
+import threading
+import time
+
+from climatologia import ipma
+
+ATRASO_PUBLICACAO = 10 * 60  # o IPMA publica a hora cheia uns minutos depois (segundos)
+ESPERA_SEM_NOVIDADES = 5 * 60  # 304 ou falha: voltar a tentar ao fim de (segundos)
+
+log = logging.getLogger(__name__)
+
+_prefetcher = None
+_lock = threading.Lock()
+
+
+def proxima_execucao(agora, intervalo=ipma.INTERVALO_IPMA, atraso=ATRASO_PUBLICACAO):
+    """Instante (epoch) da próxima publicação esperada depois de `agora`."""
+    proxima = agora - agora % intervalo + atraso
+    return proxima if proxima > agora else proxima + intervalo
+
+
+class Prefetcher(threading.Thread):
+    def __init__(self, caches, intervalo=ipma.INTERVALO_IPMA, atraso=ATRASO_PUBLICACAO):
+        super().__init__(name='ipma-prefetch', daemon=True)
+        self.caches = caches
+        self.intervalo = intervalo
+        self.atraso = atraso
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self.execucoes = 0
+
+    def ciclo(self):
+        """Refresca as caches; devolve True se os feeds horários já trouxeram dados novos.
+
+        Os feeds horários (observações) levam sempre um pedido condicional; os de
+        validade longa (estações) só são descarregados quando expiram.
+        """
+        completo = True
+        for cache in self.caches:
+            horario = cache.ttl <= self.intervalo
+            try:
+                novo = cache.refrescar(forcar=horario)
+            except ipma.IPMAErro as e:
+                log.warning("Prefetch de %s falhou: %s", cache.url, e)
+                novo = False
+            if (horario and not novo) or not cache.pronto:
+                completo = False
+        self.execucoes += 1
+        return completo
+
+    def run(self):
+        for cache in self.caches:
+            cache.em_fundo = True
+            cache.acordar = self.acordar
+        while not self._parar.is_set():
+            try:
+                completo = self.ciclo()
+            except Exception:  # a thread não pode morrer: as sessões dependem dela
+                log.exception("Erro inesperado no prefetch do IPMA")
+                completo = False
+            agora = time.time()
+            if completo:
+                espera = proxima_execucao(agora, self.intervalo, self.atraso) - agora
+            else:
+                espera = ESPERA_SEM_NOVIDADES
+            self._acordar.wait(espera)
+            self._acordar.clear()
+        for cache in self.caches:
+            cache.em_fundo = False
+            cache.acordar = None
+
+    def acordar(self):
+        """Antecipa o próximo ciclo (p.ex. filtro de estações alargado)."""
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+
+def iniciar(caches=None):
+    """Arranca o prefetcher do processo (idempotente: chamadas seguintes devolvem o mesmo)."""
+    global _prefetcher
+    with _lock:
+        if _prefetcher is None or not _prefetcher.is_alive():
+            _prefetcher = Prefetcher(caches or (ipma.cache, ipma.cache_estacoes))
+            _prefetcher.start()
+        return _prefetcher
+
+
+def estado(cache=None):
+    """Texto curto sobre a frescura dos dados, para mostrar na interface."""
+    cache = cache or ipma.cache
+    idade = cache.idade()
+    if idade is None:
+        return "Dados IPMA: a carregar…"
+    hora = cache.hora_mais_recente() if hasattr(cache, 'hora_mais_recente') else None
+    texto = f"Dados IPMA atualizados há {int(idade // 60)} min"
+    return f"{texto} (observação de {hora.replace('T', ' ')} UTC)" if hora else texto
@@ -0,0 +1,67 @@
+"""Cálculos psicrométricos (temperatura de bolbo húmido).
+
+Dois métodos com a mesma assinatura, metodo(T, RH, pressao=None) → tm (°C),
+para escalares ou arrays (MotorLote(tabelas, bolbo_humido=...) escolhe):
+
+- `stull_wet_bulb`: ajuste empírico de Stull (2011), o método por omissão e o
+  mais rápido. Ignora a pressão (o ajuste é para ~1013 hPa) e só foi ajustado
+  para RH de 5 a 99 % e T de -20 a 50 °C.
+- `psicrometrico`: resolve a equação do psicrómetro (coeficiente do psicrómetro
+  aspirado, guia CIMO da OMM) com a pressão da estação, por Newton a partir do
+  valor de Stull, com um número fixo de iterações, tudo em array. Pressão em
+  falta (None/NaN, o -99.0 do IPMA) usa PRESSAO_PADRAO, como as apps.
+
+A pressão de vapor de saturação é a de Magnus sobre água (coeficientes de
+Sonntag), também abaixo de 0 °C.
+"""
+import numpy as np
+
+PRESSAO_PADRAO = 1013.0  # hPa
+ITERACOES = 4  # Newton a partir de Stull: erro < 1e-6 °C em todo o domínio das tabelas
+
+_A, _B, _C = 6.112, 17.62, 243.12  # Magnus: es(T) = A·exp(B·T / (C + T)) em hPa
+_PSICROMETRO = 6.53e-4  # 1/K; coeficiente A(Tw) = 6.53e-4 · (1 + 0.000944·Tw)
+_PSICROMETRO_TW = 0.000944
+
+
+def stull_wet_bulb(T, RH, pressao=None):
+    """Temperatura de bolbo húmido (°C) pela fórmula de Stull; aceita escalares ou arrays."""
+    T = np.asarray(T, dtype=float)
+    RH = np.asarray(RH, dtype=float)
+    tw = T * np.arctan(0.151977 * (RH + 8.313659)**0.5) + np.arctan(T + RH) - np.arctan(RH - 1.676331) + 0.00391838 * RH**1.5 * np.arctan(0.023101 * RH) - 4.686035
+    return tw if tw.ndim else float(tw)
+
+
+def pressao_vapor_saturacao(T):
+    """es(T) em hPa (Magnus sobre água)."""
+    return _A * np.exp(_B * T / (_C + T))
+
+
+def psicrometrico(T, RH, pressao=None, iteracoes=ITERACOES):
+    """Temperatura de bolbo húmido (°C) da equação do psicrómetro, com a pressão (hPa) da estação.
+
+    Resolve es(Tw) - A(Tw)·p·(T - Tw) = e, com e = RH·es(T), por `iteracoes`
+    passos de Newton a partir de Stull limitado a [ponto de orvalho, T].
+    """
+    T = np.asarray(T, dtype=float)
+    RH = np.asarray(RH, dtype=float)
+    p = np.asarray(PRESSAO_PADRAO if pressao is None else pressao, dtype=float)
+    p = np.where(np.isfinite(p) & (p > 0), p, PRESSAO_PADRAO)
+    e = np.clip(RH, 0, 100) / 100 * pressao_vapor_saturacao(T)
+
+    g = np.log(np.maximum(e, 1e-12) / _A)
+    orvalho = _C * g / (_B - g)
+    tw = np.clip(stull_wet_bulb(T, RH), orvalho, T)
+    for _ in range(iteracoes):
+        es = pressao_vapor_saturacao(tw)
+        coeficiente = _PSICROMETRO * (1 + _PSICROMETRO_TW * tw)
+        f = es - coeficiente * p * (T - tw) - e
+        df = es * _B * _C / (_C + tw)**2 + coeficiente * p - _PSICROMETRO * _PSICROMETRO_TW * p * (T - tw)
+        tw = tw - f / df
+    return tw if tw.ndim else float(tw)
+
+
+METODOS = {
+    'stull': stull_wet_bulb,
+    'psicrometrico': psicrometrico,
+}
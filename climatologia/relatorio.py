@@ -0,0 +1,202 @@
+"""Relatório diário: veredicto de todos os Locais a partir de um único snapshot do IPMA.
+
+    python -m climatologia relatorio --ti 20 > relatorio.csv
+    python -m climatologia relatorio --ti 20 -f parquet -o relatorio.parquet
+    python -m climatologia relatorio --ti 20 -f pdf -o relatorio.pdf
+
+Cada local da folha "Locais" do Climatologia_8.xlsx dá uma linha por classe com
+a observação (T, RH, pressão), tm e os valores das tabelas (P, tv, tl; tv_F na
+classe B). Os locais são avaliados em blocos, cada bloco numa só passagem do
+MotorLote, e cada bloco é escrito logo a seguir (CSV, Parquet ou PDF), pelo que
+a memória não cresce com o número de locais. Locais sem estação ou sem
+observação no snapshot ficam com resultado `sem_dados`.
+
+O Parquet precisa do pyarrow (pip install pyarrow); o PDF é escrito aqui
+mesmo, em texto monoespaçado, sem dependências.
+"""
+import csv
+import io
+import itertools
+import math
+
+import numpy as np
+
+from climatologia.motor import NOMES, texto_resultado
+
+BLOCO = 500
+
+COLUNAS = ('local', 'estacao', 'hora', 'T', 'RH', 'pressao', 'classe', 'ti', 'tm', 'delta',
+           'P', 'tv', 'tl', 'tv_F', 'fora_dominio', 'resultado', 'texto')
+
+
+def _valor(x):
+    x = float(x)
+    return None if math.isnan(x) else x
+
+
+def linhas(motor, locais, mapa, ultima, ti, classes=('A', 'B'), bloco=BLOCO):
+    """Itera blocos (listas de dicts com COLUNAS) com os veredictos de cada local e classe.
+
+    `mapa` dá a estação de cada local ({local: station_id}) e `ultima` a última
+    observação de cada estação (IndiceEstacoes.ultima de um snapshot).
+    """
+    it = iter(locais)
+    while True:
+        nomes = list(itertools.islice(it, bloco))
+        if not nomes:
+            return
+        estacoes = [mapa.get(local) for local in nomes]
+        obs = [ultima.get(s) if s is not None else None for s in estacoes]
+        T = np.array([np.nan if o is None else o[1] for o in obs], dtype=float)
+        RH = np.array([np.nan if o is None else o[2] for o in obs], dtype=float)
+        pressao = np.array([np.nan if o is None or o[3] is None else o[3] for o in obs], dtype=float)
+        n = len(nomes)
+        res = motor.avaliar(np.tile(np.nan_to_num(T), len(classes)), np.tile(np.nan_to_num(RH), len(classes)),
+                            ti, np.repeat(classes, n), np.tile(pressao, len(classes)))
+        saida = []
+        for k, classe in enumerate(classes):
+            for i, local in enumerate(nomes):
+                j = k * n + i
+                sem_dados = obs[i] is None
+                linha = {
+                    'local': local, 'estacao': estacoes[i], 'hora': None if sem_dados else obs[i][0],
+                    'T': _valor(T[i]), 'RH': _valor(RH[i]), 'pressao': _valor(pressao[i]),
+                    'classe': classe, 'ti': float(ti),
+                }
+                for campo in ('tm', 'delta', 'P', 'tv', 'tl', 'tv_F'):
+                    linha[campo] = None if sem_dados else _valor(res[campo][j])
+                codigo = int(res['resultado'][j])
+                linha['fora_dominio'] = None if sem_dados else bool(res['fora_dominio'][j])
+                linha['resultado'] = 'sem_dados' if sem_dados else NOMES[codigo]
+                linha['texto'] = "Sem dados recentes" if sem_dados else texto_resultado(classe, codigo)
+                saida.append(linha)
+        yield saida
+
+
+class EscritorCSV:
+    def __init__(self, destino):
+        self._texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+        self._escritor = csv.DictWriter(self._texto, fieldnames=COLUNAS)
+        self._escritor.writeheader()
+
+    def escrever(self, bloco):
+        self._escritor.writerows(bloco)
+        self._texto.flush()
+
+    def fechar(self):
+        self._texto.flush()
+        self._texto.detach()  # o destino fica aberto, para quem o passou
+
+
+class EscritorParquet:
+    """Um row group por bloco."""
+
+    def __init__(self, destino):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("o relatório em Parquet precisa do pacote pyarrow (pip install pyarrow)") from e
+        texto, real = pa.string(), pa.float64()
+        self._pa = pa
+        self._esquema = pa.schema([
+            ('local', texto), ('estacao', texto), ('hora', texto), ('T', real), ('RH', real), ('pressao', real),
+            ('classe', texto), ('ti', real), ('tm', real), ('delta', real), ('P', real), ('tv', real),
+            ('tl', real), ('tv_F', real), ('fora_dominio', pa.bool_()), ('resultado', texto), ('texto', texto),
+        ])
+        self._escritor = pq.ParquetWriter(destino, self._esquema)
+
+    def escrever(self, bloco):
+        self._escritor.write_table(self._pa.Table.from_pylist(bloco, schema=self._esquema))
+
+    def fechar(self):
+        self._escritor.close()
+
+
+class EscritorPDF:
+    """PDF de texto (Courier, A4 na horizontal), uma página de cada vez.
+
+    Só o deslocamento de cada objeto fica em memória, para a tabela xref do fim.
+    """
+
+    LINHAS_PAGINA = 50
+    CABECALHO = (f"{'Local':<24} {'Estação':>8} {'Hora (UTC)':<16} {'T':>5} {'RH':>4} {'hPa':>6} Cl {'ti':>5}"
+                 f" {'tm':>6} {'P':>5} {'tv':>5} {'tl':>5} {'tv_F':>5}  Resultado")
+
+    def __init__(self, destino, titulo="Relatório diário de ventilação dos paióis"):
+        self._destino = destino
+        self._posicao = 0
+        self._deslocamentos = {}
+        self._paginas = []
+        self._pendentes = []
+        self._titulo = titulo
+        self._escrever_bytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._objeto(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._objeto(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>')
+        self._proximo = 4
+
+    def _escrever_bytes(self, dados):
+        self._destino.write(dados)
+        self._posicao += len(dados)
+
+    def _objeto(self, numero, corpo):
+        self._deslocamentos[numero] = self._posicao
+        self._escrever_bytes(b'%d 0 obj\n' % numero + corpo + b'\nendobj\n')
+
+    @staticmethod
+    def _texto(linha):
+        linha = linha.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return linha.encode('cp1252', errors='replace')
+
+    @staticmethod
+    def _formatar(linha):
+        def num(campo, largura, casas=1):
+            valor = linha[campo]
+            return f"{'':>{largura}}" if valor is None else f"{valor:>{largura}.{casas}f}"
+        return (f"{linha['local'][:24]:<24} {linha['estacao'] or '':>8} {(linha['hora'] or '')[:16]:<16}"
+                f" {num('T', 5)} {num('RH', 4, 0)} {num('pressao', 6)} {linha['classe']:>2} {num('ti', 5)}"
+                f" {num('tm', 6, 2)} {num('P', 5)} {num('tv', 5)} {num('tl', 5)} {num('tv_F', 5, 0)}  {linha['resultado']}")
+
+    def _pagina(self):
+        linhas = [self._titulo, '', self.CABECALHO] + self._pendentes
+        self._pendentes = []
+        conteudo = b'BT /F1 8 Tf 10 TL 30 565 Td\n' + b''.join(
+            b'(' + self._texto(linha) + b') Tj T*\n' for linha in linhas) + b'ET'
+        numero = self._proximo
+        self._objeto(numero, b'<< /Length %d >>\nstream\n' % len(conteudo) + conteudo + b'\nendstream')
+        self._objeto(numero + 1, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595]'
+                                 b' /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % numero)
+        self._paginas.append(numero + 1)
+        self._proximo += 2
+
+    def escrever(self, bloco):
+        for linha in bloco:
+            self._pendentes.append(self._formatar(linha))
+            if len(self._pendentes) == self.LINHAS_PAGINA:
+                self._pagina()
+
+    def fechar(self):
+        if self._pendentes or not self._paginas:
+            self._pagina()
+        kids = b' '.join(b'%d 0 R' % p for p in self._paginas)
+        self._objeto(2, b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(self._paginas))
+        xref = self._posicao
+        total = self._proximo
+        entradas = b''.join(b'%010d 00000 n \n' % self._deslocamentos[i] for i in range(1, total))
+        self._escrever_bytes(b'xref\n0 %d\n0000000000 65535 f \n' % total + entradas
+                             + b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (total, xref))
+
+
+FORMATOS = {'csv': EscritorCSV, 'parquet': EscritorParquet, 'pdf': EscritorPDF}
+TIPOS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet', 'pdf': 'application/pdf'}
+
+
+def exportar(blocos, destino, formato='csv'):
+    """Escreve os blocos de `linhas` num ficheiro binário aberto, à medida que chegam; devolve o nº de linhas."""
+    escritor = FORMATOS[formato](destino)
+    total = 0
+    for bloco in blocos:
+        escritor.escrever(bloco)
+        total += len(bloco)
+    escritor.fechar()
+    return total
@@ -0,0 +1,194 @@
+"""Reprocessamento do histórico: veredictos de cada paiol ao longo de anos de observações.
+
+Serve para saber como teriam sido as decisões passadas depois de uma correção
+das Tabelas III/IV ou de uma mudança do motor: `reprocessar` dá a linha do
+tempo de cada paiol (segmentos de horas seguidas com o mesmo veredicto) e, com
+uma segunda versão, os intervalos em que as duas diferem. Uma versão é
+(pasta das tabelas, modo 'proximo' ou 'interpolado', método do bolbo húmido
+de psicrometria.METODOS).
+
+As observações vêm de ficheiros com a forma do observations.json (lidos em
+fluxo, uma hora de cada vez), de CSV com as colunas station_id, hora,
+temperatura, humidade e pressao (opcional), ou de bases do histórico
+(climatologia.historico). `importar` junta-as numa base com o esquema do
+histórico: a chave (estação, hora) elimina as horas repetidas entre ficheiros e
+deixa cada estação contígua no disco. Cada estação é lida em blocos de `bloco`
+horas e as estações são repartidas por um pool de processos, pelo que a memória
+fica limitada a um bloco por processo, seja qual for o tamanho do histórico.
+"""
+import csv
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from climatologia import fluxo, historico, interpolacao, ipma, psicrometria, tabelas
+from climatologia.motor import NOMES, MotorLote
+
+BLOCO = 100_000  # horas de uma estação avaliadas de cada vez
+
+_motores = {}
+
+
+def _linhas_json(caminho, estacoes):
+    with open(caminho, 'rb') as f:
+        for hora, observacoes in fluxo.iterar_horas(iter(lambda: f.read(fluxo.PEDACO), b''), estacoes):
+            for station_id, obs in (observacoes or {}).items():
+                T, RH = (None, None) if not obs else (ipma._valor(obs, 'temperatura'), ipma._valor(obs, 'humidade'))
+                if T is not None and RH is not None:
+                    yield station_id, hora, T, RH, ipma._valor(obs, 'pressao')
+
+
+def _linhas_csv(caminho, estacoes):
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        for registo in csv.DictReader(f):
+            station_id = registo['station_id']
+            if estacoes is not None and station_id not in estacoes:
+                continue
+            T, RH = ipma._valor(registo, 'temperatura'), ipma._valor(registo, 'humidade')
+            if T is not None and RH is not None:
+                yield station_id, registo['hora'], T, RH, ipma._valor(registo, 'pressao')
+
+
+def _linhas_sqlite(caminho, estacoes):
+    con = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+    try:
+        for linha in con.execute("SELECT station_id, hora, temperatura, humidade, pressao FROM observacoes"):
+            if estacoes is None or linha[0] in estacoes:
+                yield linha
+    finally:
+        con.close()
+
+
+def e_sqlite(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read(16) == b'SQLite format 3\x00'
+
+
+def linhas(caminho, estacoes=None):
+    """(station_id, hora, T, RH, pressão) de um ficheiro de observações (JSON, CSV ou SQLite), em fluxo."""
+    if e_sqlite(caminho):
+        return _linhas_sqlite(caminho, estacoes)
+    if os.path.splitext(caminho)[1].lower() == '.csv':
+        return _linhas_csv(caminho, estacoes)
+    return _linhas_json(caminho, estacoes)
+
+
+def importar(fontes, base, estacoes=None):
+    """Junta as observações das `fontes` na base `base` (só as `estacoes`, se dadas); devolve as horas novas."""
+    estacoes = None if estacoes is None else {str(e) for e in estacoes}
+    destino = historico.HistoricoObservacoes(base)
+    return sum(destino.gravar_linhas(linhas(caminho, estacoes)) for caminho in fontes)
+
+
+def estacoes_dos_paiois(paiois, city_to_id):
+    """{station_id: [(nome, classe, ti)]}; `local` pelo mapeamento cidade → estação (ValueError se faltar)."""
+    por_estacao = {}
+    for p in paiois:
+        station_id = p['estacao'] or city_to_id.get(p['local'])
+        if station_id is None:
+            raise ValueError(f"paiol {p['nome']!r}: local {p['local']!r} sem estação conhecida; indicar `estacao` no registo")
+        por_estacao.setdefault(str(station_id), []).append((p['nome'], p['classe'], p['ti']))
+    return por_estacao
+
+
+def motor(versao):
+    """MotorLote de uma versão (pasta, modo, método do bolbo húmido), criado uma vez por processo."""
+    if versao not in _motores:
+        pasta, modo, metodo = versao
+        grelhas = interpolacao.interpoladas(pasta) if modo == 'interpolado' else tabelas.compiladas(pasta)
+        _motores[versao] = MotorLote(grelhas, psicrometria.METODOS[metodo])
+    return _motores[versao]
+
+
+class Segmentos:
+    """Junta valores hora a hora, bloco a bloco, em segmentos [inicio, fim, valor, horas]."""
+
+    def __init__(self):
+        self.atual = None
+
+    def juntar(self, horas, valores):
+        """Acrescenta um bloco (horas por ordem); devolve os segmentos que ficaram fechados."""
+        if len(valores) == 0:
+            return []
+        inicios = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]])
+        fins = np.r_[inicios[1:], len(valores)]
+        segmentos = [list(s) for s in zip(
+            horas[inicios].tolist(), horas[fins - 1].tolist(), valores[inicios].tolist(), (fins - inicios).tolist())]
+        if self.atual is not None:
+            if self.atual[2] == segmentos[0][2]:  # o bloco continua o segmento em aberto
+                self.atual[1] = segmentos[0][1]
+                self.atual[3] += segmentos[0][3]
+                segmentos[0] = self.atual
+            else:
+                segmentos.insert(0, self.atual)
+        self.atual = segmentos.pop()
+        return segmentos
+
+    def fechar(self):
+        fechados, self.atual = ([] if self.atual is None else [self.atual]), None
+        return fechados
+
+
+def reprocessar_estacao(base, station_id, paiois, versao, comparar=None, inicio=None, fim=None, bloco=BLOCO):
+    """Linha do tempo (ou, com `comparar`, as diferenças) dos paióis de uma estação.
+
+    Devolve {'estacao', 'horas', 'linhas', 'resumo'}: `linhas` são dicts prontos
+    para escrever; `resumo` dá, por paiol, as horas avaliadas, as horas com
+    veredicto diferente e as contagens de cada par (antes, depois).
+    """
+    motores = (motor(versao),) + (() if comparar is None else (motor(comparar),))
+    segmentos = {nome: Segmentos() for nome, _, _ in paiois}
+    resumo = {nome: {'horas': 0, 'diferentes': 0, 'pares': {}} for nome, _, _ in paiois}
+    saida, horas_estacao = [], 0
+
+    def emitir(nome, classe, ti, fechados):
+        for inicio_s, fim_s, valor, horas in fechados:
+            linha = {'paiol': nome, 'estacao': station_id, 'classe': classe, 'ti': ti,
+                     'inicio': inicio_s, 'fim': fim_s, 'horas': horas}
+            if comparar is None:
+                saida.append(dict(linha, resultado=NOMES[valor]))
+            elif valor // 16 != valor % 16:
+                saida.append(dict(linha, antes=NOMES[valor // 16], depois=NOMES[valor % 16]))
+
+    for serie in historico.HistoricoObservacoes(base).iterar_serie(station_id, inicio, fim, bloco):
+        horas_estacao += len(serie['hora'])
+        for nome, classe, ti in paiois:
+            codigos = [m.avaliar(serie['temperatura'], serie['humidade'], ti, classe, serie['pressao'])['resultado']
+                       for m in motores]
+            resumo[nome]['horas'] += len(serie['hora'])
+            if comparar is None:
+                valores = codigos[0]
+            else:
+                valores = codigos[0] * 16 + codigos[1]  # par (antes, depois) num só inteiro
+                diferentes = valores[codigos[0] != codigos[1]]
+                resumo[nome]['diferentes'] += len(diferentes)
+                pares = resumo[nome]['pares']
+                for par, n in zip(*(a.tolist() for a in np.unique(diferentes, return_counts=True))):
+                    chave = (NOMES[par // 16], NOMES[par % 16])
+                    pares[chave] = pares.get(chave, 0) + n
+            emitir(nome, classe, ti, segmentos[nome].juntar(serie['hora'], valores))
+    for nome, classe, ti in paiois:
+        emitir(nome, classe, ti, segmentos[nome].fechar())
+    return {'estacao': station_id, 'horas': horas_estacao, 'linhas': saida, 'resumo': resumo}
+
+
+def _tarefa(argumentos):
+    return reprocessar_estacao(*argumentos)
+
+
+def reprocessar(base, por_estacao, versao, comparar=None, processos=None, inicio=None, fim=None, bloco=BLOCO):
+    """Gera o resultado de `reprocessar_estacao` de cada estação, por ordem de station_id.
+
+    As estações são repartidas por `processos` processos (por omissão, um por
+    CPU); com processos=1 corre tudo neste processo.
+    """
+    tarefas = [(base, station_id, por_estacao[station_id], versao, comparar, inicio, fim, bloco)
+               for station_id in sorted(por_estacao)]
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos <= 1:
+        yield from map(_tarefa, tarefas)
+        return
+    with ProcessPoolExecutor(processos) as pool:
+        yield from pool.map(_tarefa, tarefas)
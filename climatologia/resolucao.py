@@ -0,0 +1,162 @@
+"""Estação IPMA mais próxima de cada local da folha "Locais", a partir do stations.json.
+
+O CITY_TO_ID manual cobre só parte dos Locais (e tem erros). Aqui cada local
+recebe coordenadas, por esta ordem: ficheiro locais_coordenadas.csv (colunas
+local,lat,lon; o do repositório cobre os Locais e o CITY_TO_ID), estação do feed
+com o mesmo nome, ou a estação do CITY_TO_ID. As estações do feed ficam num
+índice espacial (vetores unitários na esfera) e cada local guarda as
+K_CANDIDATAS mais próximas; na consulta usa-se a primeira que tenha observação
+válida, passando à seguinte se vier a null.
+
+As candidatas só são recalculadas quando chega um stations.json novo.
+"""
+import csv
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from climatologia import ipma
+
+RAIO_TERRA = 6371.0  # km
+K_CANDIDATAS = 5
+COORDENADAS = 'locais_coordenadas.csv'
+
+_LIGACOES = {'de', 'do', 'da', 'dos', 'das', 'e'}
+
+log = logging.getLogger(__name__)
+
+_resolvedor = None
+_lock = threading.Lock()
+
+
+def normalizar(nome):
+    """Nome sem acentos, maiúsculas, pontuação nem preposições ("Viana Castelo" == "Viana do Castelo")."""
+    nome = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode().lower()
+    return ' '.join(p for p in re.split(r'[^a-z0-9]+', nome) if p and p not in _LIGACOES)
+
+
+def _vetores(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class IndiceEspacial:
+    """Vizinhos mais próximos (distância ortodrómica) de um conjunto fixo de estações."""
+
+    def __init__(self, estacoes):
+        """`estacoes` mapeia station_id → (nome, lat, lon), como ipma.EstacoesCache."""
+        self.ids = np.array(sorted(estacoes))
+        lat = np.array([estacoes[s][1] for s in self.ids], dtype=float)
+        lon = np.array([estacoes[s][2] for s in self.ids], dtype=float)
+        self.vetores = _vetores(lat, lon)
+
+    def vizinhas(self, lat, lon, k=K_CANDIDATAS):
+        """Para arrays de lat/lon, (ids, km) das k estações mais próximas de cada ponto, por ordem."""
+        k = min(k, len(self.ids))
+        cos = np.clip(_vetores(np.atleast_1d(lat), np.atleast_1d(lon)) @ self.vetores.T, -1.0, 1.0)
+        perto = np.argpartition(-cos, k - 1, axis=1)[:, :k]
+        ordem = np.take_along_axis(perto, np.argsort(-np.take_along_axis(cos, perto, axis=1), axis=1), axis=1)
+        return self.ids[ordem], RAIO_TERRA * np.arccos(np.take_along_axis(cos, ordem, axis=1))
+
+
+def ler_coordenadas(caminho=COORDENADAS):
+    """{local: (lat, lon)} do ficheiro de coordenadas, ou {} se não existir."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        return {linha['local']: (float(linha['lat']), float(linha['lon'])) for linha in csv.DictReader(f)}
+
+
+def _por_nome(estacoes):
+    """{nome normalizado: station_id}, tanto do nome completo como da parte antes de ',' / '('."""
+    completos, principais = {}, {}
+    for station_id in sorted(estacoes):
+        nome = estacoes[station_id][0]
+        completos.setdefault(normalizar(nome), station_id)
+        principais.setdefault(normalizar(re.split(r'[,(]', nome)[0]), station_id)
+    return completos, principais
+
+
+class Resolvedor:
+    """Candidatas (station_id, km) de cada local, ordenadas por distância."""
+
+    def __init__(self, locais, manual=None, coordenadas=None, k=K_CANDIDATAS):
+        self.manual = dict(manual or {})
+        # Os locais só do mapeamento manual também são resolvidos (o CITY_TO_ID tem erros, p.ex. São Jacinto → Espinho)
+        self.locais = tuple(locais) + tuple(local for local in self.manual if local not in set(locais))
+        self.coordenadas = dict(coordenadas or {})
+        self.k = k
+        self._candidatas = {}
+        self.sem_coordenadas = ()
+
+    def _posicao(self, local, estacoes, completos, principais):
+        if local in self.coordenadas:
+            return self.coordenadas[local]
+        chave = normalizar(local)
+        station_id = completos.get(chave) or principais.get(chave) or self.manual.get(local)
+        if station_id in estacoes:
+            return estacoes[station_id][1:]
+        return None
+
+    def atualizar(self, estacoes):
+        """Recalcula as candidatas para um novo stations.json (ouvinte de ipma.cache_estacoes)."""
+        if not estacoes:
+            return
+        completos, principais = _por_nome(estacoes)
+        posicoes = {local: self._posicao(local, estacoes, completos, principais) for local in self.locais}
+        com = [local for local in self.locais if posicoes[local] is not None]
+        candidatas = {}
+        if com:
+            lat, lon = np.array([posicoes[local] for local in com], dtype=float).T
+            ids, km = IndiceEspacial(estacoes).vizinhas(lat, lon, self.k)
+            for local, linha_ids, linha_km in zip(com, ids.tolist(), km.tolist()):
+                candidatas[local] = tuple(zip(linha_ids, linha_km))
+        self._candidatas = candidatas  # troca atómica: os leitores veem o dict antigo ou o novo
+        self.sem_coordenadas = tuple(local for local in self.locais if posicoes[local] is None)
+        if self.sem_coordenadas:
+            log.warning("Locais sem coordenadas (acrescentar a %s): %s", COORDENADAS, ', '.join(self.sem_coordenadas))
+
+    def candidatas(self, local):
+        return self._candidatas.get(local, ())
+
+    def distancia(self, local, station_id):
+        """km do local à estação, se for uma das candidatas."""
+        return dict(self.candidatas(local)).get(station_id)
+
+    def estacoes(self):
+        """Todas as estações candidatas e as do mapeamento manual (para ipma.ObservacoesCache.filtrar)."""
+        ids = {station_id for linha in self._candidatas.values() for station_id, _ in linha}
+        return ids | set(self.manual.values())
+
+    def resolver(self, local, observacoes, k=1):
+        """As k candidatas mais próximas com observação válida, como [(station_id, km)]."""
+        return [(s, km) for s, km in self.candidatas(local) if observacoes.get(s) is not None][:k]
+
+    def mapeamento(self, observacoes=None):
+        """{local: station_id}: a estação mais próxima com dados (sem `observacoes`, a mais próxima).
+
+        Locais sem candidatas (feed de estações ainda por carregar ou sem
+        coordenadas) mantêm o mapeamento manual, se o tiverem.
+        """
+        mapa = {local: station_id for local, station_id in self.manual.items() if not self.candidatas(local)}
+        for local in self._candidatas:
+            if observacoes is None:
+                mapa[local] = self.candidatas(local)[0][0]
+            else:
+                escolhidas = self.resolver(local, observacoes)
+                mapa[local] = escolhidas[0][0] if escolhidas else self.candidatas(local)[0][0]
+        return mapa
+
+
+def ativar(locais, manual=None, pasta='.', cache=None):
+    """Resolvedor do processo, ligado ao feed de estações (idempotente)."""
+    global _resolvedor
+    with _lock:
+        if _resolvedor is None:
+            _resolvedor = Resolvedor(locais, manual, ler_coordenadas(os.path.join(pasta, COORDENADAS)))
+            (cache or ipma.cache_estacoes).ao_atualizar(_resolvedor.atualizar)
+        return _resolvedor
@@ -0,0 +1,185 @@
+"""Substituto local do IPMA: serve feeds gravados nos caminhos da API, com latência e erros injetados.
+
+    python -m climatologia.servidor climatologia/gravacoes --porta 8765 --latencia 0.2 --erros 0.05
+    CLIMATOLOGIA_FONTE=http://127.0.0.1:8765 streamlit run app.py
+
+A pasta tem o stations.json e uma ou mais gravações do feed (observations*.json,
+por ordem do nome); cada gravação é "publicada" durante --intervalo segundos, em
+ciclo, como as horas do IPMA. Responde a pedidos condicionais (ETag → 304).
+--erros é a fração de pedidos que recebem --codigo-erro (503: o cliente repete)
+e --invalidos a fração que recebe o JSON cortado a meio. Com --gravar, guarda
+os feeds atuais do IPMA na pasta (uma gravação nova por chamada) e sai.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from climatologia import ipma
+from climatologia.cliente import ClienteIPMA
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gravacoes')  # feeds gravados, com o pacote
+
+
+def _ler(caminho):
+    with open(caminho, 'rb') as f:
+        corpo = f.read()
+    return corpo, '"' + hashlib.sha256(corpo).hexdigest()[:16] + '"'
+
+
+class Substituto:
+    """Servidor HTTP (numa thread) que faz de api.ipma.pt; conta os pedidos por código de resposta."""
+
+    def __init__(self, pasta=FIXTURES, latencia=0.0, jitter=0.0, erros=0.0, invalidos=0.0,
+                 intervalo=ipma.INTERVALO_IPMA, codigo_erro=503, endereco='127.0.0.1', porta=0, semente=None):
+        gravacoes = sorted(glob.glob(os.path.join(pasta, 'observations*.json')))
+        if not gravacoes:
+            raise ValueError(f"sem gravações observations*.json em {pasta}")
+        self.gravacoes = [_ler(caminho) for caminho in gravacoes]
+        estacoes = os.path.join(pasta, 'stations.json')
+        self.estacoes = _ler(estacoes) if os.path.exists(estacoes) else None
+        self.latencia = latencia
+        self.jitter = jitter
+        self.erros = erros
+        self.invalidos = invalidos
+        self.intervalo = intervalo
+        self.codigo_erro = codigo_erro
+        self.respostas = Counter()
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+        self._httpd = ThreadingHTTPServer((endereco, porta), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        endereco, porta = self._httpd.server_address[:2]
+        return f'http://{endereco}:{porta}'
+
+    @property
+    def pedidos(self):
+        return sum(self.respostas.values())
+
+    def gravacao_atual(self):
+        """Índice da gravação publicada agora."""
+        return int((time.monotonic() - self._inicio) // self.intervalo) % len(self.gravacoes)
+
+    def _sortear(self):
+        """(segundos de espera, erro?, JSON inválido?) de um pedido."""
+        with self._lock:
+            espera = self.latencia + self._aleatorio.uniform(0, self.jitter)
+            return espera, self._aleatorio.random() < self.erros, self._aleatorio.random() < self.invalidos
+
+    def _responder(self, pedido):
+        espera, erro, invalido = self._sortear()
+        time.sleep(espera)
+        nome = pedido.path.split('?', 1)[0].rsplit('/', 1)[-1]
+        feed = {'observations.json': self.gravacoes[self.gravacao_atual()], 'stations.json': self.estacoes}.get(nome)
+        if erro:
+            return self.codigo_erro, b'', None
+        if feed is None:
+            return 404, b'', None
+        corpo, etag = feed
+        if pedido.headers.get('If-None-Match') == etag:
+            return 304, b'', etag
+        return 200, corpo[:len(corpo) // 2] if invalido else corpo, etag
+
+    def _handler(self):
+        substituto = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # ligações reutilizadas, como no IPMA
+
+            def do_GET(self):
+                codigo, corpo, etag = substituto._responder(self)
+                with substituto._lock:
+                    substituto.respostas[codigo] += 1
+                self.send_response(codigo)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        """Começa a servir numa thread daemon; devolve o URL base (para CLIMATOLOGIA_FONTE)."""
+        threading.Thread(target=self._httpd.serve_forever, name='ipma-substituto', daemon=True).start()
+        return self.url
+
+    def parar(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def gravar(pasta, cliente=None):
+    """Guarda o observations.json atual do IPMA (com a hora mais recente no nome) e o stations.json; devolve os caminhos."""
+    cliente = cliente or ClienteIPMA()
+    os.makedirs(pasta, exist_ok=True)
+    caminhos = []
+    for url in (ipma.OBSERVATIONS_URL, ipma.STATIONS_URL):
+        response = cliente.get(url)
+        if response.status_code != 200:
+            raise ipma.IPMAErro(response.status_code)
+        if url == ipma.OBSERVATIONS_URL:
+            hora = max(response.json()).replace(':', '').replace('-', '')
+            nome = f'observations_{hora}.json'
+        else:
+            nome = 'stations.json'
+        caminho = os.path.join(pasta, nome)
+        with open(caminho, 'wb') as f:
+            f.write(response.content)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pasta', nargs='?', default=FIXTURES, help="pasta com observations*.json e stations.json")
+    parser.add_argument('--endereco', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help="segundos antes de cada resposta")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latência extra aleatória, até estes segundos")
+    parser.add_argument('--erros', type=float, default=0.0, help="fração de pedidos com --codigo-erro")
+    parser.add_argument('--codigo-erro', type=int, default=503)
+    parser.add_argument('--invalidos', type=float, default=0.0, help="fração de respostas com o JSON cortado")
+    parser.add_argument('--intervalo', type=float, default=ipma.INTERVALO_IPMA, help="segundos de cada gravação")
+    parser.add_argument('--semente', type=int, help="semente da latência e dos erros (ensaios reprodutíveis)")
+    parser.add_argument('--gravar', action='store_true', help="grava os feeds atuais do IPMA na pasta e sai")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.gravar:
+            for caminho in gravar(args.pasta):
+                print(caminho)
+            return 0
+        substituto = Substituto(args.pasta, args.latencia, args.jitter, args.erros, args.invalidos, args.intervalo,
+                                args.codigo_erro, args.endereco, args.porta, args.semente)
+    except (OSError, ValueError, ipma.IPMAErro) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        return 2
+    print(f"{len(substituto.gravacoes)} gravação(ões) de {args.pasta}; CLIMATOLOGIA_FONTE={substituto.url}", file=sys.stderr)
+    substituto.iniciar()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        substituto.parar()
+        print(f"respostas: {dict(substituto.respostas)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Leitura e compilação das tabelas de ventilação (III, III-bis e IV).
+
+As grelhas compiladas (`compiladas`) são lidas dos CSV com o módulo csv e
+NumPy. O pandas só é importado por `carregar` e `ler_tabela_*`, que devolvem
+as tabelas como DataFrames (referência dos testes).
+"""
+import csv
+import math
+import os
+
+import numpy as np
+
+from climatologia import metricas
+from climatologia.cache import em_cache
+
+
+def ler_tabela_iii(caminho='tabela_iii.csv'):
+    import pandas as pd
+
+    tabela_iii = pd.read_csv(caminho, skiprows=1, index_col=0, encoding='utf-8-sig')
+    tabela_iii.index = pd.to_numeric(tabela_iii.index, errors='coerce')
+    tabela_iii.columns = pd.to_numeric(tabela_iii.columns)
+    return tabela_iii.apply(pd.to_numeric, errors='coerce')  # Converte valores como '_' para NaN
+
+
+def ler_tabela_iiibis(caminho='tabela_iiibis.csv'):
+    import pandas as pd
+
+    return pd.read_csv(caminho, encoding='utf-8-sig')
+
+
+def ler_tabela_iv(caminho='tabela_iv.csv'):
+    import pandas as pd
+
+    tabela_iv = pd.read_csv(caminho, encoding='utf-8-sig')
+    for coluna in ('ts', 'tm', 'tv'):
+        tabela_iv[coluna] = pd.to_numeric(tabela_iv[coluna], errors='coerce')  # Converte valores como '-' para NaN
+    return tabela_iv
+
+
+def _caminhos(pasta):
+    return tuple(os.path.join(pasta, nome) for nome in ('tabela_iii.csv', 'tabela_iiibis.csv', 'tabela_iv.csv'))
+
+
+def _ler_tabelas(caminho_iii, caminho_iiibis, caminho_iv):
+    with metricas.medir('tabelas.ler_csv'):
+        return ler_tabela_iii(caminho_iii), ler_tabela_iiibis(caminho_iiibis), ler_tabela_iv(caminho_iv)
+
+
+def _numero(texto):
+    """float do texto, ou NaN para '_', '-' e vazios (como pd.to_numeric(errors='coerce'))."""
+    try:
+        return float(texto)
+    except ValueError:
+        return math.nan
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        return [linha for linha in csv.reader(f) if any(linha)]
+
+
+def _colunas(caminho, nomes):
+    cabecalho, *linhas = _linhas_csv(caminho)
+    posicoes = [cabecalho.index(nome) for nome in nomes]
+    return tuple(np.array([_numero(linha[i]) for linha in linhas]) for i in posicoes)
+
+
+def ler_valores(caminho_iii, caminho_iiibis, caminho_iv):
+    """As três tabelas como arrays, sem pandas: ((ts, ts-tm, P), (P, tv, tl), (ts, tm, tv)).
+
+    Mesmos valores que `valores_de(*carregar(...))`.
+    """
+    with metricas.medir('tabelas.ler_csv'):
+        _, cabecalho, *linhas = _linhas_csv(caminho_iii)
+        iii = (
+            np.array([_numero(linha[0]) for linha in linhas]),
+            np.array([float(d) for d in cabecalho[1:]]),
+            np.array([[_numero(v) for v in linha[1:]] for linha in linhas]),
+        )
+        return iii, _colunas(caminho_iiibis, ('P', 'tv', 'tl')), _colunas(caminho_iv, ('ts', 'tm', 'tv'))
+
+
+def valores_de(tabela_iii, tabela_iiibis, tabela_iv):
+    """Os arrays de `ler_valores` a partir das tabelas lidas com pandas."""
+    return (
+        (tabela_iii.index.to_numpy(dtype=float), tabela_iii.columns.to_numpy(dtype=float), tabela_iii.to_numpy(dtype=float)),
+        tuple(tabela_iiibis[c].to_numpy(dtype=float) for c in ('P', 'tv', 'tl')),
+        tuple(tabela_iv[c].to_numpy(dtype=float) for c in ('ts', 'tm', 'tv')),
+    )
+
+
+def _compilar_ficheiros(caminho_iii, caminho_iiibis, caminho_iv):
+    iii, iiibis, iv = ler_valores(caminho_iii, caminho_iiibis, caminho_iv)
+    with metricas.medir('tabelas.compilar'):
+        return compilar_valores(iii, iiibis, iv)
+
+
+def carregar(pasta='.'):
+    """Devolve (tabela_iii, tabela_iiibis, tabela_iv) lidas dos CSV da pasta.
+
+    As tabelas são lidas uma vez por processo e partilhadas (só de leitura) entre
+    reruns e sessões; voltam a ser lidas quando o mtime de algum CSV muda.
+    """
+    return em_cache(_ler_tabelas, *_caminhos(pasta))
+
+
+def compiladas(pasta='.'):
+    """TabelasCompiladas dos CSV da pasta, com a mesma cache por processo de `carregar`."""
+    return em_cache(_compilar_ficheiros, *_caminhos(pasta))
+
+
+def _primeiro_ordenado(distancias):
+    # Desempate igual ao de Series.argsort()[:1] usado nas apps
+    return np.argsort(distancias, axis=1)[:, 0]
+
+
+def _indices_mais_proximos(valores, alvos):
+    """Para cada alvo, a posição do valor mais próximo (primeira em caso de empate, como o argmin)."""
+    return np.abs(valores[None, :] - alvos[:, None]).argmin(axis=1)
+
+
+def _escalar(resultado):
+    return resultado if resultado.ndim else resultado.item()
+
+
+class TabelasCompiladas:
+    """Tabelas III, III-bis e IV compiladas em grelhas densas indexadas por inteiros.
+
+    Cada célula guarda já o resultado do "closest match" das apps, pelo que um
+    lookup é um acesso direto ao array. Fora do domínio os índices são limitados
+    às margens, o que dá o mesmo vizinho mais próximo (a distância só cresce
+    por uma constante).
+    """
+
+    def __init__(self, ts_min, delta_min, P, tv_A, tl_A, P_bis, tv_bis, tl_bis, tsF_min, tmF_min, tv_F):
+        self.ts_min = ts_min
+        self.delta_min = delta_min
+        self.P = P
+        self.tv_A = tv_A
+        self.tl_A = tl_A
+        self.P_bis = P_bis
+        self.tv_bis = tv_bis
+        self.tl_bis = tl_bis
+        self.tsF_min = tsF_min
+        self.tmF_min = tmF_min
+        self.tv_F = tv_F
+        for grelha in (P, tv_A, tl_A, P_bis, tv_bis, tl_bis, tv_F):
+            grelha.flags.writeable = False  # partilhadas entre sessões
+
+    interpolado = False  # ver climatologia.interpolacao
+
+    _GRELHAS = ('P', 'tv_A', 'tl_A', 'P_bis', 'tv_bis', 'tl_bis', 'tv_F')
+    _ORIGENS = ('ts_min', 'delta_min', 'tsF_min', 'tmF_min')
+
+    def como_arrays(self):
+        """Dict de arrays NumPy (para np.savez), inverso de `de_arrays`."""
+        arrays = {nome: getattr(self, nome) for nome in self._GRELHAS}
+        arrays.update({nome: np.array(getattr(self, nome)) for nome in self._ORIGENS})
+        return arrays
+
+    @classmethod
+    def de_arrays(cls, arrays):
+        grelhas = {nome: np.asarray(arrays[nome]) for nome in cls._GRELHAS}  # sem cópia (memmap partilhado)
+        origens = {nome: int(arrays[nome]) for nome in cls._ORIGENS}
+        return cls(**grelhas, **origens)
+
+    def _celula_iii(self, ts, delta):
+        i = np.clip(np.round(ts).astype(int) - self.ts_min, 0, self.P.shape[0] - 1)
+        j = np.clip(np.round(delta).astype(int) - self.delta_min, 0, self.P.shape[1] - 1)
+        return i, j
+
+    def fora_dominio_iii(self, ts, delta):
+        """True onde (ts, ts-tm) arredondados saem da Tabela III (e o lookup usa a margem)."""
+        i = np.round(np.asarray(ts, dtype=float)) - self.ts_min
+        j = np.round(np.asarray(delta, dtype=float)) - self.delta_min
+        return (i < 0) | (i > self.P.shape[0] - 1) | (j < 0) | (j > self.P.shape[1] - 1)
+
+    def fora_dominio_iiibis(self, P):
+        P = np.asarray(P, dtype=float)
+        return np.isfinite(P) & ((P < self.P_bis.min()) | (P > self.P_bis.max()))
+
+    def fora_dominio_iv(self, ts_F, tm_F):
+        i = np.round(np.asarray(ts_F, dtype=float)) - self.tsF_min
+        j = np.round(np.asarray(tm_F, dtype=float)) - self.tmF_min
+        return (i < 0) | (i > self.tv_F.shape[0] - 1) | (j < 0) | (j > self.tv_F.shape[1] - 1)
+
+    def get_P(self, ts, delta):
+        """P (g/m³) da Tabela III para ts (°C) e ts-tm (°C)."""
+        with metricas.medir('lookup.get_P'):
+            i, j = self._celula_iii(np.asarray(ts, dtype=float), np.asarray(delta, dtype=float))
+            return _escalar(self.P[i, j])
+
+    def get_tv_tl_A(self, ts, delta):
+        """(tv, tl) da Tabela III-bis para o P da célula (ts, ts-tm); NaN onde P não existe."""
+        with metricas.medir('lookup.get_tv_tl_A'):
+            i, j = self._celula_iii(np.asarray(ts, dtype=float), np.asarray(delta, dtype=float))
+            return _escalar(self.tv_A[i, j]), _escalar(self.tl_A[i, j])
+
+    def get_tv_tl(self, P):
+        """(tv, tl) da linha da Tabela III-bis com P mais próximo."""
+        with metricas.medir('lookup.get_tv_tl'):
+            P = np.asarray(P, dtype=float)
+            i = _primeiro_ordenado(np.abs(self.P_bis - P.reshape(-1, 1))).reshape(P.shape)
+            return _escalar(self.tv_bis[i]), _escalar(self.tl_bis[i])
+
+    def get_tv_classB(self, ts_F, tm_F):
+        """tv (°F) da Tabela IV para ts e tm em °F."""
+        with metricas.medir('lookup.get_tv_classB'):
+            i = np.clip(np.round(np.asarray(ts_F, dtype=float)).astype(int) - self.tsF_min, 0, self.tv_F.shape[0] - 1)
+            j = np.clip(np.round(np.asarray(tm_F, dtype=float)).astype(int) - self.tmF_min, 0, self.tv_F.shape[1] - 1)
+            return _escalar(self.tv_F[i, j])
+
+
+def verificar_ts(ts):
+    """ValueError se a Tabela III tiver linhas com o mesmo ts (o lookup não saberia qual usar)."""
+    valores, contagem = np.unique(ts, return_counts=True)
+    if (contagem > 1).any():
+        raise ValueError(f"Tabela III com ts repetidos: {valores[contagem > 1].tolist()}")
+
+
+def compilar(tabela_iii, tabela_iiibis, tabela_iv):
+    """Compila as três tabelas (DataFrames de `carregar`) em grelhas densas."""
+    return compilar_valores(*valores_de(tabela_iii, tabela_iiibis, tabela_iv))
+
+
+def compilar_valores(iii, iiibis, iv):
+    """Compila os arrays de `ler_valores` em grelhas densas (corre uma vez, no arranque)."""
+    ts_iii, delta_iii, P_iii = iii
+    verificar_ts(ts_iii)
+
+    ts_grelha = np.arange(int(ts_iii.min()), int(ts_iii.max()) + 1)
+    delta_grelha = np.arange(int(delta_iii.min()), int(delta_iii.max()) + 1)
+    linhas = _indices_mais_proximos(ts_iii, ts_grelha.astype(float))
+    colunas = _indices_mais_proximos(delta_iii, delta_grelha.astype(float))
+    P = P_iii[np.ix_(linhas, colunas)]
+
+    P_bis, tv_bis, tl_bis = iiibis
+    k = _primeiro_ordenado(np.abs(P_bis - np.nan_to_num(P).reshape(-1, 1))).reshape(P.shape)
+    tv_A = np.where(np.isfinite(P), tv_bis[k], np.nan)
+    tl_A = np.where(np.isfinite(P), tl_bis[k], np.nan)
+
+    completas = np.isfinite(iv[0]) & np.isfinite(iv[1]) & np.isfinite(iv[2])
+    ts_iv, tm_iv, tv_iv = (coluna[completas] for coluna in iv)
+    tsF_grelha = np.arange(int(ts_iv.min()), int(ts_iv.max()) + 1, dtype=float)
+    tmF_grelha = np.arange(int(tm_iv.min()), int(tm_iv.max()) + 1, dtype=float)
+    ts_F, tm_F = (g.reshape(-1, 1) for g in np.meshgrid(tsF_grelha, tmF_grelha, indexing='ij'))
+    m = _primeiro_ordenado(np.abs(ts_iv - ts_F) + np.abs(tm_iv - tm_F))
+    tv_F = tv_iv[m].reshape(len(tsF_grelha), len(tmF_grelha))
+
+    return TabelasCompiladas(
+        int(ts_grelha[0]), int(delta_grelha[0]), P, tv_A, tl_A,
+        P_bis, tv_bis, tl_bis, int(tsF_grelha[0]), int(tmF_grelha[0]), tv_F,
+    )
@@ -0,0 +1,61 @@
+"""Cada página corre até ao fim sem exceções (AppTest num processo novo, com o feed gravado).
+
+As apps com login (app_2/3/4) recebem um config.yaml de teste e um token de
+sessão válido (climatologia.autenticacao), como depois de um login.
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from climatologia import pacote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG = """
+credentials:
+  usernames:
+    ana:
+      email: ana@example.com
+      name: Ana
+      password: $2b$12$abcdefghijklmnopqrstuuFJ6rO1m0Yx1tC0m8bZ5VgN5w1fQk3Ta
+cookie:
+  name: climatologia
+  key: chave-de-teste
+  expiry_days: 1
+preauthorized:
+  emails: []
+"""
+
+# Primeiro render e um clique em "Calcular" para Lisboa (com observação gravada);
+# com config.yaml, já com sessão iniciada
+SCRIPT = """
+import os, sys
+from streamlit.testing.v1 import AppTest
+from climatologia import autenticacao
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+if os.path.exists(autenticacao.CONFIG):
+    at.session_state['sessao_token'] = autenticacao.emitir_token('ana', 'Ana', autenticacao.segredo())
+at.run()
+assert not at.exception, [e.message for e in at.exception]
+cidade = at.selectbox[0]
+cidade.set_value(next(nome for nome in cidade.options if nome.startswith('Lisboa')))
+[b for b in at.button if b.label == 'Calcular'][0].click().run()
+assert not at.exception, [e.message for e in at.exception]
+print(' | '.join(s.value for s in at.success))
+"""
+
+
+@pytest.mark.parametrize('app', ['app.py', 'app_2.py', 'app_3.py', 'app_4.py'])
+def test_app_corre(tmp_path, app):
+    for nome in (app, 'locais_coordenadas.csv') + pacote.FONTES:
+        shutil.copy(os.path.join(RAIZ, nome), tmp_path)
+    if app != 'app.py':
+        (tmp_path / 'config.yaml').write_text(CONFIG)
+    env = dict(os.environ, PYTHONPATH=RAIZ, CLIMATOLOGIA_FONTE=os.path.join(RAIZ, 'climatologia', 'gravacoes'))
+    saida = subprocess.run([sys.executable, '-c', SCRIPT, app], cwd=tmp_path, env=env,
+                           capture_output=True, text=True, timeout=180)
+    assert saida.returncode == 0, saida.stderr[-2000:]
+    assert saida.stdout.startswith('Resultado:')
@@ -0,0 +1,53 @@
+"""Atlas de veredictos pré-calculado (climatologia.atlas)."""
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import atlas, psicrometria, tabelas
+from climatologia.motor import NOMES, MotorLote, decisao_A, decisao_B
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def compiladas():
+    return tabelas.compiladas(RAIZ)
+
+
+@pytest.mark.parametrize('bolbo_humido', [psicrometria.stull_wet_bulb, psicrometria.psicrometrico])
+def test_igual_ao_motor(compiladas, bolbo_humido):
+    rng = np.random.default_rng(3)
+    n = 50_000
+    T, RH = rng.uniform(-15, 65, n).round(1), rng.uniform(0, 100, n).round()
+    # ti na grelha, entre pontos da grelha e fora dela; T fora das tabelas usa a margem
+    ti = np.concatenate([rng.uniform(-20, 50, n // 2).round(1), rng.uniform(-20, 50, n - n // 2).round(3)])
+    classe, pressao = rng.choice(['A', 'B'], n), rng.uniform(900, 1050, n)
+    esperado = MotorLote(compiladas, bolbo_humido).avaliar(T, RH, ti, classe, pressao)
+    obtido = atlas.Atlas(atlas.construir(compiladas), bolbo_humido).avaliar(T, RH, ti, classe, pressao)
+    for chave in ('tm', 'resultado', 'fora_dominio'):
+        assert np.array_equal(obtido[chave], esperado[chave]), chave
+
+
+def test_artefacto_so_serve_as_suas_tabelas(compiladas, tmp_path, monkeypatch):
+    monkeypatch.setattr(atlas, '_arrays', None)
+    arrays = atlas.construir(compiladas, passo_ti=0.5)
+    atlas.gravar(arrays, str(tmp_path / atlas.ATLAS))
+    assert len(atlas.de(compiladas, pasta=str(tmp_path)).ti) == len(arrays['ti'])  # lido do ficheiro
+
+    outras = tabelas.TabelasCompiladas.de_arrays(dict(compiladas.como_arrays(), tv_F=compiladas.tv_F + 1))
+    assert len(atlas.de(outras, pasta=str(tmp_path)).ti) != len(arrays['ti'])  # construído de novo
+
+
+def test_regioes(compiladas):
+    superficie = atlas.Atlas(atlas.construir(compiladas))
+    for classe, ti in (('A', 18.0), ('B', 19.95)):
+        regioes = superficie.regioes(classe, ti)
+        if classe == 'A':
+            i, j = regioes['ts (°C)'] - compiladas.ts_min, regioes['ts - tm (°C)'] - compiladas.delta_min
+            codigos = decisao_A(ti, compiladas.P[i, j], compiladas.tv_A[i, j], compiladas.tl_A[i, j])[0]
+        else:
+            i, j = regioes['ts (°F)'] - compiladas.tsF_min, regioes['tm (°F)'] - compiladas.tmF_min
+            codigos = decisao_B(ti, compiladas.tv_F[i, j])[0]
+        assert len(codigos) == (compiladas.P if classe == 'A' else compiladas.tv_F).size
+        assert regioes['Resultado'] == [NOMES[c] for c in codigos.tolist()]
@@ -0,0 +1,106 @@
+"""config.yaml em cache e tokens de sessão assinados (climatologia.autenticacao)."""
+import os
+
+import jwt
+
+from climatologia import autenticacao
+
+CHAVE_COOKIE = 'chave-de-teste-com-pelo-menos-32-bytes'
+CONFIG = """
+credentials:
+  usernames:
+    ana:
+      name: Ana
+      password: {senha}
+cookie:
+  name: climatologia
+  key: {chave}
+  expiry_days: 1
+"""
+
+
+class CookiesDoBrowser:
+    """Cookies que o browser mandaria (o CookieManager real só funciona com a app aberta)."""
+
+    def __init__(self, cookies):
+        self.cookies = cookies
+
+    def get(self, nome):
+        return self.cookies.get(nome)
+
+
+def _escrever(caminho, senha, mtime=None):
+    caminho.write_text(CONFIG.format(senha=senha, chave=CHAVE_COOKIE))
+    if mtime is not None:
+        os.utime(caminho, (mtime, mtime))
+
+
+def test_config_lido_uma_vez_ate_o_ficheiro_mudar(tmp_path):
+    caminho = tmp_path / 'config.yaml'
+    _escrever(caminho, '$2b$12$a', mtime=1_000_000)
+    primeiro = autenticacao.config(str(caminho))
+    assert autenticacao.config(str(caminho)) is primeiro
+    chave = autenticacao.segredo(str(caminho))
+
+    _escrever(caminho, '$2b$12$b', mtime=1_000_100)
+    novo = autenticacao.config(str(caminho))
+    assert novo is not primeiro
+    assert novo['credentials']['usernames']['ana']['password'] == '$2b$12$b'
+    assert autenticacao.segredo(str(caminho)) != chave  # credenciais novas invalidam os tokens
+
+
+def test_token_valido_ate_expirar():
+    token = autenticacao.emitir_token('ana', 'Ana', b'k', validade=60, agora=1000.0)
+    assert autenticacao.ler_token(token, b'k', agora=1059.0) == {'utilizador': 'ana', 'nome': 'Ana', 'expira': 1060.0}
+    assert autenticacao.ler_token(token, b'k', agora=1060.0) is None
+
+
+def test_token_adulterado_ou_de_outra_chave():
+    token = autenticacao.emitir_token('ana', 'Ana', b'k', agora=1000.0)
+    dados, assinatura = token.split('.')
+    outro = autenticacao.emitir_token('admin', 'Admin', b'k', agora=1000.0).split('.')[0]
+    assert autenticacao.ler_token(outro + '.' + assinatura, b'k', agora=1001.0) is None
+    assert autenticacao.ler_token(token, b'outra', agora=1001.0) is None
+    for invalido in (None, '', 'sem-ponto', '.', dados + '.%%%'):
+        assert autenticacao.ler_token(invalido, b'k', agora=1001.0) is None
+
+
+def test_token_expirado_volta_ao_cookie(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'config.yaml')
+    _escrever(tmp_path / 'config.yaml', '$2b$12$a')
+    estado = {}
+    monkeypatch.setattr(autenticacao.st, 'session_state', estado)
+    monkeypatch.setattr(autenticacao.time, 'time', lambda: 1000.0)
+    autenticador = autenticacao.autenticador(caminho)
+    # Cookie de reautenticação do login pelo formulário (o autenticador vê o prazo no relógio real)
+    cookie = jwt.encode({'name': 'Ana', 'username': 'ana', 'exp_date': 4e9}, CHAVE_COOKIE, algorithm='HS256')
+    monkeypatch.setattr(autenticador, 'cookie_manager', CookiesDoBrowser({'climatologia': cookie}))
+
+    estado.update(authentication_status=True, name='Ana', username='ana')  # login pelo formulário
+    autenticacao.registar_sessao(caminho)
+    assert autenticacao.sessao_valida(caminho) and estado['name'] == 'Ana'
+
+    monkeypatch.setattr(autenticacao.time, 'time', lambda: 1000.0 + autenticacao.VALIDADE_SESSAO)
+    assert not autenticacao.sessao_valida(caminho)
+    assert 'sessao_token' not in estado and not estado['authentication_status'] and not estado['logout']
+    # Como nas apps: o login aceita o cookie, sem formulário, e a sessão recebe um token novo
+    assert autenticador.login('Login') == ('Ana', True, 'ana')
+    autenticacao.registar_sessao(caminho)
+    assert autenticacao.ler_token(estado['sessao_token'], autenticacao.segredo(caminho))['expira'] == (
+        1000.0 + 2 * autenticacao.VALIDADE_SESSAO)
+    assert autenticacao.sessao_valida(caminho)
+
+
+def test_token_expirado_sem_cookie_pede_login(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'config.yaml')
+    _escrever(tmp_path / 'config.yaml', '$2b$12$a')
+    estado = {}
+    monkeypatch.setattr(autenticacao.st, 'session_state', estado)
+    monkeypatch.setattr(autenticacao.time, 'time', lambda: 1000.0)
+    estado.update(authentication_status=True, name='Ana', username='ana')
+    autenticacao.registar_sessao(caminho)
+
+    monkeypatch.setattr(autenticacao.time, 'time', lambda: 1000.0 + autenticacao.VALIDADE_SESSAO)
+    assert not autenticacao.sessao_valida(caminho)
+    autenticacao.registar_sessao(caminho)  # sem login novo não há token novo
+    assert 'sessao_token' not in estado and estado['authentication_status'] is None
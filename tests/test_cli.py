@@ -0,0 +1,92 @@
+"""Linha de comandos (python -m climatologia avaliar), com o feed gravado em climatologia/gravacoes."""
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from climatologia import cli, fonte, ipma, tabelas
+from climatologia.motor import NOMES, MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(RAIZ, 'climatologia', 'gravacoes')
+
+REGISTOS = [
+    {'T': '25', 'RH': '60', 'ti': '20', 'classe': 'A'},
+    {'T': '12.5', 'RH': '90', 'pressao': '990', 'ti': '15', 'classe': 'b'},
+    {'estacao': '1200535', 'ti': '18', 'classe': 'A'},  # Lisboa no feed gravado: 16.8 °C, 80 %
+    {'cidade': 'Lisboa', 'ti': '18', 'classe': 'B'},
+]
+
+
+@pytest.fixture
+def avaliar(monkeypatch, capsys):
+    monkeypatch.setattr(fonte, '_config', None)
+    monkeypatch.setattr(ipma, 'cache', ipma.ObservacoesCache())
+    monkeypatch.setattr(ipma, 'cache_estacoes', ipma.EstacoesCache())
+    monkeypatch.setenv('CLIMATOLOGIA_FONTE', FIXTURES)
+
+    def correr(*argv):
+        codigo = cli.main(['--pasta', RAIZ, 'avaliar', *argv])
+        saida = capsys.readouterr()
+        return codigo, saida.out, saida.err
+    return correr
+
+
+def _esperado(T, RH, ti, classe, pressao=None):
+    r = MotorLote(tabelas.compiladas(RAIZ)).avaliar_um(T, RH, ti, classe, pressao)
+    return NOMES[r['resultado']], r['tm']
+
+
+def _verificar(linhas):
+    assert len(linhas) == len(REGISTOS)
+    for linha, (T, RH, ti, classe, pressao) in zip(linhas, [(25, 60, 20, 'A', None), (12.5, 90, 15, 'B', 990),
+                                                             (16.8, 80, 18, 'A', 1026.7), (16.8, 80, 18, 'B', 1026.7)]):
+        resultado, tm = _esperado(T, RH, ti, classe, pressao)
+        assert linha['resultado'] == resultado and float(linha['tm']) == pytest.approx(tm)
+        assert float(linha['T']) == T
+
+
+def test_csv(avaliar, tmp_path):
+    caminho = tmp_path / 'paiois.csv'
+    with open(caminho, 'w', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=['T', 'RH', 'pressao', 'estacao', 'cidade', 'ti', 'classe'])
+        escritor.writeheader()
+        escritor.writerows(REGISTOS)
+    codigo, saida, _ = avaliar(str(caminho), '--bloco', '3')
+    assert codigo == 0
+    linhas = list(csv.DictReader(io.StringIO(saida)))
+    assert list(linhas[0])[-len(cli.CAMPOS_SAIDA):] == list(cli.CAMPOS_SAIDA)
+    _verificar(linhas)
+
+
+def test_jsonl(avaliar, tmp_path):
+    caminho = tmp_path / 'paiois.jsonl'
+    caminho.write_text(''.join(json.dumps(r) + '\n' for r in REGISTOS))
+    codigo, saida, _ = avaliar(str(caminho), '-s', 'json')
+    assert codigo == 0
+    linhas = [json.loads(linha) for linha in saida.splitlines()]
+    _verificar(linhas)
+    assert linhas[2]['estacao'] == '1200535' and linhas[3]['cidade'] == 'Lisboa'
+
+
+@pytest.mark.parametrize('registo, mensagem', [
+    ({'T': '25', 'RH': '60', 'ti': '20', 'classe': 'C'}, "classe 'C'"),
+    ({'T': '25', 'RH': '60', 'classe': 'A'}, "sem ti"),
+    ({'T': '25', 'RH': '60', 'ti': 'vinte', 'classe': 'A'}, "sem ti"),
+])
+def test_registo_invalido(avaliar, tmp_path, registo, mensagem):
+    caminho = tmp_path / 'paiois.jsonl'
+    caminho.write_text(json.dumps(registo) + '\n')
+    codigo, saida, erro = avaliar(str(caminho), '-s', 'json')
+    assert codigo == 2 and saida == ''
+    assert mensagem in erro and str(registo) in erro
+
+
+def test_motor_rejeita_classe_desconhecida():
+    motor = MotorLote(tabelas.compiladas(RAIZ))
+    with pytest.raises(ValueError, match='esperado A ou B'):
+        motor.avaliar([25, 25], [60, 60], 20, ['A', 'C'])
+    with pytest.raises(ValueError, match='esperado A ou B'):
+        motor.avaliar_um(25, 60, 20, 'C')
@@ -0,0 +1,179 @@
+"""Cliente e cache do IPMA contra um servidor local que serve observations.json gravado."""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from climatologia import ipma
+from climatologia.cliente import ClienteIPMA
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'climatologia', 'gravacoes',
+                       'observations.json')
+
+
+class ServidorIPMA:
+    """Substituto local do api.ipma.pt: `respostas` é uma fila de códigos a devolver (depois, 200)."""
+
+    def __init__(self):
+        with open(FIXTURE, 'rb') as f:
+            self.corpo = f.read()
+        self.respostas = []
+        self.atraso = 0.0
+        self.pedidos = []
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor.pedidos.append(dict(self.headers))
+                time.sleep(servidor.atraso)
+                codigo = servidor.respostas.pop(0) if servidor.respostas else 200
+                if codigo == 200 and self.headers.get('If-None-Match') == '"v1"':
+                    codigo = 304
+                self.send_response(codigo)
+                if codigo == 200:
+                    self.send_header('ETag', '"v1"')
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(servidor.corpo)))
+                    self.end_headers()
+                    self.wfile.write(servidor.corpo)
+                else:
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/observations.json'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def servidor():
+    s = ServidorIPMA()
+    yield s
+    s.httpd.shutdown()
+
+
+def cliente_rapido(**kwargs):
+    return ClienteIPMA(timeout=(1, 1), backoff=0.01, backoff_max=0.02, **kwargs)
+
+
+def test_retry_em_5xx(servidor):
+    servidor.respostas = [503, 502]
+    cliente = cliente_rapido()
+    assert cliente.get(servidor.url).status_code == 200
+    assert len(servidor.pedidos) == 3
+    assert cliente.retries == 2
+
+
+def test_desiste_apos_tentativas(servidor):
+    servidor.respostas = [500, 500, 500]
+    assert cliente_rapido().get(servidor.url).status_code == 500
+
+
+def test_timeout_de_leitura(servidor):
+    servidor.atraso = 0.5
+    cliente = ClienteIPMA(timeout=(1, 0.1), tentativas=1)
+    with pytest.raises(requests.Timeout):
+        cliente.get(servidor.url)
+
+
+def test_pedidos_simultaneos_colapsados(servidor):
+    servidor.atraso = 0.3
+    cliente = cliente_rapido()
+    respostas = []
+    threads = [threading.Thread(target=lambda: respostas.append(cliente.get(servidor.url))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(servidor.pedidos) == 1
+    assert len(respostas) == 8 and all(r is respostas[0] for r in respostas)
+
+
+def test_cache_indice_e_pedido_condicional(servidor):
+    cache = ipma.ObservacoesCache(url=servidor.url, ttl=0, cliente=cliente_rapido())
+    assert cache.ultima('1200535') == ('2026-10-17T23:00', 16.8, 80.0, 1026.7)
+    assert cache.ultima('1210878')[3] is None  # pressão -99.0
+    assert cache.ultima('1200554')[0] == '2026-10-17T22:00'  # temperatura -99.0 na última hora
+    assert cache.ultima('1200571')[0] == '2026-10-17T22:00'  # estação a null na última hora
+    assert cache.ultima('0000000') is None
+    assert servidor.pedidos[-1].get('If-None-Match') == '"v1"'
+    assert cache.stats()['nao_modificado'] >= 1
+
+
+def test_cache_serve_ultimo_snapshot_em_falha(servidor):
+    cache = ipma.ObservacoesCache(url=servidor.url, ttl=0, cliente=cliente_rapido(tentativas=1))
+    esperado = cache.ultima('1200535')
+    servidor.respostas = [503]
+    cache.invalidar()
+    assert cache.ultima('1200535') == esperado
+    assert cache.stats()['falhas'] == 1
+
+
+def test_cache_sem_dados_propaga_erro(servidor):
+    servidor.respostas = [404]
+    cache = ipma.ObservacoesCache(url=servidor.url, cliente=cliente_rapido())
+    with pytest.raises(ipma.IPMAErro) as erro:
+        cache.ultima('1200535')
+    assert erro.value.status_code == 404
+
+
+def test_prefetcher_carrega_e_leitores_nao_vao_a_rede(servidor):
+    from climatologia import prefetch
+
+    cache = ipma.ObservacoesCache(url=servidor.url, ttl=0, cliente=cliente_rapido())
+    p = prefetch.Prefetcher([cache])
+    assert p.ciclo()
+    cache.em_fundo = True
+    pedidos = len(servidor.pedidos)
+    for _ in range(5):
+        assert cache.ultima('1200535') is not None
+    assert len(servidor.pedidos) == pedidos
+    assert prefetch.proxima_execucao(7200 + 1, 3600, 600) == 7200 + 600
+    assert prefetch.proxima_execucao(7200 + 700, 3600, 600) == 10800 + 600
+
+
+def test_cache_filtrado_le_em_fluxo(servidor):
+    completo = ipma.ObservacoesCache(url=servidor.url, cliente=cliente_rapido())
+    cache = ipma.ObservacoesCache(url=servidor.url, cliente=cliente_rapido(), estacoes=['1200535', '1210878'])
+    assert set(cache.snapshot().ultima) == {'1200535', '1210878'}
+    for station_id in ('1200535', '1210878'):  # incluindo a pressão -99.0 → None
+        assert cache.ultima(station_id) == completo.ultima(station_id)
+    cache.filtrar(['1200535', '1200554'])  # estação nova: recarga completa, sem pedido condicional
+    assert 'If-None-Match' not in servidor.pedidos[-1]
+    assert cache.ultima('1200554') == completo.ultima('1200554')
+
+
+def test_filtro_alargado_recarregado_pelo_prefetcher(servidor):
+    from climatologia import prefetch
+
+    completo = ipma.ObservacoesCache(url=servidor.url, cliente=cliente_rapido())
+    cache = ipma.ObservacoesCache(url=servidor.url, cliente=cliente_rapido(), estacoes=['1200535'])
+    p = prefetch.Prefetcher([cache])
+    p.start()
+    try:
+        while not cache.pronto:
+            time.sleep(0.01)
+        pedidos = len(servidor.pedidos)
+        servidor.atraso = 0.5
+        inicio = time.monotonic()
+        cache.filtrar(['1200554'])
+        assert cache.ultima('1200554') is None  # serve o snapshot atual sem esperar pela recarga
+        assert time.monotonic() - inicio < 0.25
+        while cache.ultima('1200554') is None:
+            time.sleep(0.01)
+        assert len(servidor.pedidos) == pedidos + 1 and 'If-None-Match' not in servidor.pedidos[-1]
+        assert cache.ultimas(['1200535', '1200554']) == completo.ultimas(['1200535', '1200554'])
+        assert cache.estacoes == {'1200535', '1200554'}  # alargado, não substituído
+
+        cache.filtrar(['1200554'])  # já coberto: nada a fazer
+        assert not cache._recarregar and cache._expira > time.monotonic()
+    finally:
+        p.parar()
+        p.join(5)
+    assert not p.is_alive() and not cache.em_fundo and cache.acordar is None
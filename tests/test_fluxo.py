@@ -0,0 +1,43 @@
+"""Leitura em fluxo do observations.json (climatologia.fluxo)."""
+import json
+import os
+
+import pytest
+
+from climatologia.fluxo import iterar_horas, ler_observacoes
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'climatologia', 'gravacoes',
+                       'observations.json')
+
+
+def _pedacos(corpo, tamanho):
+    return (corpo[i:i + tamanho] for i in range(0, len(corpo), tamanho))
+
+
+@pytest.mark.parametrize('tamanho', [1, 7, 64, 1 << 16])
+def test_igual_ao_json_filtrado(tamanho):
+    with open(FIXTURE, 'rb') as f:
+        corpo = f.read()
+    estacoes = {'1200535', '1210878', '1200571', '0000000'}
+    esperado = {ts: {s: obs for s, obs in horas.items() if s in estacoes} for ts, horas in json.loads(corpo).items()}
+    assert ler_observacoes(_pedacos(corpo, tamanho), estacoes) == esperado
+
+
+def test_iterar_horas_todas_as_estacoes():
+    with open(FIXTURE, 'rb') as f:
+        corpo = f.read()
+    horas = iterar_horas(_pedacos(corpo, 64))
+    assert next(horas) == next(iter(json.loads(corpo).items()))  # a primeira hora sai antes de ler o resto
+    assert dict(iterar_horas(_pedacos(corpo, 64))) == json.loads(corpo)
+
+
+def test_formas_validas():
+    assert ler_observacoes([b' {} '], {'1'}) == {}
+    corpo = '{"a": null, "b": {}, "c": {"1": null, "2": {"t": 1}}, "d": {"1\\u0032": {"t": 2}}}'.encode()
+    assert ler_observacoes(_pedacos(corpo, 3), {'1', '12'}) == {'a': None, 'b': {}, 'c': {'1': None}, 'd': {'12': {'t': 2}}}
+
+
+@pytest.mark.parametrize('corpo', [b'', b'[]', b'{"a": [1]}', b'{"a": {}} x', b'{"a": {"1": null,}}', b'{"a"'])
+def test_json_invalido(corpo):
+    with pytest.raises(ValueError):
+        ler_observacoes([corpo], {'1'})
@@ -0,0 +1,70 @@
+"""Modo offline: feeds gravados em ficheiros (climatologia.fonte) e o substituto do IPMA (climatologia.servidor)."""
+import json
+import os
+import shutil
+
+import pytest
+
+from climatologia import fonte, ipma, servidor
+from climatologia.cliente import ClienteIPMA
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'climatologia', 'gravacoes')
+
+
+def _caches(config, monkeypatch):
+    monkeypatch.setattr(fonte, '_config', None)
+    cliente = ClienteIPMA(timeout=(1, 1), backoff=0.01, backoff_max=0.02)
+    caches = (ipma.ObservacoesCache(cliente=cliente), ipma.EstacoesCache(cliente=cliente))
+    fonte.ativar(config, caches)
+    return caches
+
+
+def test_pasta_servida_como_o_ipma(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(FIXTURES, 'observations.json'), tmp_path)
+    observacoes, estacoes = _caches(str(tmp_path), monkeypatch)
+    assert observacoes.url.startswith('file://')
+    assert observacoes.ultima('1200535') == ('2026-10-17T23:00', 16.8, 80.0, 1026.7)
+    assert observacoes.refrescar() is False and observacoes.nao_modificado == 1  # ETag do mtime → 304
+
+    caminho = tmp_path / 'observations.json'
+    feed = json.loads(caminho.read_text())
+    feed['2026-10-18T00:00'] = {'1200535': {'temperatura': 17.9, 'humidade': 75.0}}
+    caminho.write_text(json.dumps(feed))
+    os.utime(caminho, ns=(os.stat(caminho).st_mtime_ns + 10**9,) * 2)
+    assert observacoes.refrescar() is True  # ficheiro substituído: publicação nova
+    assert observacoes.ultima('1200535') == ('2026-10-18T00:00', 17.9, 75.0, None)
+
+    with pytest.raises(ipma.IPMAErro) as erro:  # sem stations.json gravado
+        estacoes.estacoes()
+    assert erro.value.status_code == 404
+
+
+def test_configuracao_invalida(monkeypatch):
+    monkeypatch.setattr(fonte, '_config', None)
+    with pytest.raises(ValueError):
+        fonte.ativar('/nao/existe', (ipma.ObservacoesCache(), ipma.EstacoesCache()))
+    assert fonte.urls('ipma') == (ipma.OBSERVATIONS_URL, ipma.STATIONS_URL)
+    assert fonte.urls('http://127.0.0.1:8765/')[1].endswith('/open-data/observation/meteorology/stations/stations.json')
+
+
+def test_substituto_com_gravacoes_e_erros(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(FIXTURES, 'stations.json'), tmp_path)
+    shutil.copy(os.path.join(FIXTURES, 'observations.json'), tmp_path / 'observations_1.json')
+    (tmp_path / 'observations_2.json').write_text('{"2026-10-18T00:00": {"1200535": {"temperatura": 9.5, "humidade": 90}}}')
+    substituto = servidor.Substituto(str(tmp_path), intervalo=3600)
+    observacoes, estacoes = _caches(substituto.iniciar(), monkeypatch)
+    try:
+        assert observacoes.ultima('1200535')[1] == 16.8
+        assert '1200535' in estacoes.estacoes()
+        assert observacoes.refrescar() is False  # mesma gravação: 304
+        monkeypatch.setattr(substituto, 'gravacao_atual', lambda: 1)
+        assert observacoes.refrescar() is True and observacoes.ultima('1200535')[1] == 9.5
+
+        substituto.erros = 1.0
+        assert observacoes.refrescar() is False and observacoes.falhas == 1  # continua com o último snapshot
+        substituto.erros, substituto.invalidos = 0.0, 1.0
+        with pytest.raises(ipma.IPMAErro, match='JSON inválido'):
+            ipma.ObservacoesCache(url=observacoes.url).snapshot()
+        assert substituto.respostas[503] == 3 and substituto.respostas[304] == 1
+    finally:
+        substituto.parar()
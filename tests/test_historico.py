@@ -0,0 +1,91 @@
+"""Histórico local das observações (climatologia.historico), numa base SQLite temporária."""
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from climatologia import historico as historico_mod, tabelas
+from climatologia.historico import HistoricoObservacoes
+from climatologia.motor import VENTILAR, VENTILAR_RAPIDO, MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _obs(T, RH, pressao=1010.0):
+    return {'temperatura': T, 'humidade': RH, 'pressao': pressao}
+
+
+@pytest.fixture
+def historico(tmp_path):
+    return HistoricoObservacoes(str(tmp_path / 'historico.sqlite'))
+
+
+def test_estacao_e_hora_sem_duplicados(historico):
+    feed = {
+        '2024-05-01T10:00': {'A': _obs(10, 70), 'B': _obs(20, 60)},
+        '2024-05-01T11:00': {'A': _obs(11, 70, -99.0)},
+    }
+    assert historico.gravar_feed(feed) == 3
+    assert historico.gravar_feed(feed) == 0
+    # A mesma hora com outros valores não substitui a gravada; só a hora nova entra
+    assert historico.gravar_feed({'2024-05-01T10:00': {'A': _obs(99, 1)},
+                                  '2024-05-01T12:00': {'A': _obs(12, 70, None)}}) == 1
+    serie = historico.serie('A')
+    assert list(serie['hora']) == ['2024-05-01T10:00', '2024-05-01T11:00', '2024-05-01T12:00']
+    assert list(serie['temperatura']) == [10.0, 11.0, 12.0]
+    assert serie['pressao'][0] == 1010.0 and all(serie['pressao'][1:] != serie['pressao'][1:])  # em falta → NaN
+
+
+def test_serie_inicio_incluido_fim_excluido(historico):
+    horas = [f'2024-05-01T{h:02d}:00' for h in range(6)]
+    historico.gravar_feed({hora: {'A': _obs(float(i), 50)} for i, hora in enumerate(horas)})
+    historico.gravar_feed({horas[2]: {'B': _obs(0, 50)}})
+    assert list(historico.serie('A', horas[1], horas[4])['hora']) == horas[1:4]
+    assert list(historico.serie('A', inicio=horas[4])['hora']) == horas[4:]
+    assert list(historico.serie('A', fim=horas[1])['hora']) == horas[:1]
+    assert len(historico.serie('A', horas[3], horas[3])['hora']) == 0
+    assert len(historico.serie('C')['hora']) == 0
+
+
+def test_horas_ventilaveis(historico):
+    motor = MotorLote(tabelas.compiladas(RAIZ))
+    agora = datetime(2024, 5, 8, 12, tzinfo=timezone.utc)
+    historico.gravar_feed({
+        '2024-05-01T11:00': {'A': _obs(25, 30)},  # seco, mas fora dos 7 dias
+        '2024-05-01T12:00': {'A': _obs(25, 30)},
+        '2024-05-05T06:00': {'A': _obs(28, 80)},  # quente e húmido: fechado
+        '2024-05-06T11:00': {'B': _obs(25, 30)},
+        '2024-05-08T11:00': {'A': _obs(24, 35)},
+    })
+    janelas = historico.horas_ventilaveis(motor, 'A', 20.0, 'A', agora=agora)
+    assert list(janelas['hora']) == ['2024-05-01T12:00', '2024-05-08T11:00']
+    assert list(janelas['resultado']) == list(motor.avaliar([25.0, 24.0], [30.0, 35.0], 20.0, 'A')['resultado'])
+    assert set(janelas['resultado']) <= {VENTILAR, VENTILAR_RAPIDO}
+    assert list(historico.horas_ventilaveis(motor, 'A', 20.0, 'A', dias=1, agora=agora)['hora']) == ['2024-05-08T11:00']
+
+
+def test_ligacoes_fechadas(historico, monkeypatch):
+    ligacoes, connect = [], sqlite3.connect
+
+    def ligar(*args, **kwargs):
+        ligacoes.append(connect(*args, **kwargs))
+        return ligacoes[-1]
+    monkeypatch.setattr(historico_mod.sqlite3, 'connect', ligar)
+    historico.gravar_feed({'2024-05-01T10:00': {'A': _obs(10, 70)}})
+    historico.serie('A')
+    assert len(ligacoes) == 2
+    for con in ligacoes:
+        with pytest.raises(sqlite3.ProgrammingError, match='closed'):
+            con.execute('SELECT 1')
+
+
+def test_gravar_linhas_e_iterar_serie(historico):
+    horas = [f'2024-05-01T{h:02d}:00' for h in range(6)]
+    assert historico.gravar_linhas(('A', hora, float(i), 50.0, None) for i, hora in enumerate(horas)) == 6
+    # A mesma hora com outros valores não substitui a gravada; só a hora nova entra
+    assert historico.gravar_linhas([('A', horas[0], 99.0, 1.0, None), ('A', '2024-05-01T06:00', 6.0, 50.0, None)]) == 1
+    assert historico.serie('A')['temperatura'][0] == 0.0
+    blocos = list(historico.iterar_serie('A', horas[1], horas[5], bloco=3))
+    assert [list(b['hora']) for b in blocos] == [horas[1:4], horas[4:5]]
+    assert list(historico.iterar_serie('C')) == []
@@ -0,0 +1,73 @@
+"""Motor interpolado (climatologia.interpolacao): igual às tabelas nos nós, contínuo entre eles, NaN fora."""
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import interpolacao, tabelas
+from climatologia.motor import FORA_DA_TABELA, MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def originais():
+    return tabelas.carregar(RAIZ)
+
+
+@pytest.fixture(scope='module')
+def interpoladas(originais):
+    return interpolacao.interpolar(*originais)
+
+
+@pytest.fixture(scope='module')
+def compiladas(originais):
+    return tabelas.compilar(*originais)
+
+
+def test_nos_iguais_as_tabelas(originais, interpoladas):
+    tabela_iii, tabela_iiibis, tabela_iv = originais
+    tabela_iii = tabela_iii[~tabela_iii.index.duplicated(keep='last')]
+    for ts in tabela_iii.index:
+        for delta in tabela_iii.columns:
+            esperado = float(tabela_iii.loc[ts, delta])
+            np.testing.assert_equal(interpoladas.get_P(float(ts), float(delta)), esperado)
+    for P, tv, tl in tabela_iiibis[['P', 'tv', 'tl']].itertuples(index=False):
+        assert interpoladas.get_tv_tl(P) == pytest.approx((tv, tl))
+    for ts, tm, tv in tabela_iv.dropna(subset=['ts', 'tm', 'tv'])[['ts', 'tm', 'tv']].itertuples(index=False):
+        assert interpoladas.get_tv_classB(ts, tm) == pytest.approx(tv)
+
+
+def test_continuo_entre_nos(interpoladas):
+    meio = interpoladas.get_P(27.5, 3.0)
+    assert meio == pytest.approx((interpoladas.get_P(27.0, 3.0) + interpoladas.get_P(28.0, 3.0)) / 2)
+    P = np.linspace(interpoladas.P_bis[0], interpoladas.P_bis[-1], 1000)
+    tv, tl = interpoladas.get_tv_tl(P)
+    assert np.all(np.diff(tv) >= 0) and np.all(np.diff(tl) >= 0)
+
+
+def test_fora_do_dominio_da_nan(interpoladas):
+    assert np.isnan(interpoladas.get_P(70.0, 3.0))
+    assert interpoladas.fora_dominio_iii(70.0, 3.0)
+    assert np.isnan(interpoladas.get_tv_tl(interpoladas.P_bis[-1] + 1)[0])
+    assert interpoladas.fora_dominio_iiibis(interpoladas.P_bis[-1] + 1)
+    assert np.isnan(interpoladas.get_tv_classB(60.0, 20.0))  # ts - tm = 40 °F, fora da banda
+    assert interpoladas.fora_dominio_iv(60.0, 20.0)
+
+
+def test_motor_interpolado(interpoladas, compiladas):
+    T, RH = np.array([20.0, 20.4, 65.0]), np.array([60.0, 60.0, 50.0])
+    r = MotorLote(interpoladas).avaliar(T, RH, 18.0, 'A')
+    assert list(r['fora_dominio']) == [False, False, True]
+    assert r['resultado'][2] == FORA_DA_TABELA
+    assert r['P'][0] != r['P'][1]  # sem arredondamento de T
+    legado = MotorLote(compiladas).avaliar(T, RH, 18.0, 'A')
+    assert legado['P'][0] == legado['P'][1]
+    assert list(legado['fora_dominio']) == [False, False, True]
+    assert legado['resultado'][2] != FORA_DA_TABELA  # as compiladas usam a margem
+
+
+def test_csv_sem_pandas_igual_ao_pandas(interpoladas):
+    sem_pandas = interpolacao.interpoladas(RAIZ)
+    for nome in ('ts', 'delta', 'P', 'P_bis', 'tv_bis', 'tl_bis', 'tsF', 'tmF', 'tv_F'):
+        np.testing.assert_array_equal(getattr(sem_pandas, nome), getattr(interpoladas, nome), err_msg=nome)
@@ -0,0 +1,61 @@
+"""Índice por estação das observações do IPMA (climatologia.ipma.IndiceEstacoes)."""
+from climatologia import ipma
+
+
+def _obs(T, RH=70.0, pressao=1010.0):
+    return {'temperatura': T, 'humidade': RH, 'pressao': pressao}
+
+
+def _reconstruido(data):
+    indice = ipma.IndiceEstacoes()
+    indice.atualizar(data)
+    return indice
+
+
+def test_indice_incremental_igual_a_reconstrucao():
+    h = [f'2024-05-01T{i:02d}:00' for i in range(5)]
+    primeiro = {
+        h[0]: {'A': _obs(10), 'B': _obs(20), 'C': _obs(30)},
+        h[1]: {'A': _obs(11), 'B': _obs(21, RH=-99.0)},  # B sem humidade: fica a valer h[0]
+        h[2]: {'A': _obs(12), 'D': None},
+    }
+    indice = _reconstruido(primeiro)
+    assert indice.ultima['B'] == (h[0], 20, 70.0, 1010.0)
+
+    # Janela desliza: h[0] sai (com a última hora válida de B e a única de C), h[1] e h[2] já foram
+    # vistas mas são relidas (em h[2] chegou a leitura de B em atraso), h[3] e h[4] são novas
+    segundo = {
+        h[1]: {'A': _obs(11), 'B': _obs(21, RH=-99.0)},
+        h[2]: {'A': _obs(12), 'B': _obs(22), 'D': None},
+        h[3]: {'A': _obs(13, pressao=-99.0), 'B': _obs(23)},
+        h[4]: {'B': _obs(24, RH=None)},
+    }
+    assert indice.atualizar(segundo) == 2
+    assert indice.ultima == _reconstruido(segundo).ultima
+    assert indice.historico == _reconstruido(segundo).historico
+    assert indice.ultima['A'] == (h[3], 13, 70.0, None)
+    assert indice.ultima['B'] == (h[3], 23, 70.0, 1010.0)
+    assert indice.historico['B'][h[2]] == (22, 70.0, 1010.0)
+    assert 'C' not in indice.ultima and 'C' not in indice.historico
+
+    # Só saem horas: B perde h[3] e volta à leitura que chegou em atraso
+    terceiro = {ts: segundo[ts] for ts in (h[1], h[2])}
+    assert indice.atualizar(terceiro) == 0
+    assert indice.ultima == _reconstruido(terceiro).ultima == {
+        'A': (h[2], 12, 70.0, 1010.0), 'B': (h[2], 22, 70.0, 1010.0)}
+    assert indice.historico == _reconstruido(terceiro).historico
+
+    # Uma hora relida pode também corrigir ou perder valores: A volta a h[1], B sai do índice
+    quarto = {h[1]: segundo[h[1]], h[2]: {'A': _obs(None), 'B': _obs(22.5, RH=None)}}
+    assert indice.atualizar(quarto) == 0
+    assert indice.ultima == _reconstruido(quarto).ultima == {'A': (h[1], 11, 70.0, 1010.0)}
+    assert indice.historico == _reconstruido(quarto).historico
+
+
+def test_so_as_horas_mais_recentes_sao_relidas():
+    h = [f'2024-05-01T{i:02d}:00' for i in range(ipma.HORAS_REVISTAS + 2)]
+    indice = _reconstruido({ts: {'A': _obs(i)} for i, ts in enumerate(h)})
+    corrigido = {ts: {'A': _obs(100 + i)} for i, ts in enumerate(h)}
+    assert indice.atualizar(corrigido) == 0
+    assert [indice.historico['A'][ts][0] for ts in h] == [0, 1] + [102 + i for i in range(ipma.HORAS_REVISTAS)]
+    assert indice.ultima['A'] == (h[-1], 100 + len(h) - 1, 70.0, 1010.0)
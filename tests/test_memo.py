@@ -0,0 +1,53 @@
+"""Cache de veredictos por chaves quantizadas (climatologia.memo)."""
+import math
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import memo, tabelas
+from climatologia.motor import MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def compiladas():
+    return tabelas.compiladas(RAIZ)
+
+
+def _iguais(a, b):
+    assert a.keys() == b.keys()
+    for chave in a:
+        assert type(a[chave]) is type(b[chave]), chave
+        assert a[chave] == b[chave] or (math.isnan(a[chave]) and math.isnan(b[chave])), chave
+
+
+def test_igual_ao_motor(compiladas):
+    cache = memo.CacheVeredictos(compiladas)
+    cache.aquecer()
+    motor = MotorLote(compiladas)
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        T, RH, ti = round(rng.uniform(-15, 65), 1), float(rng.integers(1, 101)), round(rng.uniform(0, 40), 1)
+        for classe in 'AB':
+            res = motor.avaliar(T, RH, ti, classe)
+            _iguais(cache.avaliar_um(T, RH, ti, classe), {k: v[0].item() for k, v in res.items()})
+
+
+def test_hits_e_lru(compiladas):
+    cache = memo.CacheVeredictos(compiladas, maximo=2)
+    cache.avaliar_um(20.0, 60.0, 18.0, 'A')
+    cache.avaliar_um(20.0, 60.0, 25.0, 'A')  # outro ti: mesma observação e mesma célula
+    assert cache.stats()['observacoes']['hits'] == 1 and cache.stats()['celulas']['hits'] == 1
+    cache.avaliar_um(21.0, 60.0, 18.0, 'A')
+    cache.avaliar_um(22.0, 60.0, 18.0, 'A')
+    assert len(cache.observacoes) == 2 and cache.observacoes.obter((20.0, 60.0)) is None
+
+
+def test_tabelas_novas_invalidam(compiladas):
+    cache = memo.cache_de(compiladas)
+    assert memo.cache_de(compiladas) is cache
+    assert len(cache.celulas) == compiladas.P.size + compiladas.tv_F.size  # aquecida
+    outras = tabelas.TabelasCompiladas.de_arrays(compiladas.como_arrays())
+    assert memo.cache_de(outras) is not cache
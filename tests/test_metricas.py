@@ -0,0 +1,62 @@
+"""Medições e exportação Prometheus de climatologia.metricas."""
+import pytest
+
+from climatologia import metricas
+
+
+@pytest.fixture
+def ligadas():
+    metricas.ativar()
+    metricas.processo.limpar()
+    yield
+    metricas.ativar(False)
+    metricas.usar_sessao(None)
+    metricas.processo.limpar()
+
+
+def test_desligadas_nao_registam():
+    metricas.processo.limpar()
+    with metricas.medir('x'):
+        pass
+    metricas.registar_bytes('feed', 10)
+    assert metricas.processo.resumo() == {}
+    assert metricas.processo.bytes == {}
+
+
+def test_sessao_e_processo(ligadas):
+    sessao = metricas.Registo()
+    metricas.usar_sessao(sessao)
+    for _ in range(3):
+        with metricas.medir('lookup.get_P'):
+            pass
+    metricas.usar_sessao(None)
+    with metricas.medir('lookup.get_P'):
+        pass
+    assert sessao.resumo()['lookup.get_P']['n'] == 3
+    assert metricas.processo.resumo()['lookup.get_P']['n'] == 4
+
+
+def test_prometheus(ligadas):
+    metricas.registar('ipma_observacoes.rede', 0.25)
+    metricas.registar_bytes('ipma_observacoes.payload', 1234)
+    texto = metricas.prometheus()
+    assert '# TYPE climatologia_ipma_observacoes_rede_seconds summary' in texto
+    assert 'climatologia_ipma_observacoes_rede_seconds{quantile="0.99"} 0.250000000' in texto
+    assert 'climatologia_ipma_observacoes_rede_seconds_count 1' in texto
+    assert 'climatologia_ipma_observacoes_payload_bytes_total 1234' in texto
+
+
+@pytest.mark.parametrize('ambiente, esperado', [({}, '127.0.0.1'), ({'CLIMATOLOGIA_METRICAS_ENDERECO': '0.0.0.0'}, '0.0.0.0')])
+def test_servidor_local_por_omissao(monkeypatch, ambiente, esperado):
+    monkeypatch.setattr(metricas, '_servidor', None)
+    monkeypatch.setenv('CLIMATOLOGIA_METRICAS_PORTA', '0')  # porta livre qualquer
+    monkeypatch.delenv('CLIMATOLOGIA_METRICAS_ENDERECO', raising=False)
+    for nome, valor in ambiente.items():
+        monkeypatch.setenv(nome, valor)
+    servidor = metricas.servir()
+    try:
+        assert servidor.server_address[0] == esperado
+        assert metricas.servir() is servidor
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
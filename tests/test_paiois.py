@@ -0,0 +1,107 @@
+"""Registo de paióis e agendador com alertas só nas mudanças (climatologia.paiois)."""
+import os
+import sqlite3
+
+import pytest
+
+from climatologia import ipma, pacote, paiois
+from climatologia.motor import MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REGISTO = """
+paiois:
+  - nome: Norte
+    classe: A
+    ti: {ti}
+    local: Coimbra
+  - nome: Sul
+    classe: B
+    ti: 21
+    estacao: '1200554'
+"""
+
+
+def _indice(hora, obs):
+    indice = ipma.IndiceEstacoes()
+    indice.atualizar({hora: {s: {'temperatura': T, 'humidade': RH, 'pressao': 1013.0} for s, (T, RH) in obs.items()}})
+    return indice
+
+
+@pytest.fixture
+def agendador(tmp_path):
+    caminho = tmp_path / 'paiois.yaml'
+    caminho.write_text(REGISTO.format(ti=18.5))
+    motor = MotorLote(pacote.carregar(RAIZ)[0])
+    a = paiois.Agendador(str(caminho), motor, paiois.VeredictosPaiois(str(tmp_path / 'v.sqlite')), {'Coimbra': '1200559'})
+    a.recebidas = []
+    a.ao_mudar(a.recebidas.extend)
+    return a
+
+
+def test_ler_registo_valida(tmp_path):
+    caminho = tmp_path / 'paiois.yaml'
+    caminho.write_text("paiois:\n  - nome: X\n    classe: C\n    ti: 20\n    estacao: 1\n")
+    with pytest.raises(ValueError, match='classe'):
+        paiois.ler_registo(str(caminho))
+    caminho.write_text("paiois:\n  - nome: X\n    classe: a\n    ti: 20\n    estacao: 1\n")
+    assert paiois.ler_registo(str(caminho)) == [{'nome': 'X', 'classe': 'A', 'ti': 20.0, 'estacao': '1', 'local': None}]
+
+
+def test_so_notifica_mudancas(agendador):
+    obs = {'1200559': (14.5, 95.0), '1200554': (16.8, 80.0)}
+    primeira = agendador.avaliar(_indice('2026-10-17T23:00', obs))
+    assert [a['paiol'] for a in primeira] == ['Norte', 'Sul'] and primeira[0]['anterior'] is None
+
+    # Mesmo snapshot ou nova hora com o mesmo veredicto: nada a notificar
+    assert agendador.avaliar(_indice('2026-10-17T23:00', obs)) == []
+    assert agendador.avaliar(_indice('2026-10-18T00:00', obs)) == []
+
+    # Estação sem dados: mantém o veredicto, sem alerta
+    assert agendador.avaliar(_indice('2026-10-18T01:00', {'1200554': (16.8, 80.0)})) == []
+
+    # Mudança de ti no registo (relido pelo mtime) → só esse paiol muda
+    caminho = agendador.caminho
+    with open(caminho, 'w') as f:
+        f.write(REGISTO.format(ti=5))
+    os.utime(caminho, (0, os.path.getmtime(caminho) + 1))
+    mudancas = agendador.avaliar(_indice('2026-10-18T02:00', obs))
+    assert [(a['paiol'], a['anterior'], a['resultado']) for a in mudancas] == [('Norte', 'ventilar_rapido', 'fechado')]
+    assert agendador.recebidas == primeira + mudancas
+
+
+def test_estado_sobrevive_reinicio(agendador, tmp_path):
+    obs = {'1200559': (14.5, 95.0), '1200554': (16.8, 80.0)}
+    agendador.avaliar(_indice('2026-10-17T23:00', obs))
+    novo = paiois.Agendador(agendador.caminho, agendador.motor, paiois.VeredictosPaiois(str(tmp_path / 'v.sqlite')), agendador.mapa)
+    assert novo.avaliar(_indice('2026-10-17T23:00', obs)) == []
+    assert [linha[0] for linha in novo.veredictos.alteracoes()] == ['Norte', 'Sul']
+
+
+def test_registo_invalido_nao_impede_o_arranque(agendador, tmp_path):
+    caminho = tmp_path / 'invalido.yaml'
+    caminho.write_text("paiois: [nome: X\n")  # YAML mal formado
+    a = paiois.Agendador(str(caminho), agendador.motor, agendador.veredictos, agendador.mapa)
+    assert a.paiois == []
+    assert a.avaliar(_indice('2026-10-17T23:00', {'1200554': (16.8, 80.0)})) == []
+
+    # Corrigido o ficheiro, a passagem seguinte já o lê
+    caminho.write_text(REGISTO.format(ti=18.5))
+    os.utime(caminho, (0, os.path.getmtime(caminho) + 1))
+    assert [m['paiol'] for m in a.avaliar(_indice('2026-10-17T23:00', {'1200554': (16.8, 80.0)}))] == ['Sul']
+
+
+def test_ligacoes_fechadas(agendador, monkeypatch):
+    ligacoes, connect = [], sqlite3.connect
+
+    def ligar(*args, **kwargs):
+        ligacoes.append(connect(*args, **kwargs))
+        return ligacoes[-1]
+    monkeypatch.setattr(paiois.sqlite3, 'connect', ligar)
+    agendador.avaliar(_indice('2026-10-17T23:00', {'1200554': (16.8, 80.0)}))
+    agendador.veredictos.ultimos()
+    agendador.veredictos.alteracoes()
+    assert len(ligacoes) == 3
+    for con in ligacoes:
+        with pytest.raises(sqlite3.ProgrammingError, match='closed'):
+            con.execute('SELECT 1')
@@ -0,0 +1,143 @@
+"""Modo multi-processo: um só pedido ao IPMA e tabelas partilhadas (climatologia.partilha)."""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from climatologia import ipma, pacote, partilha
+from climatologia.cliente import ClienteIPMA
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(RAIZ, 'climatologia', 'gravacoes', 'observations.json')
+
+
+@pytest.fixture
+def feed():
+    """Servidor do feed; o teste pode trocar o corpo e a ETag servidos (dict `atual`)."""
+    with open(FIXTURE, 'rb') as f:
+        atual = {'corpo': f.read(), 'etag': '"v1"'}
+    pedidos = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            pedidos.append(self.headers.get('If-None-Match'))
+            corpo, etag = atual['corpo'], atual['etag']
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}/observations.json', pedidos, atual
+    httpd.shutdown()
+
+
+@pytest.fixture
+def servidor(feed):
+    return feed[:2]
+
+
+def _worker(url, backend, ttl=3600):
+    """Cache de observações de um 'processo', ligada ao backend comum."""
+    cache = ipma.ObservacoesCache(url=url, ttl=ttl, cliente=ClienteIPMA(timeout=(1, 1)))
+    cache.partilha = partilha.Partilha(backend)
+    return cache
+
+
+@pytest.mark.parametrize('fabrica', [partilha.Memoria, 'ficheiros'])
+def test_um_so_pedido_para_varios_workers(servidor, fabrica, tmp_path):
+    url, pedidos = servidor
+    backend = partilha.Ficheiros(str(tmp_path)) if fabrica == 'ficheiros' else fabrica()
+    workers = [_worker(url, backend) for _ in range(4)]
+    assert {w.ultima('1200535') for w in workers} == {('2026-10-17T23:00', 16.8, 80.0, 1026.7)}
+    assert len(pedidos) == 1
+    assert [w.partilha.stats()['publicacoes_lidas'] for w in workers] == [0, 1, 1, 1]
+
+    # Refrescamento forçado (prefetch) logo a seguir: a publicação ainda está fresca
+    assert not workers[1].refrescar()
+    assert len(pedidos) == 1
+
+
+def test_filtro_nao_coberto_vai_ao_ipma(servidor):
+    url, pedidos = servidor
+    backend = partilha.Memoria()
+    filtrado = _worker(url, backend)
+    filtrado.filtrar({'1200535'})
+    filtrado.snapshot()
+    completo = _worker(url, backend)
+    assert completo.ultima('1200545') is not None  # a publicação só tinha Lisboa
+    assert len(pedidos) == 2
+
+
+def test_publicacao_completa_depois_de_filtrada(feed):
+    url, pedidos, atual = feed
+    completo_json = json.loads(atual['corpo'])
+    atual['corpo'] = json.dumps({h: v for h, v in completo_json.items() if h < '2026-10-17T23:00'}).encode()
+    atual['etag'] = '"v0"'
+    backend = partilha.Memoria()
+    filtrado = _worker(url, backend)
+    filtrado.filtrar({'1200535'})
+    assert filtrado.ultima('1200535')[0] == '2026-10-17T22:00'
+
+    # Outro processo precisa do feed inteiro, que entretanto mudou: publica uma versão nova,
+    # que o processo filtrado tem de incorporar (e não confundir com a que já tem)
+    atual['corpo'], atual['etag'] = json.dumps(completo_json).encode(), '"v1"'
+    completo = _worker(url, backend)
+    assert completo.ultima('1200545') is not None
+    assert len(pedidos) == 2
+    assert filtrado.refrescar()
+    assert filtrado.ultima('1200535')[0] == '2026-10-17T23:00'
+    assert len(pedidos) == 2
+
+
+@pytest.mark.parametrize('fabrica', [partilha.Memoria, 'ficheiros'])
+def test_trinco_so_liberta_o_proprio(fabrica, tmp_path):
+    if fabrica == 'ficheiros':
+        a, b = partilha.Ficheiros(str(tmp_path)), partilha.Ficheiros(str(tmp_path))
+    else:
+        a = b = fabrica()
+    ficha = a.trancar('feed:x')
+    assert ficha
+    assert b.trancar('feed:x') is None
+    b.destrancar('feed:x', 'outra')  # não é o dono: o trinco fica
+    assert b.trancar('feed:x') is None
+    a.destrancar('feed:x', ficha)
+    assert b.trancar('feed:x')
+
+
+def test_trinco_abandonado_de_ficheiros(tmp_path):
+    a, b = partilha.Ficheiros(str(tmp_path)), partilha.Ficheiros(str(tmp_path))
+    ficha_a = a.trancar('feed:x')
+    ficha_b = b.trancar('feed:x', prazo=-1)  # o de a expirou: b fica com ele
+    assert ficha_b and ficha_b != ficha_a
+    a.destrancar('feed:x', ficha_a)  # a já não é o dono
+    assert a.trancar('feed:x') is None
+    b.destrancar('feed:x', ficha_b)
+    assert a.trancar('feed:x')
+
+
+def test_pacote_partilhado_em_mmap(tmp_path):
+    lider = partilha.Partilha(partilha.Ficheiros(str(tmp_path)))
+    seguidor = partilha.Partilha(partilha.Ficheiros(str(tmp_path)))
+    compiladas, cidades, city_to_id = lider.carregar_pacote(RAIZ)
+    partilhadas, cidades_p, city_to_id_p = seguidor.carregar_pacote(RAIZ)
+    assert isinstance(partilhadas.P.base, np.memmap)  # vista sobre o ficheiro, sem cópia
+    assert (cidades_p, city_to_id_p) == (cidades, city_to_id)
+    for nome in ('P', 'tv_A', 'tl_A', 'tv_F'):
+        np.testing.assert_array_equal(getattr(partilhadas, nome), getattr(compiladas, nome))
+    assert partilhadas.get_P(21.3, 4.2) == compiladas.get_P(21.3, 4.2)
+    assert seguidor.carregar_pacote(RAIZ)[0] is partilhadas
+    assert pacote.checksum(RAIZ) in ''.join(os.listdir(tmp_path))
@@ -0,0 +1,45 @@
+"""Bolbo húmido pela equação do psicrómetro (climatologia.psicrometria) e a sua escolha no MotorLote."""
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import psicrometria, tabelas
+from climatologia.motor import MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _residuo(T, RH, p, tw):
+    e = RH / 100 * psicrometria.pressao_vapor_saturacao(T)
+    coeficiente = 6.53e-4 * (1 + 0.000944 * tw)
+    return psicrometria.pressao_vapor_saturacao(tw) - coeficiente * p * (T - tw) - e
+
+
+def test_resolve_a_equacao_do_psicrometro():
+    T, RH = (g.ravel() for g in np.meshgrid(np.arange(-10.0, 51.0), np.arange(5.0, 101.0)))
+    for p in (850.0, 1013.0, 1050.0):
+        tw = psicrometria.psicrometrico(T, RH, p)
+        assert np.abs(_residuo(T, RH, p, tw)).max() < 1e-9
+        assert np.all(tw <= T + 1e-9)
+    assert psicrometria.psicrometrico(20.0, 100.0, 1000.0) == pytest.approx(20.0)
+    assert psicrometria.psicrometrico(20.0, 50.0, 1013.25) == pytest.approx(13.8, abs=0.1)
+
+
+def test_pressao_baixa_arrefece_e_pressao_em_falta_usa_a_padrao():
+    assert psicrometria.psicrometrico(25.0, 40.0, 900.0) < psicrometria.psicrometrico(25.0, 40.0, 1013.0)
+    padrao = psicrometria.psicrometrico(25.0, 40.0, psicrometria.PRESSAO_PADRAO)
+    assert psicrometria.psicrometrico(25.0, 40.0) == padrao
+    assert psicrometria.psicrometrico(25.0, 40.0, np.nan) == padrao
+    assert psicrometria.psicrometrico(25.0, 40.0, -99.0) == padrao
+
+
+def test_motor_escolhe_o_metodo():
+    compiladas = tabelas.compiladas(RAIZ)
+    T, RH = np.array([12.0, 24.5, 31.0]), np.array([80.0, 55.0, 30.0])
+    stull = MotorLote(compiladas).avaliar(T, RH, 18.0, 'A', 950.0)
+    assert np.array_equal(stull['tm'], psicrometria.stull_wet_bulb(T, RH))
+    psicrometro = MotorLote(compiladas, psicrometria.psicrometrico)
+    assert np.array_equal(psicrometro.avaliar(T, RH, 18.0, 'A', 950.0)['tm'], psicrometria.psicrometrico(T, RH, 950.0))
+    assert psicrometro.avaliar_um(24.5, 55.0, 18.0, 'A', 950.0)['tm'] == pytest.approx(
+        psicrometria.psicrometrico(24.5, 55.0, 950.0))
@@ -0,0 +1,61 @@
+"""Relatório de todos os Locais a partir de um snapshot (climatologia.relatorio)."""
+import csv
+import io
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import relatorio, tabelas
+from climatologia.motor import NOMES, MotorLote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ULTIMA = {
+    '1': ('2026-10-18T09:00', 14.2, 88.0, 1021.5),
+    '2': ('2026-10-18T09:00', 31.0, 35.0, None),
+}
+MAPA = {'Coimbra': '1', 'Beja': '2', 'Sagres': '3'}  # Sagres: estação sem observação
+
+
+@pytest.fixture(scope='module')
+def motor():
+    return MotorLote(tabelas.compiladas(RAIZ))
+
+
+def test_linhas_em_blocos_iguais_ao_motor(motor):
+    locais = ['Coimbra', 'Beja', 'Sagres', 'Sem estação']
+    blocos = list(relatorio.linhas(motor, locais, MAPA, ULTIMA, 19.5, bloco=3))
+    assert [len(b) for b in blocos] == [6, 2]  # 3 locais × 2 classes, depois 1 × 2
+    linhas = {(l['local'], l['classe']): l for b in blocos for l in b}
+    assert set(linhas[('Beja', 'A')]) == set(relatorio.COLUNAS)
+
+    res = motor.avaliar([14.2, 31.0], [88.0, 35.0], 19.5, ['A', 'B'], [1021.5, np.nan])
+    coimbra, beja = linhas[('Coimbra', 'A')], linhas[('Beja', 'B')]
+    assert coimbra['P'] == res['P'][0] and coimbra['resultado'] == NOMES[int(res['resultado'][0])]
+    assert beja['tv_F'] == res['tv_F'][1] and beja['pressao'] is None and beja['tv'] is None
+    for local in ('Sagres', 'Sem estação'):
+        assert linhas[(local, 'B')]['resultado'] == 'sem_dados' and linhas[(local, 'B')]['T'] is None
+    assert linhas[('Sagres', 'A')]['estacao'] == '3' and linhas[('Sem estação', 'A')]['estacao'] is None
+
+
+@pytest.mark.parametrize('formato', list(relatorio.FORMATOS))
+def test_exportar(motor, formato):
+    if formato == 'parquet':
+        pq = pytest.importorskip('pyarrow.parquet')
+    destino = io.BytesIO()
+    total = relatorio.exportar(relatorio.linhas(motor, list(MAPA), MAPA, ULTIMA, 20.0, bloco=1), destino, formato)
+    assert total == 6
+    dados = destino.getvalue()
+    if formato == 'csv':
+        linhas = list(csv.DictReader(io.StringIO(dados.decode('utf-8'))))
+        assert len(linhas) == 6 and linhas[0]['local'] == 'Coimbra' and linhas[4]['resultado'] == 'sem_dados'
+    elif formato == 'parquet':
+        tabela = pq.read_table(io.BytesIO(dados))
+        assert tabela.num_rows == 6 and pq.ParquetFile(io.BytesIO(dados)).num_row_groups == 3
+        assert tabela.column_names == list(relatorio.COLUNAS)
+    else:
+        assert dados.startswith(b'%PDF-1.4') and dados.rstrip().endswith(b'%%EOF')
+        xref = int(dados.rsplit(b'startxref\n', 1)[1].split()[0])
+        assert dados[xref:].startswith(b'xref\n0 6\n')  # catálogo, páginas, fonte e uma página (2 objetos)
+        assert b'(Coimbra ' in dados and b'/Count 1' in dados
@@ -0,0 +1,88 @@
+"""Reprocessamento do histórico por paiol (climatologia.reprocessamento)."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from climatologia import reprocessamento
+from climatologia.motor import NOMES
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAIOIS = {'1200559': [('Norte', 'A', 18.5), ('Norte B', 'B', 18.5)], '1200554': [('Sul', 'A', 21.0)]}
+
+
+def _horas(n):
+    return [f'2024-01-{1 + i // 24:02d}T{i % 24:02d}:00' for i in range(n)]
+
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    """Três dias de duas estações: metade num JSON com a forma do feed, o resto (e horas repetidas) num CSV."""
+    pasta = tmp_path_factory.mktemp('reprocessamento')
+    rng = np.random.default_rng(7)
+    horas = _horas(72)
+    obs = {s: list(zip(rng.uniform(0, 35, 72).round(1), rng.uniform(20, 100, 72).round())) for s in PAIOIS}
+    feed = {h: {s: {'temperatura': obs[s][i][0], 'humidade': obs[s][i][1], 'pressao': -99.0} for s in PAIOIS}
+            for i, h in enumerate(horas[:40])}
+    feed[horas[0]]['1200600'] = {'temperatura': 10.0, 'humidade': 50.0}  # estação sem paióis: não importada
+    (pasta / 'arquivo.json').write_text(json.dumps(feed))
+    linhas = ['station_id,hora,temperatura,humidade,pressao']
+    linhas += [f'{s},{h},{obs[s][i][0]},{obs[s][i][1]},' for s in PAIOIS for i, h in enumerate(horas) if i >= 30]
+    (pasta / 'export.csv').write_text('\n'.join(linhas) + '\n')
+
+    caminho = str(pasta / 'obs.sqlite')
+    novas = reprocessamento.importar([str(pasta / 'arquivo.json'), str(pasta / 'export.csv')], caminho, PAIOIS)
+    assert novas == 2 * 72
+    return caminho, horas, obs
+
+
+def _por_hora(linhas, paiol, campo):
+    """Expande os segmentos de um paiol em {hora: valor}."""
+    horas = {}
+    for linha in linhas:
+        if linha['paiol'] != paiol:
+            continue
+        todas = _horas(72)
+        for h in todas[todas.index(linha['inicio']):todas.index(linha['fim']) + 1]:
+            horas[h] = linha[campo]
+    return horas
+
+
+def test_segmentos_entre_blocos():
+    s = reprocessamento.Segmentos()
+    assert s.juntar(np.array(['a', 'b', 'c']), np.array([1, 1, 2])) == [['a', 'b', 1, 2]]
+    assert s.juntar(np.array(['d', 'e']), np.array([2, 3])) == [['c', 'd', 2, 2]]
+    assert s.fechar() == [['e', 'e', 3, 1]]
+
+
+def test_linha_do_tempo_igual_ao_motor(base):
+    caminho, horas, obs = base
+    versao = (RAIZ, 'proximo', 'stull')
+    resultados = list(reprocessamento.reprocessar(caminho, PAIOIS, versao, processos=1, bloco=10))
+    assert [r['estacao'] for r in resultados] == sorted(PAIOIS) and all(r['horas'] == 72 for r in resultados)
+    linhas = [linha for r in resultados for linha in r['linhas']]
+    motor = reprocessamento.motor(versao)
+    for station_id, paiois in PAIOIS.items():
+        T, RH = (np.array(c, dtype=float) for c in zip(*obs[station_id]))
+        for nome, classe, ti in paiois:
+            esperado = [NOMES[c] for c in motor.avaliar(T, RH, ti, classe)['resultado'].tolist()]
+            assert _por_hora(linhas, nome, 'resultado') == dict(zip(horas, esperado))
+
+
+def test_diferencas_entre_versoes(base):
+    caminho, horas, obs = base
+    proximo, interpolado = (RAIZ, 'proximo', 'stull'), (RAIZ, 'interpolado', 'psicrometrico')
+    resultados = list(reprocessamento.reprocessar(caminho, PAIOIS, proximo, interpolado, processos=2, bloco=7))
+    linhas = [linha for r in resultados for linha in r['linhas']]
+    resumo = {nome: r for resultado in resultados for nome, r in resultado['resumo'].items()}
+    for station_id, paiois in PAIOIS.items():
+        T, RH = (np.array(c, dtype=float) for c in zip(*obs[station_id]))
+        for nome, classe, ti in paiois:
+            a, b = (reprocessamento.motor(v).avaliar(T, RH, ti, classe)['resultado'] for v in (proximo, interpolado))
+            esperado = {h: (NOMES[x], NOMES[y]) for h, x, y in zip(horas, a.tolist(), b.tolist()) if x != y}
+            obtido = _por_hora(linhas, nome, 'antes')
+            assert {h: (v, _por_hora(linhas, nome, 'depois')[h]) for h, v in obtido.items()} == esperado
+            assert resumo[nome]['diferentes'] == len(esperado) and resumo[nome]['horas'] == 72
+            assert sum(resumo[nome]['pares'].values()) == len(esperado)
@@ -0,0 +1,83 @@
+"""Resolução local → estação mais próxima (climatologia.resolucao)."""
+import os
+
+import numpy as np
+
+from climatologia import locais, resolucao
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ESTACOES = {
+    '1200535': ('Lisboa (Geofísico)', 38.719, -9.150),
+    '1200545': ('Porto, Pedras Rubras (Aeródromo)', 41.233, -8.680),
+    '1200559': ('Coimbra, Cernache', 40.158, -8.469),
+    '1210702': ('Aveiro (Universidade)', 40.635, -8.660),
+    '1200554': ('Faro (Aeródromo)', 37.017, -7.969),
+    '1210770': ('Setúbal, Areias', 38.536, -8.893),
+}
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * resolucao.RAIO_TERRA * np.arcsin(np.sqrt(a))
+
+
+def test_normalizar():
+    assert resolucao.normalizar('Viana Castelo') == resolucao.normalizar('Viana do Castelo') == 'viana castelo'
+    assert resolucao.normalizar('Montemor-O-Novo') == 'montemor o novo'
+    assert resolucao.normalizar('Santarém, Fonte Boa') == 'santarem fonte boa'
+
+
+def test_vizinhas_igual_a_forca_bruta():
+    indice = resolucao.IndiceEspacial(ESTACOES)
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(37, 42, 50), rng.uniform(-9.5, -6.5, 50)
+    ids, km = indice.vizinhas(lat, lon, k=3)
+    for i in range(50):
+        d = {s: _haversine(lat[i], lon[i], e[1], e[2]) for s, e in ESTACOES.items()}
+        assert list(ids[i]) == sorted(d, key=d.get)[:3]
+        assert np.allclose(km[i], sorted(d.values())[:3])
+
+
+def test_resolve_por_nome_coordenadas_e_manual():
+    r = resolucao.Resolvedor(
+        ['Coimbra', 'Porto', 'Sesimbra', 'Almada', 'Nenhures'],
+        manual={'Sesimbra': '1210770'},
+        coordenadas={'Almada': (38.68, -9.16)},
+        k=2,
+    )
+    r.atualizar(ESTACOES)
+    assert r.candidatas('Coimbra')[0] == ('1200559', 0.0)
+    assert r.candidatas('Porto')[0][0] == '1200545'
+    assert [s for s, _ in r.candidatas('Sesimbra')] == ['1210770', '1200535']
+    assert r.candidatas('Almada')[0][0] == '1200535'
+    assert r.sem_coordenadas == ('Nenhures',)
+
+
+def test_passa_a_seguinte_sem_dados():
+    r = resolucao.Resolvedor(['Coimbra'], manual={'Mafra': '1210747'}, k=3)
+    assert r.mapeamento() == {'Mafra': '1210747'}  # sem stations.json ainda: só o manual
+    r.atualizar(ESTACOES)
+    observacoes = {'1200559': None, '1210702': ('2026-10-17T23:00', 15.0, 80.0, None)}
+    assert r.resolver('Coimbra', observacoes) == [('1210702', r.distancia('Coimbra', '1210702'))]
+    assert r.mapeamento(observacoes) == {'Mafra': '1210747', 'Coimbra': '1210702'}
+    assert r.mapeamento() == {'Mafra': '1210747', 'Coimbra': '1200559'}
+
+
+def test_coordenadas_do_repositorio_corrigem_o_manual():
+    coordenadas = resolucao.ler_coordenadas(os.path.join(RAIZ, resolucao.COORDENADAS))
+    todos = set(locais.ler_locais(os.path.join(RAIZ, 'Climatologia_8.xlsx'))) | set(locais.CITY_TO_ID)
+    assert todos <= set(coordenadas)
+
+    estacoes = dict(ESTACOES, **{
+        '1210704': ('Espinho', 41.007, -8.641),
+        '1210771': ('Cabo Espichel (teste)', 38.415, -9.215),
+    })
+    r = resolucao.Resolvedor(locais.ler_locais(os.path.join(RAIZ, 'Climatologia_8.xlsx')), locais.CITY_TO_ID, coordenadas)
+    r.atualizar(estacoes)
+    assert r.sem_coordenadas == ()
+    mapa = r.mapeamento()
+    # no CITY_TO_ID: São Jacinto → Espinho e Sesimbra → Setúbal
+    assert locais.CITY_TO_ID['São Jacinto'] == '1210704' and mapa['São Jacinto'] == '1210702'  # Aveiro, ~7 km
+    assert locais.CITY_TO_ID['Sesimbra'] == '1210770' and mapa['Sesimbra'] == '1210771'
@@ -0,0 +1,179 @@
+"""As grelhas compiladas devem dar exatamente o mesmo que os lookups pandas das apps."""
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from climatologia import pacote, tabelas
+from climatologia.cache import em_cache
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Lookups originais de app_4.py
+def get_P(ts, delta, tabela_iii):
+    ts_rounded = round(ts)
+    delta_rounded = round(delta)
+    if ts_rounded not in tabela_iii.index:
+        closest_ts = tabela_iii.index[np.abs(tabela_iii.index - ts_rounded).argmin()]
+    else:
+        closest_ts = ts_rounded
+    row = tabela_iii.loc[closest_ts]
+    if delta_rounded not in row.index:
+        closest_delta = row.index[np.abs(row.index - delta_rounded).argmin()]
+    else:
+        closest_delta = delta_rounded
+    return row[closest_delta]
+
+
+def get_tv_tl(P, tabela_iiibis):
+    closest = tabela_iiibis.iloc[(tabela_iiibis['P'] - P).abs().argsort()[:1]]
+    return closest['tv'].values[0], closest['tl'].values[0]
+
+
+def get_tv_classB(ts_F, tm_F, tabela_iv):
+    tabela_iv_clean = tabela_iv.dropna(subset=['ts', 'tm', 'tv'])
+    closest = tabela_iv_clean.iloc[((tabela_iv_clean['ts'] - ts_F).abs() + (tabela_iv_clean['tm'] - tm_F).abs()).argsort()[:1]]
+    if not closest.empty:
+        return closest['tv'].values[0]
+    return None
+
+
+@pytest.fixture(scope='module')
+def originais():
+    tabela_iii, tabela_iiibis, tabela_iv = tabelas.carregar(RAIZ)
+    return tabela_iii, tabela_iiibis, tabela_iv
+
+
+@pytest.fixture(scope='module')
+def compiladas(originais):
+    return tabelas.compilar(*originais)
+
+
+def test_get_P(compiladas, originais):
+    for ts in range(-10, 61):
+        for delta in range(-3, 20):
+            esperado = get_P(ts, delta, originais[0])
+            np.testing.assert_equal(compiladas.get_P(ts, delta), esperado, err_msg=f"ts={ts} delta={delta}")
+
+
+def test_linha_ts_34(compiladas):
+    # No original a linha de ts=34 vinha com o rótulo "24" (repetido); ts=34 lia a linha de 35
+    linha_34 = [37.3, 35.3, 33.3, 31.5, 29.7, 28.1, 26.5, 25, 23.6, 22.2, 20.9, 19.3]
+    assert [compiladas.get_P(34, delta) for delta in range(12)] == linha_34
+    assert compiladas.get_P(35, 0) == 39.5 and compiladas.get_P(24, 0) == 21.7
+    with pytest.raises(ValueError, match='ts repetidos'):
+        tabelas.verificar_ts(np.array([35.0, 24.0, 33.0, 24.0]))
+
+
+def test_get_P_vetorizado(compiladas, originais):
+    ts, delta = np.meshgrid(np.arange(-10, 61), np.arange(-3, 20), indexing='ij')
+    esperado = [[get_P(a, b, originais[0]) for b in range(-3, 20)] for a in range(-10, 61)]
+    np.testing.assert_array_equal(compiladas.get_P(ts, delta), esperado)
+
+
+def test_get_tv_tl(compiladas, originais):
+    tabela_iii, tabela_iiibis, _ = originais
+    P_tabela = tabela_iii.to_numpy(dtype=float).ravel()
+    for P in np.concatenate([P_tabela[np.isfinite(P_tabela)], np.arange(0, 45, 0.05)]):
+        assert compiladas.get_tv_tl(P) == get_tv_tl(P, tabela_iiibis), f"P={P}"
+
+
+def test_get_tv_tl_A(compiladas, originais):
+    tabela_iiibis = originais[1]
+    for ts in range(-10, 61):
+        for delta in range(-3, 20):
+            P = get_P(ts, delta, originais[0])
+            tv, tl = compiladas.get_tv_tl_A(ts, delta)
+            if np.isnan(P):
+                assert np.isnan(tv) and np.isnan(tl)
+            else:
+                assert (tv, tl) == get_tv_tl(P, tabela_iiibis), f"ts={ts} delta={delta}"
+
+
+def test_get_tv_classB(compiladas, originais):
+    tabela_iv = originais[2]
+    for ts_F in range(20, 116):
+        for tm_F in range(20, 116, 3):
+            assert compiladas.get_tv_classB(ts_F, tm_F) == get_tv_classB(ts_F, tm_F, tabela_iv), f"ts_F={ts_F} tm_F={tm_F}"
+
+
+def test_csv_sem_pandas_igual_ao_pandas(compiladas):
+    sem_pandas = tabelas.compiladas(RAIZ)
+    for nome, array in compiladas.como_arrays().items():
+        np.testing.assert_array_equal(getattr(sem_pandas, nome), array, err_msg=nome)
+
+
+def test_arranque_nao_importa_pandas():
+    codigo = "import sys, climatologia.cli, climatologia.partilha; print(' '.join(m for m in ('pandas', 'openpyxl') if m in sys.modules))"
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == ''
+
+
+def test_app_sem_pandas_nem_altair(tmp_path):
+    """Primeira página da app (com o pacote compilado e o feed gravado) sem carregar o pandas nem o altair."""
+    for nome in ('app.py', 'locais_coordenadas.csv') + pacote.FONTES:
+        shutil.copy(os.path.join(RAIZ, nome), tmp_path)
+    pacote.construir(str(tmp_path))
+    codigo = (
+        "import sys; from streamlit.testing.v1 import AppTest; "
+        "at = AppTest.from_file('app.py', default_timeout=60).run(); "
+        "assert not at.exception, at.exception; assert at.button, 'app sem botões'; "
+        "print(' '.join(m for m in ('pandas', 'altair', 'openpyxl') if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=RAIZ, CLIMATOLOGIA_FONTE=os.path.join(RAIZ, 'climatologia', 'gravacoes'))
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert saida.returncode == 0, saida.stderr
+    assert saida.stdout.strip() == ''
+
+
+def _editar(caminho, antes, depois):
+    """Substitui texto no ficheiro e avança o mtime (sistemas de ficheiros com resolução grosseira)."""
+    with open(caminho, encoding='utf-8-sig') as f:
+        texto = f.read()
+    assert antes in texto
+    with open(caminho, 'w', encoding='utf-8-sig') as f:
+        f.write(texto.replace(antes, depois, 1))
+    st = os.stat(caminho)
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def test_cache_invalidada_quando_o_csv_muda(tmp_path):
+    for caminho in tabelas._caminhos(RAIZ):
+        shutil.copy(caminho, tmp_path)
+    pasta = str(tmp_path)
+    iii = tabelas.carregar(pasta)[0]
+    compiladas = tabelas.compiladas(pasta)
+    assert tabelas.carregar(pasta)[0] is iii and tabelas.compiladas(pasta) is compiladas
+    assert compiladas.get_P(50, 0) == 83.6
+
+    _editar(tmp_path / 'tabela_iii.csv', '50,83.6,', '50,99.9,')  # mesmo tamanho: só o mtime muda
+    assert tabelas.carregar(pasta)[0] is not iii
+    assert tabelas.carregar(pasta)[0].loc[50].iloc[0] == 99.9
+    assert tabelas.compiladas(pasta).get_P(50, 0) == 99.9
+    assert tabelas.carregar(RAIZ)[0].loc[50].iloc[0] == 83.6  # cada pasta tem a sua entrada
+
+
+def test_pacote_desatualizado_ignorado(tmp_path):
+    for nome in pacote.FONTES:
+        shutil.copy(os.path.join(RAIZ, nome), tmp_path)
+    pasta = str(tmp_path)
+    caminho = pacote.construir(pasta)
+    compiladas = pacote.carregar(pasta)[0]
+    assert compiladas is em_cache(pacote._ler_pacote, caminho)[2]  # veio do pacote
+    assert compiladas.get_P(50, 0) == 83.6
+
+    _editar(tmp_path / 'tabela_iii.csv', '50,83.6,', '50,99.9,')  # o pacote fica com o checksum antigo
+    compiladas, cidades, city_to_id = pacote.carregar(pasta)
+    assert compiladas is tabelas.compiladas(pasta)
+    assert compiladas.get_P(50, 0) == 99.9
+    assert cidades and city_to_id
+
+    pacote.construir(pasta)  # reconstruído, volta a ser usado
+    st = os.stat(caminho)
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    assert pacote.carregar(pasta)[0] is em_cache(pacote._ler_pacote, caminho)[2]
+    assert pacote.carregar(pasta)[0].get_P(50, 0) == 99.9